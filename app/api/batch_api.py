@@ -0,0 +1,269 @@
+from fastapi import APIRouter, Header, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import uuid
+
+from app.models.document_models import BatchResponse, DocumentStatus
+from app.api.document_api import (
+    job_store, register_upload, infer_document_type, submit_job, get_tenant, check_priority, document_response,
+    spill_if_queued
+)
+from app.core.scheduler.job_scheduler import scheduler, QueueFullError
+from app.core.upload.spooled_upload import SpooledUpload, UploadTooLargeError
+from app.core.upload.multipart_stream import iter_form_parts, MultipartError
+from app.core.upload.archive_reader import is_archive, iter_archive_members
+
+from config.config import BATCH_MAX_FILES, BATCH_SPOOL_MAX_MEMORY
+
+router = APIRouter()
+
+
+# The batch body is parsed by the endpoint itself, so the form is described here for the API docs
+_BATCH_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                        "priority": {"type": "string", "default": "normal"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+@router.post("/batch", response_model=BatchResponse, openapi_extra=_BATCH_FORM)
+async def upload_batch(request: Request, x_api_key: Optional[str] = Header(None)):
+    """
+    Upload many documents at once, as separate files or as ZIP/TAR archives.
+
+    Archive members are streamed out of the archive one by one and every
+    document becomes its own conversion job. The jobs are queued like single
+    uploads, so a large batch shares the workers fairly with other tenants.
+    Every document counts against the queue limits like a single upload;
+    when the queue is full the batch is rejected with 429 before any of it
+    is spooled. The files are spooled straight from the request body as it
+    arrives, and every document is queued as soon as it has been received.
+    Documents beyond BATCH_MAX_FILES, and those arriving while the queue is
+    full, are skipped.
+
+    Parameters:
+    - files: The files or archives to upload
+    - priority: Priority class (high, normal, low) of all documents in the batch; must come before the files
+    - X-API-Key: Header identifying the tenant; the client address is used if it is missing
+
+    Returns:
+    - BatchResponse with the batch ID and the initial status of every document
+    """
+    tenant = get_tenant(request, x_api_key)
+
+    # Reserve the batch's place in the queue before anything is spooled
+    batch = _open_batch(tenant)
+    try:
+        return await _receive_batch(request, tenant, batch)
+    finally:
+        scheduler.close_batch(batch)
+
+
+async def _receive_batch(request, tenant, batch):
+    receiver = _BatchReceiver(str(uuid.uuid4()), tenant, batch)
+    # File part being received, its filename, and whether it exceeded the size limit
+    upload = None
+    filename = None
+    too_large = False
+    files_started = False
+
+    try:
+        async for event in iter_form_parts(request):
+            kind = event[0]
+            if kind == "field":
+                if event[1] == "priority":
+                    if files_started:
+                        raise HTTPException(status_code=400, detail="The priority field must come before the files")
+                    check_priority(event[2])
+                    receiver.priority = event[2]
+            elif kind == "file_start":
+                upload, filename, too_large = None, event[2], False
+                if event[1] == "files":
+                    files_started = True
+                    upload = SpooledUpload(max_memory=BATCH_SPOOL_MAX_MEMORY)
+            elif kind == "file_data":
+                if upload is not None and not too_large:
+                    try:
+                        await upload.write(event[1])
+                    except UploadTooLargeError:
+                        # The rest of the file is read past
+                        upload.discard()
+                        too_large = True
+            elif upload is not None:
+                file_upload, upload = upload, None
+                if too_large:
+                    receiver.skipped.append(filename)
+                else:
+                    await file_upload.finish()
+                    await receiver.add_file(filename, file_upload)
+
+    except Exception as e:
+        if upload is not None:
+            upload.discard()
+        error = HTTPException(status_code=400, detail=str(e)) if isinstance(e, MultipartError) else e
+        if not isinstance(error, HTTPException):
+            raise
+        if receiver.doc_ids:
+            # Documents received before the error are queued already
+            raise HTTPException(
+                status_code=error.status_code,
+                detail=f"{error.detail}; the {len(receiver.doc_ids)} documents before it were queued as batch "
+                       f"{receiver.batch_id}"
+            )
+        raise error
+
+    if not receiver.doc_ids:
+        raise HTTPException(status_code=400, detail="The batch does not contain any PDF, DOCX, or image files.")
+
+    return _batch_response(receiver.batch_id, skipped=receiver.skipped)
+
+
+class _BatchReceiver:
+    """
+    Registers and queues the documents of a batch upload as soon as each one is spooled.
+
+    Small documents are kept in memory only if their job starts right away,
+    so memory use does not grow with the number of documents in the batch.
+    """
+
+    def __init__(self, batch_id, tenant, batch):
+        self.batch_id = batch_id
+        self.tenant = tenant
+        self.batch = batch
+        self.priority = "normal"
+        self.doc_ids = []
+        self.skipped = []
+
+    async def add_file(self, filename, upload):
+        """Queue an uploaded file, or every document of an archive."""
+        if not is_archive(filename, upload.head):
+            await self.add(filename, upload)
+            return
+
+        # Read the archive members off the event loop, one member at a time
+        archive_file = await run_in_threadpool(upload.open)
+        try:
+            members = iter_archive_members(archive_file, {"max_memory": BATCH_SPOOL_MAX_MEMORY})
+            while True:
+                member = await run_in_threadpool(next, members, None)
+                if member is None:
+                    break
+                name, member_upload = member
+                if member_upload is None:
+                    self.skipped.append(name)
+                else:
+                    await self.add(name, member_upload)
+        finally:
+            archive_file.close()
+            upload.discard()
+
+    async def add(self, filename, upload):
+        """
+        Register and queue one document; unsupported files, those above BATCH_MAX_FILES
+        and those that do not fit into the queue are skipped.
+        """
+        doc_type = infer_document_type(filename, upload)
+        if doc_type is None or len(self.doc_ids) >= BATCH_MAX_FILES or not self._reserve():
+            upload.discard()
+            self.skipped.append(filename)
+            return
+
+        try:
+            await spill_if_queued(upload, self.tenant)
+            doc_data, is_new = await run_in_threadpool(self._register, filename, upload, doc_type)
+        except Exception:
+            upload.discard()
+            raise
+
+        self.doc_ids.append(doc_data.doc_id)
+        if is_new:
+            file_bytes = upload.getvalue() if upload.in_memory else None
+            submit_job(doc_data, (doc_data.doc_id, file_bytes), self.tenant, self.priority, batch=self.batch)
+
+    def _reserve(self):
+        try:
+            scheduler.reserve(self.batch)
+            return True
+        except QueueFullError:
+            return False
+
+    def _register(self, filename, upload, doc_type):
+        # Duplicates attach to running or cached conversions
+        doc_data, is_new = register_upload(upload, filename, doc_type)
+        job_store.add_batch(self.batch_id, [doc_data.doc_id], [filename])
+        return doc_data, is_new
+
+
+@router.get("/batch/{batch_id}", response_model=BatchResponse)
+async def get_batch_status(batch_id: str, offset: int = 0, limit: int = 100):
+    """
+    Get the aggregated progress of a batch and the status of its documents.
+
+    Parameters:
+    - batch_id: The batch ID
+    - offset: Number of documents to skip
+    - limit: Maximum number of documents to list
+
+    Returns:
+    - BatchResponse with status counts and one page of documents
+    """
+    return _batch_response(batch_id, offset=offset, limit=limit)
+
+
+@router.get("/batch/{batch_id}/results", response_model=BatchResponse)
+async def get_batch_results(batch_id: str, offset: int = 0, limit: int = 100):
+    """
+    Get the Markdown of the documents of a batch.
+
+    Parameters:
+    - batch_id: The batch ID
+    - offset: Number of documents to skip
+    - limit: Maximum number of documents to return
+
+    Returns:
+    - BatchResponse with one page of documents including their Markdown
+    """
+    return _batch_response(batch_id, offset=offset, limit=limit, include_markdown=True)
+
+
+def _open_batch(tenant):
+    """Admit a batch, or reject it with 429 and a Retry-After header if the queue is full."""
+    try:
+        return scheduler.open_batch(tenant)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def _batch_response(batch_id, offset=0, limit=100, include_markdown=False, skipped=None):
+    counts = job_store.count_batch(batch_id)
+    total = sum(counts.values())
+    if not total:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    finished = counts.get(DocumentStatus.COMPLETED.value, 0) + counts.get(DocumentStatus.FAILED.value, 0)
+
+    documents = [
+        document_response(doc_data, include_markdown=include_markdown)
+        for doc_data in job_store.list_batch(batch_id, offset=offset, limit=limit)
+    ]
+
+    return BatchResponse(
+        batch_id=batch_id,
+        total=total,
+        counts=counts,
+        progress=finished / total,
+        skipped=skipped or [],
+        documents=documents
+    )
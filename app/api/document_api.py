@@ -1,100 +1,157 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 import os
+import json
 import uuid
-import tempfile
-import shutil
+import time
+import asyncio
 from datetime import datetime
 
 from app.models.document_models import DocumentResponse, DocumentType, DocumentStatus, DocumentData
-from app.core.document_extractor.pdf_extractor import PDFExtractor
-from app.core.document_extractor.docx_extractor import DocxExtractor
-from app.core.document_extractor.image_handler import ImageHandler
-from app.core.ocr.ocr_processor import OCRProcessor
-from app.core.text_processor.text_cleaner import TextCleaner
-from app.core.text_processor.text_merger import TextMerger
-from app.core.markdown_converter.md_formatter import MarkdownFormatter
+from app.core.pipeline.worker_pool import worker_pool, profile_path
+from app.core.pipeline.progress import progress_broker
+from app.core.pipeline.markdown_stream import open_markdown_stream, remove_markdown_stream, prune_markdown_results
+from app.core.job_store.job_store import create_job_store, ABANDONED_ERROR
+from app.core.cache.result_cache import ResultCache, compute_cache_key
+from app.core.media_store.media_store import get_media_store
+from app.core.upload.spooled_upload import SpooledUpload, UploadTooLargeError
+from app.core.upload.multipart_stream import receive_file, MultipartError
+from app.core.scheduler.job_scheduler import scheduler, QueueFullError
+from app.core.metrics.metrics import observe_pipeline_stats, job_duration, jobs_total, failures_total
+from app.core.document_extractor.page_ranges import parse_page_ranges, format_page_ranges
 
-from config.config import MEDIA_DIR
+from config.config import (
+    RESULT_CACHE_ENABLED, RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES, PROGRESS_HEARTBEAT_SECONDS,
+    MARKDOWN_STREAM_CHUNK_SIZE, PROFILING_ENABLED, JOB_LEASE_SECONDS, MARKDOWN_RESULT_RETENTION_HOURS
+)
 
-# In-memory storage for document data (replace with a database in production)
-documents = {}
+# Persistent job storage, shared by all API worker processes
+job_store = create_job_store()
+
+# How often result files past their retention period are looked for
+PRUNE_INTERVAL_SECONDS = 600
+
+# Conversion results keyed by upload content and pipeline options
+result_cache = (
+    ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES, media_store=get_media_store()) if RESULT_CACHE_ENABLED else None
+)
 
 router = APIRouter()
 
 
-@router.post("/upload", response_model=DocumentResponse)
-async def upload_document(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    doc_type: Optional[str] = Form(None)
-):
+# The upload body is parsed by the endpoint itself, so the form is described here for the API docs
+_UPLOAD_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "doc_type": {"type": "string", "enum": [doc_type.value for doc_type in DocumentType]},
+                        "priority": {"type": "string", "default": "normal"},
+                        "pages": {"type": "string"},
+                        "profile": {"type": "boolean", "default": False},
+                        "profile_dump": {"type": "boolean", "default": False}
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+@router.post("/upload", response_model=DocumentResponse, openapi_extra=_UPLOAD_FORM)
+async def upload_document(request: Request, x_api_key: Optional[str] = Header(None)):
     """
     Upload a document (PDF, DOCX, or image) and convert it to Markdown.
     
+    Jobs are queued by priority and run fairly across tenants. When the queue
+    is full the upload is rejected with 429 and a Retry-After header.
+    
+    The multipart body is parsed as it arrives, and the file is hashed,
+    size-checked and spooled in the same pass.
+    
     Parameters:
     - file: The file to upload
     - doc_type: The document type (pdf, docx, image). If not provided, it will be inferred from the file extension.
+    - priority: Priority class (high, normal, low)
+    - pages: PDF pages to convert, e.g. "1-3,7,10-" (default: all). Pages converted before are reused from the page cache
+    - profile: Record wall and CPU time per stage, page and image, returned as "profile" in the job status
+    - profile_dump: Also write a cProfile dump of the job, downloadable from /api/profile/{doc_id}
+    - X-API-Key: Header identifying the tenant; the client address is used if it is missing
     
     Returns:
-    - DocumentResponse with the document ID and status
+    - DocumentResponse with the document ID, status and queue position
     """
-    # Generate a unique ID for this document
-    doc_id = str(uuid.uuid4())
+    tenant = get_tenant(request, x_api_key)
+    
+    # Reject early, before the upload is hashed and spooled, when the queue is full
+    admit_jobs(tenant)
     
-    # Get the original filename
-    filename = file.filename
+    # Stream the upload into a spool, hashing and sniffing it as it arrives
+    upload = SpooledUpload()
+    try:
+        filename, form = await receive_file(request, upload)
+        if filename is None:
+            raise HTTPException(status_code=400, detail="No file was uploaded")
+        doc_type, priority, pages, profile, profile_dump = _upload_options(form)
+    except UploadTooLargeError as e:
+        upload.discard()
+        raise HTTPException(status_code=413, detail=str(e))
+    except MultipartError as e:
+        upload.discard()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        # Invalid form fields, or the client went away
+        upload.discard()
+        raise
     
     # Determine document type if not provided
-    if not doc_type:
-        if filename.lower().endswith('.pdf'):
-            doc_type = DocumentType.PDF
-        elif filename.lower().endswith(('.docx', '.doc')):
-            doc_type = DocumentType.DOCX
-        elif filename.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.gif')):
-            doc_type = DocumentType.IMAGE
-        else:
+    if doc_type is None:
+        doc_type = infer_document_type(filename, upload)
+        if doc_type is None:
+            upload.discard()
             raise HTTPException(status_code=400, detail="Unsupported file type. Please upload a PDF, DOCX, or image file.")
-    else:
-        doc_type = DocumentType(doc_type.lower())
     
-    # Create a temporary file to store the uploaded content
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    if pages is not None and doc_type != DocumentType.PDF:
+        upload.discard()
+        raise HTTPException(status_code=400, detail="Page ranges are only supported for PDF documents")
     
+    # Check again: other uploads may have filled the queue while this one was spooled
     try:
-        # Write the uploaded file content to the temporary file
-        contents = await file.read()
-        with open(temp_file.name, "wb") as f:
-            f.write(contents)
+        admit_jobs(tenant)
+    except HTTPException:
+        upload.discard()
+        raise
+    
+    try:
+        await spill_if_queued(upload, tenant)
         
-        # Create initial document data
-        document_data = DocumentData(
-            doc_id=doc_id,
-            filename=filename,
-            original_path=temp_file.name,
-            doc_type=doc_type,
-            status=DocumentStatus.PENDING
+        # Profiled uploads are always converted, since a cached result has no timings.
+        # Registering reads the result cache and writes the job store, so it runs off the event loop
+        doc_data, is_new = await run_in_threadpool(
+            register_upload, upload, filename, doc_type, use_cache=not profile, pages=pages
         )
         
-        # Store the document data
-        documents[doc_id] = document_data
-        
-        # Process the document in the background
-        background_tasks.add_task(process_document, doc_id)
+        if is_new:
+            # Queue the document for processing
+            file_bytes = upload.getvalue() if upload.in_memory else None
+            submit_job(doc_data, (doc_data.doc_id, file_bytes, profile, profile_dump), tenant, priority)
         
         # Return the initial response
-        return DocumentResponse(
-            doc_id=doc_id,
-            filename=filename,
-            doc_type=doc_type,
-            status=DocumentStatus.PENDING,
-            created_at=document_data.created_at,
-            updated_at=document_data.updated_at
-        )
+        return document_response(doc_data, include_markdown=False)
     
+    except HTTPException:
+        upload.discard()
+        raise
     except Exception as e:
-        # Clean up the temporary file
-        os.unlink(temp_file.name)
+        # Clean up the spooled upload
+        upload.discard()
         
         # Handle the error
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
@@ -109,23 +166,13 @@ async def get_document_status(doc_id: str):
     - doc_id: The document ID
     
     Returns:
-    - DocumentResponse with the current status
+    - DocumentResponse with the current status, and the queue position and estimated wait of pending jobs
     """
-    if doc_id not in documents:
+    doc_data = job_store.get(doc_id)
+    if doc_data is None:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    doc_data = documents[doc_id]
-    
-    return DocumentResponse(
-        doc_id=doc_id,
-        filename=doc_data.filename,
-        doc_type=doc_data.doc_type,
-        status=doc_data.status,
-        created_at=doc_data.created_at,
-        updated_at=doc_data.updated_at,
-        markdown=doc_data.markdown,
-        error=doc_data.error
-    )
+    return document_response(doc_data)
 
 
 @router.get("/markdown/{doc_id}")
@@ -139,91 +186,606 @@ async def get_document_markdown(doc_id: str):
     Returns:
     - Markdown content as plain text
     """
-    if doc_id not in documents:
+    doc_data = job_store.get(doc_id)
+    if doc_data is None:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    doc_data = documents[doc_id]
-    
     if doc_data.status != DocumentStatus.COMPLETED:
         raise HTTPException(status_code=400, detail=f"Document processing is not complete. Current status: {doc_data.status}")
     
+    # Very large documents are converted in bounded-memory mode and keep their Markdown on disk
+    if doc_data.markdown_path:
+        if not os.path.exists(doc_data.markdown_path):
+            raise HTTPException(status_code=404, detail="Markdown content has expired; upload the document again")
+        return FileResponse(doc_data.markdown_path, media_type="text/markdown")
+    
     if not doc_data.markdown:
         raise HTTPException(status_code=404, detail="Markdown content not found")
     
     return doc_data.markdown
 
 
-def process_document(doc_id: str):
+@router.get("/profile/{doc_id}")
+async def get_document_profile(doc_id: str):
     """
-    Process a document in the background.
+    Download the cProfile dump of a job uploaded with profile_dump=true.
+    
+    The file can be inspected with pstats or tools such as snakeviz.
     
     Parameters:
     - doc_id: The document ID
+    
+    Returns:
+    - The pstats file
     """
-    if doc_id not in documents:
-        return
+    if job_store.get(doc_id) is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    path = profile_path(doc_id)
+    if not os.path.exists(path):
+        # Also when the dump was deleted to keep PROFILE_DIR within its limits
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{doc_id}.prof")
+
+
+@router.delete("/document/{doc_id}")
+async def delete_document(doc_id: str):
+    """
+    Delete a finished job and its results.
+    
+    The images of the result are deleted with it unless other jobs or the
+    result cache still link to them.
+    
+    Parameters:
+    - doc_id: The document ID
+    
+    Returns:
+    - The ID of the deleted document
+    """
+    doc_data = job_store.get(doc_id)
+    if doc_data is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    if doc_data.status not in (DocumentStatus.COMPLETED, DocumentStatus.FAILED):
+        raise HTTPException(status_code=409, detail=f"Document processing is not finished. Current status: {doc_data.status}")
+    
+    job_store.delete(doc_id)
+    await asyncio.to_thread(_delete_results, doc_data)
+    return {"doc_id": doc_id}
+
+
+def _delete_results(doc_data):
+    """Give back the image references of a deleted job and remove its files."""
+    get_media_store().release_images(doc_data.images)
+    for path in (doc_data.markdown_path, profile_path(doc_data.doc_id)):
+        if path and os.path.exists(path):
+            os.unlink(path)
+
+
+@router.get("/markdown/{doc_id}/stream")
+async def stream_document_markdown(doc_id: str):
+    """
+    Stream the Markdown content of a document while it is being converted.
     
-    doc_data = documents[doc_id]
+    PDF pages are sent as soon as they are converted, so the beginning of a
+    long document arrives while later pages are still being extracted and
+    OCR'd. For finished documents the complete Markdown is sent.
+    
+    Parameters:
+    - doc_id: The document ID
+    
+    Returns:
+    - Chunked Markdown content
+    """
+    if job_store.get(doc_id) is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    return StreamingResponse(
+        _markdown_chunks(doc_id),
+        media_type="text/markdown; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _markdown_chunks(doc_id):
+    queue = asyncio.Queue()
+    progress_broker.subscribe(doc_id, asyncio.get_running_loop(), queue)
+    stream_file = None
     
     try:
-        # Update status to processing
-        doc_data.status = DocumentStatus.PROCESSING
-        doc_data.updated_at = datetime.now()
-        
-        # Extract content based on document type
-        if doc_data.doc_type == DocumentType.PDF:
-            # Process PDF
-            extractor = PDFExtractor(doc_data.original_path)
-            extracted_data = extractor.extract_all()
-        elif doc_data.doc_type == DocumentType.DOCX:
-            # Process DOCX
-            extractor = DocxExtractor(doc_data.original_path)
-            extracted_data = extractor.extract_all()
-        elif doc_data.doc_type == DocumentType.IMAGE:
-            # Process image
-            handler = ImageHandler(file_path=doc_data.original_path)
-            image_info = handler.process_image()
+        while True:
+            doc_data = job_store.get(doc_id)
+            finished = doc_data is None or _is_finished(doc_data)
             
-            # Create a structure similar to document extraction
-            extracted_data = {
-                "text": [],
-                "images": [image_info]
-            }
-        else:
-            raise ValueError(f"Unsupported document type: {doc_data.doc_type}")
+            # The stream file is removed once the job finishes; an open handle keeps it readable
+            if stream_file is None:
+                stream_file = open_markdown_stream(doc_id)
+            
+            if stream_file is not None:
+                while True:
+                    data = await run_in_threadpool(stream_file.read, MARKDOWN_STREAM_CHUNK_SIZE)
+                    if not data:
+                        break
+                    yield data
+            
+            if finished:
+                if stream_file is None and doc_data is not None:
+                    if doc_data.markdown_path and os.path.exists(doc_data.markdown_path):
+                        stream_file = open(doc_data.markdown_path, "rb")
+                        while True:
+                            data = await run_in_threadpool(stream_file.read, MARKDOWN_STREAM_CHUNK_SIZE)
+                            if not data:
+                                break
+                            yield data
+                    elif doc_data.markdown:
+                        yield doc_data.markdown
+                return
+            
+            # Wait for the next page (or any other progress) before reading again
+            try:
+                await asyncio.wait_for(queue.get(), timeout=PROGRESS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        progress_broker.unsubscribe(doc_id, queue)
+        if stream_file is not None:
+            stream_file.close()
+
+
+@router.get("/events/{doc_id}")
+async def stream_document_events(doc_id: str):
+    """
+    Stream the progress of a document processing job as Server-Sent Events.
+    
+    Emits stage transitions (extract, ocr, clean, merge, format), page and image
+    counters within a stage, and a final completed or failed event, after which
+    the stream ends. One connection replaces polling /status.
+    
+    Parameters:
+    - doc_id: The document ID
+    
+    Returns:
+    - text/event-stream response
+    """
+    if job_store.get(doc_id) is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    return StreamingResponse(
+        _document_events(doc_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _document_events(doc_id):
+    queue = asyncio.Queue()
+    # Subscribe before reading the current state so no event is missed in between
+    progress_broker.subscribe(doc_id, asyncio.get_running_loop(), queue)
+    
+    try:
+        doc_data = job_store.get(doc_id)
+        yield _format_event({"doc_id": doc_id, "event": "status", "status": doc_data.status.value})
+        if _is_finished(doc_data):
+            yield _format_event(_final_event(doc_data))
+            return
         
-        # Process OCR for images
-        ocr_processor = OCRProcessor()
-        ocr_data = ocr_processor.process_document_images(extracted_data)
+        latest = progress_broker.latest(doc_id)
+        if latest:
+            yield _format_event(latest)
+        
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=PROGRESS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Jobs run by another API worker publish no events here, so check the job store
+                doc_data = job_store.get(doc_id)
+                if doc_data is None or _is_finished(doc_data):
+                    if doc_data is not None:
+                        yield _format_event(_final_event(doc_data))
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            
+            yield _format_event(event)
+            if event["event"] in ("completed", "failed"):
+                return
+    finally:
+        progress_broker.unsubscribe(doc_id, queue)
+
+
+def _is_finished(doc_data):
+    return doc_data.status in (DocumentStatus.COMPLETED, DocumentStatus.FAILED)
+
+
+def _final_event(doc_data):
+    event = "completed" if doc_data.status == DocumentStatus.COMPLETED else "failed"
+    return {"doc_id": doc_data.doc_id, "event": event, "status": doc_data.status.value, "error": doc_data.error}
+
+
+def _format_event(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+def _form_flag(value):
+    """Read a boolean form field the way FastAPI's Form(bool) does."""
+    return (value or "").strip().lower() in ("1", "true", "on", "yes")
+
+
+def _upload_options(form):
+    """
+    Validate the form fields of an upload.
+    
+    Parameters:
+    - form: Dictionary of the form fields
+    
+    Returns:
+    - Tuple of (DocumentType or None to infer it, priority, canonical page selection, profile, profile_dump)
+    
+    Raises:
+    - HTTPException 400 if a field is invalid
+    """
+    doc_type = form.get("doc_type") or None
+    if doc_type is not None:
+        try:
+            doc_type = DocumentType(doc_type.lower())
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Unknown document type: {doc_type}")
+    
+    priority = form.get("priority") or "normal"
+    check_priority(priority)
+    pages = normalize_pages(form.get("pages"))
+    
+    # A cProfile dump comes with the stage breakdown
+    profile_dump = _form_flag(form.get("profile_dump"))
+    profile = _form_flag(form.get("profile")) or profile_dump
+    if profile and not PROFILING_ENABLED:
+        raise HTTPException(status_code=400, detail="Profiling is disabled on this server")
+    
+    return doc_type, priority, pages, profile, profile_dump
+
+
+def get_tenant(request, api_key=None):
+    """Identify the tenant of a request by its API key, falling back to the client address."""
+    if api_key:
+        return f"key:{api_key}"
+    return f"addr:{request.client.host if request.client else 'unknown'}"
+
+
+def check_priority(priority):
+    """Reject unknown priority classes."""
+    if priority not in scheduler.priorities:
+        raise HTTPException(status_code=400, detail=f"Unknown priority. Use one of: {', '.join(scheduler.priorities)}")
+
+
+def admit_jobs(tenant, count=1):
+    """
+    Check that the scheduler can take more jobs of a tenant.
+    
+    Parameters:
+    - tenant: The tenant submitting the jobs
+    - count: Number of jobs
+    
+    Raises:
+    - HTTPException 429 with a Retry-After header if the queue is full
+    """
+    try:
+        scheduler.check_admission(tenant, count)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def submit_job(doc_data, args, tenant, priority, batch=None):
+    """
+    Queue a registered job for processing.
+    
+    Parameters:
+    - doc_data: DocumentData of the job from register_upload()
+    - args: Arguments for process_document()
+    - tenant: The tenant submitting the job
+    - priority: Priority class of the job
+    - batch: Scheduler batch handle if the job belongs to a batch upload
+    
+    Raises:
+    - HTTPException 429 if the queue filled up while the upload was registered; the job is failed
+    """
+    try:
+        scheduler.submit(doc_data.doc_id, process_document, args, tenant, priority, batch=batch)
+    except QueueFullError as e:
+        job_store.update_status([doc_data.doc_id], DocumentStatus.FAILED, datetime.now(), error=str(e))
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+async def spill_if_queued(upload, tenant):
+    """
+    Move an in-memory upload to disk unless its job can start right away.
+    
+    Jobs waiting in the queue then only hold the path of their upload, so
+    memory use does not grow with the queue depth.
+    
+    Parameters:
+    - upload: The SpooledUpload of the job
+    - tenant: The tenant submitting the job
+    """
+    if upload.in_memory and not scheduler.can_start_now(tenant):
+        await run_in_threadpool(upload.spill)
+
+
+def normalize_pages(pages):
+    """
+    Validate a page selection and bring it into its canonical form.
+    
+    Parameters:
+    - pages: Page selection such as "1-3,7,10-", or None/empty for all pages
+    
+    Returns:
+    - The canonical selection, or None for all pages
+    
+    Raises:
+    - HTTPException 400 if the selection is malformed
+    """
+    if pages is None or not pages.strip():
+        return None
+    try:
+        return format_page_ranges(parse_page_ranges(pages))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def document_response(doc_data, include_markdown=True):
+    """Build the API response for a job, with its queue position while it is pending."""
+    response = DocumentResponse(
+        doc_id=doc_data.doc_id,
+        filename=doc_data.filename,
+        doc_type=doc_data.doc_type,
+        status=doc_data.status,
+        created_at=doc_data.created_at,
+        updated_at=doc_data.updated_at,
+        markdown=doc_data.markdown if include_markdown else None,
+        error=doc_data.error,
+        pages=doc_data.pages,
+        profile=doc_data.profile,
+        ocr_skipped_images=doc_data.ocr.skipped_images if doc_data.ocr else None
+    )
+    
+    # Bounded-memory results are too large for the response and are downloaded on their own
+    if doc_data.markdown_path and os.path.exists(doc_data.markdown_path):
+        response.markdown_url = f"/api/markdown/{doc_data.doc_id}"
+    
+    # Only the API worker that queued the job knows its position
+    queue_info = scheduler.queue_info(doc_data.doc_id) if doc_data.status == DocumentStatus.PENDING else None
+    if queue_info is not None:
+        response.queue_position, response.estimated_wait_seconds = queue_info
+    
+    return response
+
+
+def register_upload(upload, filename, doc_type, use_cache=True, pages=None):
+    """
+    Create the conversion job for a spooled upload.
+    
+    Uploads whose content was converted before complete immediately from the
+    result cache, and uploads identical to a conversion that is still running
+    attach to that job instead of creating a new one. The returned job then
+    carries the caller's filename, but the stored job keeps the filename of
+    the upload that created it.
+    
+    Parameters:
+    - upload: The SpooledUpload holding the file content
+    - filename: The original filename
+    - doc_type: The DocumentType
+    - use_cache: Reuse cached results and running conversions of the same content
+    - pages: Canonical PDF page selection, or None for all pages
+    
+    Returns:
+    - Tuple of (DocumentData, whether the job still has to be processed)
+    """
+    # Generate a unique ID for this document
+    doc_id = str(uuid.uuid4())
+    
+    if not use_cache:
+        document_data = DocumentData(
+            doc_id=doc_id,
+            filename=filename,
+            original_path=upload.path or "",
+            doc_type=doc_type,
+            status=DocumentStatus.PENDING,
+            pages=pages
+        )
+        job_store.add(document_data)
+        return document_data, True
+    
+    # Look for an identical earlier conversion
+    options = {"doc_type": doc_type.value}
+    if pages is not None:
+        options["pages"] = pages
+    cache_key = compute_cache_key(upload.content_hash, options)
+    
+    cached_result = result_cache.get(cache_key) if result_cache is not None else None
+    if cached_result is not None:
+        upload.discard()
         
-        # Clean the text
-        text_cleaner = TextCleaner()
-        cleaned_data = text_cleaner.clean_document_text(ocr_data)
+        # Same content was converted before: the job is complete right away
+        document_data = DocumentData(
+            doc_id=doc_id,
+            filename=filename,
+            original_path="",
+            doc_type=doc_type,
+            status=DocumentStatus.COMPLETED,
+            cache_key=cache_key,
+            content_hash=upload.content_hash,
+            pages=pages
+        )
+        _apply_result(document_data, cached_result)
+        # The job holds its own references to the images, which outlive the cache entry
+        get_media_store().acquire_images(document_data.images)
+        job_store.add(document_data)
+        jobs_total.inc(doc_type=doc_type.value, status="cached")
+        return document_data, False
+    
+    # Create initial document data; small uploads stay in memory and have no file on disk
+    document_data = DocumentData(
+        doc_id=doc_id,
+        filename=filename,
+        original_path=upload.path or "",
+        doc_type=doc_type,
+        status=DocumentStatus.PENDING,
+        cache_key=cache_key,
+        content_hash=upload.content_hash,
+        pages=pages
+    )
+    
+    # Store the document data, or attach to an identical conversion already in flight
+    active_data = job_store.add_or_get_active(document_data)
+    if active_data.doc_id != doc_id:
+        upload.discard()
+        # Responses name the file the caller uploaded
+        active_data.filename = filename
+        return active_data, False
+    
+    return document_data, True
+
+
+async def process_document(doc_id: str, file_bytes: Optional[bytes] = None, profile: bool = False,
+                           profile_dump: bool = False):
+    """
+    Process a document in the background.
+    
+    The conversion itself runs in the worker process pool so that parsing,
+    OCR and formatting never block the API event loop.
+    
+    Parameters:
+    - doc_id: The document ID
+    - file_bytes: Content of small uploads that were kept in memory
+    - profile: Record the time spent per stage, page and image
+    - profile_dump: Also write a cProfile dump of the job
+    """
+    doc_data = job_store.get(doc_id)
+    if doc_data is None:
+        return
+    
+    doc_type = doc_data.doc_type.value
+    started = time.monotonic()
+    
+    try:
+        # Update status to processing
+        job_store.update_status([doc_id], DocumentStatus.PROCESSING, datetime.now())
         
-        # Merge document text and OCR text
-        text_merger = TextMerger()
-        merged_data = text_merger.merge_document_and_ocr(cleaned_data)
+        # Run extract → OCR → clean → merge → format in a worker process
+        source = file_bytes if file_bytes is not None else doc_data.original_path
+        size = len(file_bytes) if file_bytes is not None else os.path.getsize(doc_data.original_path)
+        # Profiled jobs convert every page again; others reuse and fill the page cache
+        content_hash = None if profile else doc_data.content_hash
+        result = await worker_pool.run_pipeline(
+            doc_id, source, doc_type, profile, profile_dump, doc_data.pages, content_hash
+        )
         
-        # Convert to Markdown
-        md_formatter = MarkdownFormatter()
-        markdown = md_formatter.format_document_as_markdown(merged_data)
+        # Record stage timings and throughput
+        observe_pipeline_stats(result.get("stats", {}), size)
+        job_duration.observe(time.monotonic() - started, doc_type=doc_type)
+        jobs_total.inc(doc_type=doc_type, status="completed")
         
         # Update document data
-        doc_data.text = merged_data.get("text", [])
-        doc_data.images = merged_data.get("images", [])
-        doc_data.ocr = merged_data.get("ocr")
-        doc_data.merged_text = merged_data.get("merged_text", [])
-        doc_data.markdown = markdown
+        _apply_result(doc_data, result)
+        if profile:
+            doc_data.profile = result.get("profile")
+            if profile_dump:
+                doc_data.profile = {**doc_data.profile, "dump_url": f"/api/profile/{doc_id}"}
         doc_data.status = DocumentStatus.COMPLETED
         doc_data.updated_at = datetime.now()
+        job_store.save(doc_data)
+        progress_broker.publish({"doc_id": doc_id, "event": "completed", "status": doc_data.status.value})
+        
+        # Remember the result for later uploads of the same content; bounded-memory
+        # results only point to their Markdown file, and their pages are cached already
+        if result_cache is not None and doc_data.cache_key and not doc_data.markdown_path:
+            try:
+                await asyncio.to_thread(result_cache.put, doc_data.cache_key, result)
+            except Exception as e:
+                print(f"Error caching result for {doc_id}: {e}")
         
     except Exception as e:
+        # Pipeline errors carry the stage they failed in; anything else failed around the workers
+        failures_total.inc(stage=getattr(e, "stage", "worker"), exception=type(e).__name__)
+        jobs_total.inc(doc_type=doc_type, status="failed")
+        
         # Update status to failed
-        doc_data.status = DocumentStatus.FAILED
-        doc_data.error = str(e)
-        doc_data.updated_at = datetime.now()
+        job_store.update_status([doc_id], DocumentStatus.FAILED, datetime.now(), error=str(e))
+        progress_broker.publish({"doc_id": doc_id, "event": "failed", "status": DocumentStatus.FAILED.value, "error": str(e)})
     
     finally:
-        # Clean up the temporary file
-        if os.path.exists(doc_data.original_path):
-            os.unlink(doc_data.original_path) 
\ No newline at end of file
+        # Clean up the temporary file and the incremental Markdown
+        if doc_data.original_path and os.path.exists(doc_data.original_path):
+            os.unlink(doc_data.original_path)
+        remove_markdown_stream(doc_id)
+
+
+async def maintain_job_leases():
+    """
+    Renew the leases of the jobs queued in this API worker and fail abandoned jobs.
+    
+    The first pass runs at startup, so jobs left pending or processing by a
+    crash or restart are failed once their lease has run out, instead of
+    keeping identical uploads attached to them forever.
+    """
+    while True:
+        try:
+            now = datetime.now()
+            await asyncio.to_thread(job_store.renew_leases, scheduler.active_doc_ids(), now)
+            expired = await asyncio.to_thread(job_store.expire_stale, now)
+            for doc_id in expired:
+                print(f"Failed abandoned job {doc_id}")
+                # Nothing will convert the upload any more
+                doc_data = job_store.get(doc_id)
+                if doc_data is not None and doc_data.original_path and os.path.exists(doc_data.original_path):
+                    os.unlink(doc_data.original_path)
+                remove_markdown_stream(doc_id)
+                progress_broker.publish({
+                    "doc_id": doc_id, "event": "failed", "status": DocumentStatus.FAILED.value, "error": ABANDONED_ERROR
+                })
+        except Exception as e:
+            print(f"Error renewing job leases: {e}")
+        
+        await asyncio.sleep(JOB_LEASE_SECONDS / 4)
+
+
+async def prune_result_files():
+    """Delete the Markdown files of bounded-memory results once MARKDOWN_RESULT_RETENTION_HOURS have passed."""
+    while MARKDOWN_RESULT_RETENTION_HOURS > 0:
+        try:
+            removed = await asyncio.to_thread(prune_markdown_results, MARKDOWN_RESULT_RETENTION_HOURS * 3600)
+            if removed:
+                print(f"Deleted {removed} expired Markdown result files")
+        except Exception as e:
+            print(f"Error pruning Markdown results: {e}")
+        
+        await asyncio.sleep(PRUNE_INTERVAL_SECONDS)
+
+
+def infer_document_type(filename, upload=None):
+    """Infer the document type from the sniffed file format, falling back to the extension."""
+    if upload is not None:
+        if upload.detected_type is not None:
+            return upload.detected_type
+        # Other ZIP files are not convertible, whatever their name
+        if upload.is_plain_zip:
+            return None
+    
+    filename = (filename or "").lower()
+    if filename.endswith('.pdf'):
+        return DocumentType.PDF
+    elif filename.endswith(('.docx', '.doc')):
+        return DocumentType.DOCX
+    elif filename.endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.gif')):
+        return DocumentType.IMAGE
+    return None
+
+
+def _apply_result(doc_data, result):
+    """Copy a pipeline result into the document data."""
+    doc_data.text = result["text"]
+    doc_data.images = result["images"]
+    doc_data.ocr = result["ocr"]
+    doc_data.merged_text = result["merged_text"]
+    doc_data.markdown = result["markdown"]
+    doc_data.markdown_path = result.get("markdown_path")
@@ -0,0 +1,48 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.api.document_api import job_store
+from app.core.pipeline.worker_pool import worker_pool
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def liveness():
+    """
+    Liveness probe: the API process is up and serving requests.
+
+    Returns:
+    - {"status": "ok"}
+    """
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readiness():
+    """
+    Readiness probe: the worker processes are running and their OCR models are loaded.
+
+    Returns 503 while the workers are still warming up, so traffic can be
+    routed to the instance as soon as conversions no longer wait for model
+    loading.
+
+    Returns:
+    - Readiness details of the worker pool and the job store
+    """
+    status = worker_pool.readiness()
+
+    try:
+        job_store.get("readyz")
+        status["job_store"] = True
+    except Exception as e:
+        print(f"Job store not ready: {e}")
+        status["job_store"] = False
+
+    ready = status["ready"] and status["job_store"]
+    if not ready:
+        # Warm up again, e.g. after the worker processes were replaced
+        worker_pool.ensure_warm_up()
+
+    status["ready"] = ready
+    return JSONResponse(status_code=200 if ready else 503, content=status)
@@ -0,0 +1,40 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.api.document_api import result_cache
+from app.core.scheduler.job_scheduler import scheduler
+from app.core.metrics.metrics import registry
+
+router = APIRouter()
+
+# Metrics read from the scheduler and the result cache when scraped
+registry.gauge("doc2md_queue_depth", "Jobs waiting in the queue", function=lambda: scheduler.queue_depth)
+registry.gauge("doc2md_jobs_in_flight", "Jobs being converted", function=lambda: scheduler.running)
+registry.counter(
+    "doc2md_cache_hits_total", "Result cache hits",
+    function=lambda: result_cache.hits if result_cache is not None else 0
+)
+registry.counter(
+    "doc2md_cache_misses_total", "Result cache misses",
+    function=lambda: result_cache.misses if result_cache is not None else 0
+)
+registry.gauge(
+    "doc2md_cache_hit_ratio", "Share of uploads answered from the result cache",
+    function=lambda: result_cache.hit_ratio() if result_cache is not None else 0.0
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Expose service metrics in the Prometheus text format.
+    
+    Includes per-stage latency histograms, pages/images/bytes processed,
+    queue depth, in-flight jobs, OCR throughput, cache hit ratio, and
+    failures by stage and exception type. Every API worker process reports
+    its own values.
+    
+    Returns:
+    - Metrics in the Prometheus text exposition format
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
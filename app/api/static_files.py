@@ -1,8 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import FileResponse
-import os
 
-from config.config import IMAGES_DIR
+from app.core.media_store.media_store import get_media_store
 
 router = APIRouter()
 
@@ -18,9 +17,10 @@ async def get_image(filename: str):
     Returns:
     - The image file
     """
-    image_path = os.path.join(IMAGES_DIR, filename)
-    
-    if not os.path.exists(image_path):
+    # Images are stored in directories by content hash; the store knows where
+    media_store = get_media_store()
+    if not media_store.exists(filename):
         raise HTTPException(status_code=404, detail="Image not found")
+    image_path = media_store.path(filename)
     
     return FileResponse(image_path) 
\ No newline at end of file
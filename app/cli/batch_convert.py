@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from config.config import WORKER_PROCESSES, WORKER_START_METHOD, OCR_POOL_WARM_UP
+
+# File extensions the pipeline can convert, by document type
+SUPPORTED_EXTENSIONS = {
+    ".pdf": "pdf",
+    ".docx": "docx",
+    ".doc": "docx",
+    ".png": "image",
+    ".jpg": "image",
+    ".jpeg": "image",
+    ".bmp": "image",
+    ".tiff": "image",
+    ".gif": "image"
+}
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def _init_worker():
+    """Load the OCR models once per worker process."""
+    if OCR_POOL_WARM_UP:
+        from app.core.ocr.ocr_pool import get_ocr_pool
+        try:
+            get_ocr_pool().warm_up()
+        except Exception as e:
+            print(f"Error loading OCR models: {e}")
+
+
+def convert_file(input_path, output_path, doc_type):
+    """
+    Convert one document and write its Markdown and images below the output root.
+
+    Images go to a "<name>_images" directory next to the Markdown file and
+    are linked with relative paths, so the output tree can be moved as a whole.
+
+    Args:
+        input_path: Path to the document
+        output_path: Path of the Markdown file to write
+        doc_type: Document type value (pdf, docx, image)
+
+    Returns:
+        Dictionary with the page and image counts of the document
+    """
+    from app.core.pipeline.document_pipeline import DocumentPipeline
+    from app.core.media_store.media_store import MediaStore
+
+    output_dir = os.path.dirname(output_path)
+    images_dirname = os.path.splitext(os.path.basename(output_path))[0] + "_images"
+    images_dir = os.path.join(output_dir, images_dirname)
+
+    # Drop the images of an earlier, failed or outdated conversion of this document
+    shutil.rmtree(images_dir, ignore_errors=True)
+    os.makedirs(images_dir, exist_ok=True)
+
+    try:
+        # A flat store without reference counts: the image directory belongs to this document only
+        media_store = MediaStore(images_dir, shard_levels=0)
+        pipeline = DocumentPipeline(media_store=media_store, image_base_url=quote(images_dirname))
+        # Very large PDFs are converted in bounded-memory mode, which writes the Markdown file itself
+        result = pipeline.run(input_path, doc_type, markdown_path=output_path)
+
+        if result.get("markdown_path") is None:
+            # Write to a temporary file first so an interrupted run never leaves a partial Markdown file
+            temp_path = output_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(result["markdown"] or "")
+            os.replace(temp_path, output_path)
+    finally:
+        # Documents without images do not need an image directory; rmdir only removes it when empty
+        try:
+            os.rmdir(images_dir)
+        except OSError:
+            pass
+
+    return {"pages": result.get("page_count", 1), "images": len(result["images"])}
+
+
+def find_documents(input_root):
+    """
+    Walk a directory tree and list the documents that can be converted.
+
+    Args:
+        input_root: Directory to search
+
+    Returns:
+        Sorted list of (relative path, document type) tuples
+    """
+    documents = []
+    for dirpath, dirnames, filenames in os.walk(input_root):
+        # Skip hidden directories such as .git
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith("."))
+        for filename in filenames:
+            if filename.startswith("."):
+                continue
+            doc_type = SUPPORTED_EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+            if doc_type:
+                path = os.path.join(dirpath, filename)
+                documents.append((os.path.relpath(path, input_root), doc_type))
+    return sorted(documents)
+
+
+def output_paths(documents, output_root):
+    """
+    Map documents to the Markdown files they are converted to.
+
+    "report.pdf" becomes "report.md"; if several documents in a directory
+    share a name ("report.pdf" and "report.docx"), their extension is kept
+    ("report.pdf.md") so they do not overwrite each other.
+
+    Args:
+        documents: List of (relative path, document type) tuples
+        output_root: Directory for the Markdown files
+
+    Returns:
+        Dictionary of relative path to output path
+    """
+    stems = {}
+    for relative_path, _ in documents:
+        stem = os.path.splitext(relative_path)[0].lower()
+        stems[stem] = stems.get(stem, 0) + 1
+
+    paths = {}
+    for relative_path, _ in documents:
+        stem = os.path.splitext(relative_path)[0]
+        name = stem if stems[stem.lower()] == 1 else relative_path
+        paths[relative_path] = os.path.join(output_root, name + ".md")
+    return paths
+
+
+def load_manifest(manifest_path):
+    """
+    Read the records of earlier runs.
+
+    Args:
+        manifest_path: Path to the JSONL manifest
+
+    Returns:
+        Dictionary of relative path to its most recent record
+    """
+    records = {}
+    if not os.path.exists(manifest_path):
+        return records
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut off if the previous run was killed
+                continue
+            records[record["path"]] = record
+    return records
+
+
+def _is_done(record, stat, skip_failed):
+    if record is None or record.get("size") != stat.st_size or record.get("mtime") != stat.st_mtime:
+        return False
+    return record["status"] == "completed" or (skip_failed and record["status"] == "failed")
+
+
+def run(input_root, output_root, workers=WORKER_PROCESSES, manifest_path=None, skip_failed=False):
+    """
+    Convert every document below input_root into Markdown below output_root.
+
+    Each finished document is appended to the manifest, so running the same
+    command again skips documents that were converted already (unless the
+    file changed since).
+
+    Args:
+        input_root: Directory with the documents
+        output_root: Directory for the Markdown files and images
+        workers: Number of worker processes
+        manifest_path: Manifest file; defaults to manifest.jsonl in output_root
+        skip_failed: Also skip documents that failed in an earlier run
+
+    Returns:
+        Summary dictionary with counts, elapsed time and throughput
+    """
+    input_root = os.path.abspath(input_root)
+    output_root = os.path.abspath(output_root)
+    manifest_path = manifest_path or os.path.join(output_root, MANIFEST_NAME)
+    os.makedirs(output_root, exist_ok=True)
+
+    records = load_manifest(manifest_path)
+    documents = find_documents(input_root)
+    outputs = output_paths(documents, output_root)
+    pending = []
+    skipped = 0
+    for relative_path, doc_type in documents:
+        input_path = os.path.join(input_root, relative_path)
+        stat = os.stat(input_path)
+        if _is_done(records.get(relative_path), stat, skip_failed):
+            skipped += 1
+            continue
+        pending.append((relative_path, doc_type, stat))
+
+    print(f"{len(pending)} documents to convert, {skipped} already done")
+
+    summary = {"completed": 0, "failed": 0, "skipped": skipped, "pages": 0, "images": 0}
+    started = time.monotonic()
+
+    context = multiprocessing.get_context(WORKER_START_METHOD)
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker)
+    manifest = open(manifest_path, "a", encoding="utf-8")
+    interrupted = False
+    try:
+        in_flight = {}
+        queue = iter(pending)
+        done_count = 0
+
+        while True:
+            # Keep a bounded number of documents in flight instead of submitting the whole tree at once
+            for relative_path, doc_type, stat in queue:
+                output_path = outputs[relative_path]
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                future = executor.submit(convert_file, os.path.join(input_root, relative_path), output_path, doc_type)
+                in_flight[future] = (relative_path, stat, time.monotonic())
+                if len(in_flight) >= workers * 2:
+                    break
+
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                relative_path, stat, submitted = in_flight.pop(future)
+                record = {
+                    "path": relative_path,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "seconds": round(time.monotonic() - submitted, 3)
+                }
+                try:
+                    counts = future.result()
+                    record.update(status="completed", **counts)
+                    summary["completed"] += 1
+                    summary["pages"] += counts["pages"]
+                    summary["images"] += counts["images"]
+                except Exception as e:
+                    record.update(status="failed", error=str(e))
+                    summary["failed"] += 1
+
+                manifest.write(json.dumps(record, ensure_ascii=False) + "\n")
+                manifest.flush()
+
+                done_count += 1
+                print(f"[{done_count}/{len(pending)}] {record['status']}: {relative_path}")
+
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume")
+        interrupted = True
+        raise
+    finally:
+        manifest.close()
+        executor.shutdown(wait=not interrupted, cancel_futures=True)
+
+    elapsed = time.monotonic() - started
+    summary["seconds"] = round(elapsed, 3)
+    summary["files_per_second"] = round((summary["completed"] + summary["failed"]) / elapsed, 3) if elapsed else 0.0
+    summary["pages_per_second"] = round(summary["pages"] / elapsed, 3) if elapsed else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a directory tree of PDF, DOCX and image files to Markdown")
+    parser.add_argument("input_dir", help="Directory with the documents to convert")
+    parser.add_argument("output_dir", help="Directory for the Markdown files and their images")
+    parser.add_argument("--workers", type=int, default=WORKER_PROCESSES, help="Number of worker processes")
+    parser.add_argument("--manifest", help=f"Progress manifest (default: <output_dir>/{MANIFEST_NAME})")
+    parser.add_argument("--skip-failed", action="store_true", help="Do not retry documents that failed before")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"Input directory not found: {args.input_dir}")
+
+    try:
+        summary = run(args.input_dir, args.output_dir, workers=max(1, args.workers),
+                      manifest_path=args.manifest, skip_failed=args.skip_failed)
+    except KeyboardInterrupt:
+        return 130
+
+    print(
+        f"Converted {summary['completed']} documents ({summary['failed']} failed, {summary['skipped']} skipped) "
+        f"in {summary['seconds']:.1f}s: {summary['files_per_second']:.2f} files/s, "
+        f"{summary['pages_per_second']:.2f} pages/s"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from config.config import (
+    OCR_LANGUAGE, OCR_USE_ANGLE_CLS, OCR_USE_GPU, OCR_GATE_ENABLED, OCR_GATE_MIN_SIDE, OCR_GATE_MAX_ASPECT,
+    OCR_GATE_MIN_STDDEV, OCR_GATE_MIN_EDGE_DENSITY, OCR_GATE_DETECT, OCR_PREPROCESS_ENABLED, OCR_MAX_SIDE,
+    OCR_TARGET_DPI, OCR_PREPROCESS_GRAYSCALE, OCR_NORMALIZE_CONTRAST
+)
+
+# Bump when the pipeline output changes so stale cached conversions are not reused
+PIPELINE_VERSION = 2
+
+# Share of the size budget a process may write before it rescans the directory other processes write to
+RESCAN_FRACTION = 1 / 16
+
+
+def compute_cache_key(content_hash, options=None):
+    """
+    Compute the cache key of a conversion.
+
+    Args:
+        content_hash: SHA-256 hex digest of the uploaded bytes
+        options: Dictionary of pipeline options that affect the output
+
+    Returns:
+        SHA-256 hex digest identifying the conversion result
+    """
+    key_data = {
+        "content": content_hash,
+        "options": options or {},
+        "ocr": {
+            "lang": OCR_LANGUAGE,
+            "use_angle_cls": OCR_USE_ANGLE_CLS,
+            "use_gpu": OCR_USE_GPU,
+            # Images the gate skips get no OCR text
+            "gate": [
+                OCR_GATE_ENABLED, OCR_GATE_MIN_SIDE, OCR_GATE_MAX_ASPECT, OCR_GATE_MIN_STDDEV,
+                OCR_GATE_MIN_EDGE_DENSITY, OCR_GATE_DETECT
+            ],
+            # OCR sees the preprocessed image
+            "preprocess": [
+                OCR_PREPROCESS_ENABLED, OCR_MAX_SIDE, OCR_TARGET_DPI, OCR_PREPROCESS_GRAYSCALE,
+                OCR_NORMALIZE_CONTRAST
+            ]
+        },
+        "pipeline_version": PIPELINE_VERSION
+    }
+    encoded = json.dumps(key_data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded, LRU-evicted on-disk cache of pipeline results keyed by content.
+
+    The API process and every conversion worker open the same directory,
+    so the size budget applies to the directory, not to one process. Each
+    process rescans the directory after writing RESCAN_FRACTION of the
+    budget and evicts by the sizes and access times on disk, so the cache
+    overshoots max_bytes by at most that fraction per process.
+
+    With a media store, every entry holds a reference to the images its
+    result links, given back when the entry is evicted.
+    """
+
+    def __init__(self, cache_dir, max_bytes, media_store=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.media_store = media_store
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        # Bytes this process has written since it last scanned the directory
+        self._unscanned_bytes = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        """Rebuild the LRU order from the files on disk (oldest access first), including other processes' entries."""
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        # Evicted by another process meanwhile
+                        continue
+                    found.append((stat.st_mtime, name[:-5], stat.st_size))
+
+        entries = OrderedDict()
+        total_bytes = 0
+        for _, key, size in sorted(found):
+            entries[key] = size
+            total_bytes += size
+
+        with self._lock:
+            self._entries = entries
+            self._total_bytes = total_bytes
+            self._unscanned_bytes = 0
+
+    def get(self, key):
+        """
+        Look up a cached result.
+
+        Args:
+            key: Cache key from compute_cache_key()
+
+        Returns:
+            Pipeline result dictionary, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            # Record the access for LRU ordering, also for other processes sharing the directory
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+                self._forget(key)
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if key not in self._entries:
+                self._entries[key] = os.path.getsize(path)
+                self._total_bytes += self._entries[key]
+            self._entries.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        """
+        Store a pipeline result, evicting least recently used entries when over budget.
+
+        Args:
+            key: Cache key from compute_cache_key()
+            result: Pipeline result dictionary
+        """
+        data = json.dumps(result, default=str).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        if os.path.exists(path):
+            # Results of the same key are the same; the entry keeps the references it holds
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if self.media_store is not None:
+            self.media_store.acquire_images(result.get("images"))
+        try:
+            # Write to a temporary file first so readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if self.media_store is not None:
+                self.media_store.release_images(result.get("images"))
+            raise
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._unscanned_bytes += len(data)
+            rescan = self._unscanned_bytes >= self.max_bytes * RESCAN_FRACTION
+
+        if rescan:
+            # Other processes' entries count against the budget too
+            self._load_index()
+        with self._lock:
+            evicted = self._evict()
+        for key in evicted:
+            self._remove(key)
+
+    def contains(self, key):
+        """Return True if a result is cached under the key, without reading it."""
+        # Other processes sharing the directory may have added it
+        return os.path.exists(self._path(key))
+
+    def hit_ratio(self):
+        """Return the fraction of lookups served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _forget(self, key):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Drop least recently used entries from the index until it fits the budget, returning their keys."""
+        evicted = []
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            evicted.append(key)
+        return evicted
+
+    def _remove(self, key):
+        """Delete an evicted entry and give back the references to its images."""
+        path = self._path(key)
+        images = None
+        if self.media_store is not None:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    images = json.load(f).get("images")
+            except (OSError, ValueError):
+                pass
+        try:
+            os.unlink(path)
+        except OSError:
+            # Evicted by another process, which gives the references back
+            return
+        if images:
+            self.media_store.release_images(images)
+
+
+class PageCache:
+    """
+    Per-page conversion results of one document, stored in a ResultCache.
+
+    Entries are keyed by the document content and page number, so a request
+    for other pages of a document converted before only converts the pages
+    that are missing.
+    """
+
+    def __init__(self, cache, content_hash, options=None):
+        self.cache = cache
+        self.content_hash = content_hash
+        self.options = options or {}
+
+    def key(self, page_number):
+        return compute_cache_key(self.content_hash, dict(self.options, page=page_number))
+
+    def contains(self, page_number):
+        """Return True if the result of a page is cached."""
+        return self.cache.contains(self.key(page_number))
+
+    def get(self, page_number):
+        """Return the cached result of a page, or None."""
+        return self.cache.get(self.key(page_number))
+
+    def put(self, page_number, page_result):
+        """Store the result (text, images, OCR and Markdown) of a page."""
+        self.cache.put(self.key(page_number), page_result)
@@ -1,89 +1,264 @@
-import os
-import uuid
-import docx
-from PIL import Image
 import io
+import posixpath
+import zipfile
 
-from config.config import IMAGES_DIR
+from app.core.document_extractor.docx_tables import read_table_rows
+from app.core.document_extractor.image_handler import image_extension
+from app.core.media_store.media_store import get_media_store
+
+_PACKAGE_RELS = "_rels/.rels"
+_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_OFFICE_DOCUMENT_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+_STYLES_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+_IMAGE_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+# Images are referenced from DrawingML pictures, and from VML shapes in older documents
+_IMAGE_REF_NAMESPACES = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "v": "urn:schemas-microsoft-com:vml",
+}
+
+
+def _part_rels_path(part_path):
+    """Return the path of the relationships part of a package part."""
+    directory, name = posixpath.split(part_path)
+    return posixpath.join(directory, "_rels", name + ".rels")
 
 
 class DocxExtractor:
-    def __init__(self, file_path):
+    def __init__(self, file_path=None, file_bytes=None, progress_callback=None, media_store=None):
         self.file_path = file_path
+        self.file_bytes = file_bytes
+        self.progress_callback = progress_callback
+        self.media_store = media_store or get_media_store()
         self.text_content = []
         self.images = []
         self.structure = {}
+        self._archive = None
+        self._document_path = None
+        # Relationships of the main document part: rId -> (type, part path or None if external)
+        self._rels = {}
+        # Paragraph style names by style ID, and the name of the default paragraph style
+        self._style_names = {}
+        self._default_style = "Normal"
+        self._saved_rels = set()
+
+    def _open_archive(self):
+        """Open the DOCX package from the file path, or straight from memory for small uploads."""
+        # The package is opened once, however many passes are made over it
+        if self._archive is None:
+            if self.file_bytes is not None:
+                archive = zipfile.ZipFile(io.BytesIO(self.file_bytes))
+            elif self.file_path:
+                archive = zipfile.ZipFile(self.file_path)
+            else:
+                raise ValueError("Either file_path or file_bytes must be provided")
+
+            package_rels = self._read_rels(archive, _PACKAGE_RELS, "")
+            self._document_path = next(
+                (path for rel_type, path in package_rels.values() if rel_type == _OFFICE_DOCUMENT_REL), None
+            )
+            if self._document_path is None:
+                raise ValueError("The file is not a Word document")
+
+            self._rels = self._read_rels(archive, _part_rels_path(self._document_path),
+                                         posixpath.dirname(self._document_path))
+            styles_path = next((path for rel_type, path in self._rels.values() if rel_type == _STYLES_REL), None)
+            if styles_path in archive.namelist():
+                self._read_styles(archive.read(styles_path))
+            self._archive = archive
+        return self._archive
+
+    def _read_rels(self, archive, rels_path, base_dir):
+        """Read a relationships part into a dictionary of rId -> (type, part path or None if external)."""
+        from lxml import etree
+
+        if rels_path not in archive.namelist():
+            return {}
+
+        rels = {}
+        for rel in etree.fromstring(archive.read(rels_path)).iterfind(f"{{{_REL_NS}}}Relationship"):
+            target = rel.get("Target", "")
+            if rel.get("TargetMode") == "External":
+                path = None
+            elif target.startswith("/"):
+                path = target.lstrip("/")
+            else:
+                path = posixpath.normpath(posixpath.join(base_dir, target))
+            rels[rel.get("Id")] = (rel.get("Type"), path)
+        return rels
+
+    def _read_styles(self, styles_xml):
+        """
+        Build the paragraph style name table once per document.
+
+        Names are resolved the way python-docx resolves paragraph.style.name:
+        unknown style IDs and styles of other types fall back to the default
+        paragraph style, and built-in names get their UI spelling ("Heading 1").
+        """
+        from docx.enum.style import WD_STYLE_TYPE
+        from docx.oxml.parser import parse_xml
+        from docx.styles import BabelFish
+
+        styles = parse_xml(styles_xml).xpath("w:style")
+
+        def ui_name(style):
+            return BabelFish.internal2ui(style.name_val) if style.name_val is not None else ""
+
+        defaults = [style for style in styles if style.type == WD_STYLE_TYPE.PARAGRAPH and style.default]
+        if defaults:
+            # The last default style counts, as in Word
+            self._default_style = ui_name(defaults[-1])
+
+        for style in styles:
+            # The first style with an ID counts
+            if style.styleId not in self._style_names:
+                self._style_names[style.styleId] = ui_name(style) if style.type == WD_STYLE_TYPE.PARAGRAPH else None
+
+    def _style_name(self, style_id):
+        name = self._style_names.get(style_id) if style_id else None
+        return self._default_style if name is None else name
+
+    def _report_progress(self, stage, current, total):
+        if self.progress_callback:
+            self.progress_callback(stage, current, total)
+
+    def iter_body(self):
+        """
+        Walk the document body once, yielding its content in document order.
+
+        document.xml is parsed incrementally and every paragraph and table
+        is dropped once it has been read, so memory use does not grow with
+        the length of the document.
+
+        Yields:
+            Dictionaries of type "paragraph" (index, content, style), "table"
+            (index, content as rows of cell texts) and "image" (rel_id of an
+            image referenced by the paragraph or table before it)
+        """
+        from lxml import etree
+        from docx.oxml.ns import qn
+        from docx.oxml.parser import element_class_lookup
+
+        archive = self._open_archive()
+        image_refs = etree.XPath(".//a:blip/@r:embed | .//v:imagedata/@r:id", namespaces=_IMAGE_REF_NAMESPACES)
+        body_tag, paragraph_tag = qn("w:body"), qn("w:p")
+        paragraph_index = 0
+        table_index = 0
+
+        with archive.open(self._document_path) as document_xml:
+            # The element classes of python-docx give paragraphs their text and style accessors
+            events = etree.iterparse(document_xml, events=("end",), tag=(paragraph_tag, qn("w:tbl")),
+                                     remove_blank_text=True, resolve_entities=False)
+            events.set_element_class_lookup(element_class_lookup)
+
+            for _, element in events:
+                body = element.getparent()
+                # Paragraphs inside tables are read with their table
+                if body is None or body.tag != body_tag:
+                    continue
+
+                if element.tag == paragraph_tag:
+                    text = element.text
+                    if text.strip():
+                        yield {
+                            "index": paragraph_index,
+                            "content": text,
+                            "style": self._style_name(element.style),
+                            "type": "paragraph"
+                        }
+                    paragraph_index += 1
+                else:
+                    rows = read_table_rows(element)
+                    if rows:
+                        yield {"type": "table", "content": rows, "index": table_index}
+                    table_index += 1
+
+                for rel_id in image_refs(element):
+                    yield {"type": "image", "rel_id": rel_id}
+
+                # Drop what has been read, including other body elements before it
+                element.clear()
+                while element.getprevious() is not None:
+                    del body[0]
+
+    def _image_rel_ids(self):
+        """Return the IDs of the image relationships of the document, in part order."""
+        self._open_archive()
+        return [rel_id for rel_id, (rel_type, path) in self._rels.items() if rel_type == _IMAGE_REL and path]
+
+    def _save_image(self, rel_id, total_images):
+        """Store the image of a relationship once and add its metadata to images."""
+        from PIL import Image
+
+        rel_type, path = self._rels.get(rel_id, (None, None))
+        if rel_type != _IMAGE_REL or not path or rel_id in self._saved_rels:
+            return
+        self._saved_rels.add(rel_id)
+        image_data = self._archive.read(path)
+
+        # Only the header is read; the image is stored as it is in the document, in its own format
+        width = height = image_format = None
+        try:
+            with Image.open(io.BytesIO(image_data)) as image:
+                (width, height), image_format = image.size, image.format
+        except Exception as e:
+            # e.g. EMF drawings; they are still stored and linked
+            print(f"Error reading image {path}: {e}")
+        extension = posixpath.splitext(path)[1]
+        if not (extension[1:].isascii() and extension[1:].isalnum() and len(extension) <= 11):
+            # Blob names only take short alphanumeric extensions
+            extension = image_extension(image_format)
+        image_filename = self.media_store.put(image_data, extension)
+        image_path = self.media_store.path(image_filename)
+
+        # Store image metadata
+        self.images.append({
+            "index": len(self.images),
+            "filename": image_filename,
+            "path": image_path,
+            "width": width,
+            "height": height
+        })
+        self._report_progress("extract_images", len(self.images), total_images)
+
+    def _save_unreferenced_images(self, total_images):
+        """Store the images of the document the body does not reference, e.g. from text boxes."""
+        for rel_id in self._image_rel_ids():
+            self._save_image(rel_id, total_images)
 
     def extract_text(self):
         """Extract text from DOCX file with structure information."""
-        doc = docx.Document(self.file_path)
-        
-        # Extract paragraphs
-        for i, para in enumerate(doc.paragraphs):
-            if para.text.strip():
-                style_name = para.style.name
-                self.text_content.append({
-                    "index": i,
-                    "content": para.text,
-                    "style": style_name,
-                    "type": "paragraph"
-                })
-        
-        # Extract tables
-        for table_idx, table in enumerate(doc.tables):
-            table_text = []
-            for row_idx, row in enumerate(table.rows):
-                row_text = []
-                for cell_idx, cell in enumerate(row.cells):
-                    row_text.append(cell.text)
-                table_text.append(row_text)
-            
-            if table_text:
-                self.text_content.append({
-                    "type": "table",
-                    "content": table_text,
-                    "index": table_idx
-                })
-        
+        for item in self.iter_body():
+            if item["type"] != "image":
+                self.text_content.append(item)
+
+        self._report_progress("extract_text", 1, 1)
         return self.text_content
 
     def extract_images(self):
-        """Extract images from DOCX file."""
-        doc = docx.Document(self.file_path)
-        
-        image_index = 0
-        # Process all the inline shapes in the document
-        for rel in doc.part.rels.values():
-            if "image" in rel.target_ref:
-                image_data = rel.target_part.blob
-                
-                # Generate a unique filename
-                image_filename = f"docx_image_{uuid.uuid4()}.png"
-                image_path = os.path.join(IMAGES_DIR, image_filename)
-                
-                # Open and save the image
-                image = Image.open(io.BytesIO(image_data))
-                image.save(image_path)
-                
-                # Store image metadata
-                self.images.append({
-                    "index": image_index,
-                    "filename": image_filename,
-                    "path": image_path,
-                    "width": image.width,
-                    "height": image.height
-                })
-                
-                image_index += 1
-        
+        """Extract images from DOCX file, in the order the document shows them."""
+        total_images = len(self._image_rel_ids())
+        for item in self.iter_body():
+            if item["type"] == "image":
+                self._save_image(item["rel_id"], total_images)
+        self._save_unreferenced_images(total_images)
+
         return self.images
 
     def extract_all(self):
-        """Extract both text and images from DOCX."""
-        self.extract_text()
-        self.extract_images()
-        
+        """Extract both text and images from DOCX in a single pass over its body."""
+        total_images = len(self._image_rel_ids())
+        for item in self.iter_body():
+            if item["type"] == "image":
+                self._save_image(item["rel_id"], total_images)
+            else:
+                self.text_content.append(item)
+        self._report_progress("extract_text", 1, 1)
+        self._save_unreferenced_images(total_images)
+
         return {
             "text": self.text_content,
             "images": self.images
-        } 
\ No newline at end of file
+        }
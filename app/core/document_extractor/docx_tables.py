@@ -0,0 +1,105 @@
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_TR = _W + "tr"
+_TC = _W + "tc"
+_P = _W + "p"
+_R = _W + "r"
+_HYPERLINK = _W + "hyperlink"
+_T = _W + "t"
+_BR = _W + "br"
+_TR_PR = _W + "trPr"
+_TC_PR = _W + "tcPr"
+_GRID_BEFORE = _W + "gridBefore"
+_GRID_SPAN = _W + "gridSpan"
+_V_MERGE = _W + "vMerge"
+_VAL = _W + "val"
+_TYPE = _W + "type"
+
+# Text of the run content elements other than w:t and w:br, as python-docx gives it
+_RUN_CHARACTERS = {_W + "tab": "\t", _W + "ptab": "\t", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+
+
+def _decimal_val(properties, tag, default):
+    """Return the w:val of a numeric property element, or default if it is missing or invalid."""
+    element = properties.find(tag) if properties is not None else None
+    if element is None:
+        return default
+    try:
+        return int(element.get(_VAL))
+    except (TypeError, ValueError):
+        return default
+
+
+def _paragraph_text(p):
+    """
+    Return the text of a paragraph as python-docx's paragraph.text does.
+
+    Walks the runs directly instead of querying them with XPath, which is
+    what most of the time goes to in tables with many small cells.
+    """
+    parts = []
+    for child in p:
+        if child.tag == _R:
+            runs = (child,)
+        elif child.tag == _HYPERLINK:
+            runs = child.iterchildren(_R)
+        else:
+            continue
+
+        for run in runs:
+            for item in run:
+                if item.tag == _T:
+                    parts.append(item.text or "")
+                elif item.tag == _BR:
+                    # Page and column breaks have no text
+                    if item.get(_TYPE, "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                else:
+                    parts.append(_RUN_CHARACTERS.get(item.tag, ""))
+    return "".join(parts)
+
+
+def read_table_rows(tbl):
+    """
+    Read the cell texts of a table row by row, in linear time.
+
+    The rows are the ones python-docx builds through table.rows, row.cells
+    and cell.text: a cell spanning several grid columns is repeated for
+    each of them, and a cell continuing a vertical merge repeats the cell
+    that starts the merge. python-docx finds the grid position of every
+    cell with an XPath query over the cells before it in its row, and the
+    start of a merge by walking up row by row, so wide tables with merged
+    cells take time quadratic in the number of columns. Here grid offsets
+    are counted once per row, and the cells of the previous row are kept
+    by grid offset for the merges.
+
+    Args:
+        tbl: A w:tbl element
+
+    Returns:
+        List of rows, each a list of cell texts
+    """
+    rows = []
+    # (text, grid span) of the cells of the previous row by grid offset, for vertical merges
+    above = {}
+    for tr in tbl.iterchildren(_TR):
+        # Rows can start after the first grid column
+        offset = _decimal_val(tr.find(_TR_PR), _GRID_BEFORE, 0)
+        row = []
+        current = {}
+        for tc in tr.iterchildren(_TC):
+            properties = tc.find(_TC_PR)
+            span = _decimal_val(properties, _GRID_SPAN, 1)
+            v_merge = properties.find(_V_MERGE) if properties is not None else None
+
+            # w:vMerge without a value continues the merge started above
+            if v_merge is not None and v_merge.get(_VAL, "continue") == "continue" and offset in above:
+                cell = above[offset]
+            else:
+                cell = ("\n".join(_paragraph_text(p) for p in tc.iterchildren(_P)), span)
+
+            current[offset] = cell
+            row.extend([cell[0]] * cell[1])
+            offset += span
+        rows.append(row)
+        above = current
+    return rows
@@ -1,52 +1,86 @@
 import os
-import uuid
-from PIL import Image
 import io
 
-from config.config import IMAGES_DIR
+from app.core.media_store.media_store import get_media_store
+
+# Extensions of the common image formats; others get the first extension Pillow registers
+_FORMAT_EXTENSIONS = {
+    "JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "BMP": ".bmp", "TIFF": ".tiff", "WEBP": ".webp",
+    "JPEG2000": ".jp2"
+}
+
+
+def image_extension(image_format, default=".png"):
+    """
+    Return the file extension of a Pillow image format.
+
+    Args:
+        image_format: Format name as in Image.format, e.g. "JPEG"
+        default: Extension for unknown formats
+
+    Returns:
+        Extension including the dot
+    """
+    from PIL import Image
+    
+    if image_format in _FORMAT_EXTENSIONS:
+        return _FORMAT_EXTENSIONS[image_format]
+    for extension, registered_format in Image.registered_extensions().items():
+        if registered_format == image_format:
+            return extension
+    return default
 
 
 class ImageHandler:
-    def __init__(self, file_path=None, file_bytes=None):
+    def __init__(self, file_path=None, file_bytes=None, media_store=None):
         self.file_path = file_path
         self.file_bytes = file_bytes
+        self.media_store = media_store or get_media_store()
         self.image_info = {}
     
     def process_image(self):
-        """Process an image file and save it to the images directory."""
+        """
+        Store an image file as it is and read its metadata.
+
+        Only the image header is read, for the format and dimensions; the
+        file is not decoded and encoded again, and a file on disk is copied
+        without reading it into memory.
+        """
+        from PIL import Image
+        
         try:
-            # Open the image, either from a file path or from bytes
+            # Probe the image, either from a file path or from bytes
             if self.file_path:
-                image = Image.open(self.file_path)
-                filename = os.path.basename(self.file_path)
-                # Get original format extension
-                ext = os.path.splitext(filename)[1].lower()
-                if not ext:
-                    ext = ".png"  # Default to png if no extension
+                source = self.file_path
+                ext = os.path.splitext(self.file_path)[1].lower()
             elif self.file_bytes:
-                image = Image.open(io.BytesIO(self.file_bytes))
-                ext = ".png"  # Default to png for bytes input
+                source = io.BytesIO(self.file_bytes)
+                ext = ""
             else:
                 raise ValueError("Either file_path or file_bytes must be provided")
             
-            # Generate a unique filename
-            unique_id = str(uuid.uuid4())
-            if not ext.startswith("."):
-                ext = "." + ext
-            image_filename = f"uploaded_image_{unique_id}{ext}"
-            image_path = os.path.join(IMAGES_DIR, image_filename)
+            with Image.open(source) as image:
+                image_format, mode = image.format, image.mode
+                width, height = image.size
+            
+            # Keep the extension of the file if it fits its format, e.g. .jpeg; bytes get the format's
+            if Image.registered_extensions().get(ext) != image_format:
+                ext = image_extension(image_format)
             
-            # Save the image
-            image.save(image_path)
+            if self.file_path:
+                image_filename = self.media_store.put_file(self.file_path, ext)
+            else:
+                image_filename = self.media_store.put(self.file_bytes, ext)
+            image_path = self.media_store.path(image_filename)
             
             # Store image metadata
             self.image_info = {
                 "filename": image_filename,
                 "path": image_path,
-                "width": image.width,
-                "height": image.height,
-                "format": image.format,
-                "mode": image.mode
+                "width": width,
+                "height": height,
+                "format": image_format,
+                "mode": mode
             }
             
             return self.image_info
@@ -0,0 +1,90 @@
+import re
+
+_RANGE_PATTERN = re.compile(r"^(\d+)(?:\s*(-)\s*(\d+)?)?$")
+
+
+def parse_page_ranges(spec):
+    """
+    Parse a page selection such as "1-3,7,10-".
+
+    Pages are numbered from 1; "10-" means page 10 to the end of the
+    document. Overlapping and adjacent ranges are merged.
+
+    Args:
+        spec: Comma-separated pages and ranges
+
+    Returns:
+        Sorted list of (first, last) tuples; last is None for open-ended ranges
+
+    Raises:
+        ValueError: If the selection is empty or malformed
+    """
+    ranges = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+
+        match = _RANGE_PATTERN.match(part)
+        if not match:
+            raise ValueError(f"Invalid page range: {part!r}")
+
+        first = int(match.group(1))
+        if match.group(2) is None:
+            last = first
+        elif match.group(3) is None:
+            last = None
+        else:
+            last = int(match.group(3))
+
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Invalid page range: {part!r}")
+        ranges.append((first, last))
+
+    if not ranges:
+        raise ValueError("No pages selected")
+
+    # Merge overlapping and adjacent ranges, so equal selections have one canonical form
+    ranges.sort(key=lambda r: r[0])
+    merged = [ranges[0]]
+    for first, last in ranges[1:]:
+        previous_first, previous_last = merged[-1]
+        if previous_last is None or first <= previous_last + 1:
+            end = None if previous_last is None or last is None else max(previous_last, last)
+            merged[-1] = (previous_first, end)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def format_page_ranges(ranges):
+    """Format parsed ranges back into their canonical string, e.g. "1-3,7,10-"."""
+    parts = []
+    for first, last in ranges:
+        if last is None:
+            parts.append(f"{first}-")
+        elif last == first:
+            parts.append(str(first))
+        else:
+            parts.append(f"{first}-{last}")
+    return ",".join(parts)
+
+
+def select_pages(spec, page_count):
+    """
+    Resolve a page selection against the pages of a document.
+
+    Args:
+        spec: Page selection string, or None for all pages
+        page_count: Number of pages in the document
+
+    Returns:
+        Sorted list of 1-based page numbers; pages past the end are ignored
+    """
+    if spec is None:
+        return list(range(1, page_count + 1))
+
+    pages = []
+    for first, last in parse_page_ranges(spec):
+        pages.extend(range(first, min(last or page_count, page_count) + 1))
+    return pages
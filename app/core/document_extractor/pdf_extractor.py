@@ -1,74 +1,445 @@
-import os
-import uuid
-from PyPDF2 import PdfReader
-from PIL import Image
+import hashlib
 import io
+import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-from config.config import IMAGES_DIR
+from app.core.media_store.media_store import get_media_store
+from config.config import (
+    WORKER_START_METHOD, PDF_EXTRACT_WORKERS, PDF_PARALLEL_MIN_PAGES, PDF_SHARD_MIN_PAGES
+)
+
+# zlib level of the PNGs raw image samples are encoded as; level 1 takes half the time of
+# the default for about a tenth more bytes, and extraction waits for every image
+PNG_COMPRESS_LEVEL = 1
+
+# Processes extracting page ranges of large PDFs, shared by all conversions of this process
+_shard_executor = None
+_shard_executor_lock = threading.Lock()
+
+
+def _get_shard_executor(workers):
+    global _shard_executor
+    with _shard_executor_lock:
+        if _shard_executor is None:
+            context = multiprocessing.get_context(WORKER_START_METHOD)
+            _shard_executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _shard_executor
+
+
+def _reset_shard_executor(executor):
+    global _shard_executor
+    with _shard_executor_lock:
+        if _shard_executor is executor:
+            _shard_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def plan_shards(page_count, workers, min_pages=PDF_SHARD_MIN_PAGES):
+    """
+    Split the pages to extract into contiguous ranges for parallel extraction.
+
+    About four shards per worker keep all workers busy when some pages take
+    longer than others; shards never get smaller than min_pages, since every
+    shard process has to parse the document structure again.
+
+    Args:
+        page_count: Number of pages to extract
+        workers: Number of extraction processes
+        min_pages: Smallest shard
+
+    Returns:
+        List of (start, end) ranges of positions in the page list, end exclusive
+    """
+    size = max(min_pages, math.ceil(page_count / (max(1, workers) * 4)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def _filters(stream):
+    """Return the names of the filters of a PDF stream, in the order they are applied."""
+    filters = stream.get("/Filter")
+    if filters is None:
+        return []
+    filters = filters.get_object()
+    return [str(f) for f in filters] if isinstance(filters, list) else [str(filters)]
+
+
+def _color_space(image_object):
+    """
+    Return the color space of an image as (Pillow mode, palette).
+
+    The palette is the RGB lookup table of indexed images, None otherwise;
+    the mode is None for color spaces that are not supported.
+    """
+    if image_object.get("/ImageMask"):
+        return "1", None
+
+    color_space = image_object.get("/ColorSpace")
+    color_space = color_space.get_object() if color_space is not None else "/DeviceGray"
+    name = str(color_space[0] if isinstance(color_space, list) else color_space)
+
+    if name == "/ICCBased":
+        # The number of components says how to read the samples
+        components = color_space[1].get_object().get("/N", 3)
+        return {1: "L", 3: "RGB", 4: "CMYK"}.get(int(components)), None
+    if name == "/Indexed":
+        base, hival, lookup = (value.get_object() for value in color_space[1:4])
+        base_mode, _ = _color_space({"/ColorSpace": base})
+        lookup = lookup.get_data() if hasattr(lookup, "get_data") else bytes(lookup)
+        if base_mode == "L":
+            lookup = b"".join(lookup[i:i + 1] * 3 for i in range(len(lookup)))
+        elif base_mode != "RGB":
+            return None, None
+        return "P", lookup[:(int(hival) + 1) * 3]
+    return {
+        "/DeviceGray": "L", "/CalGray": "L", "/DeviceRGB": "RGB", "/CalRGB": "RGB", "/DeviceCMYK": "CMYK"
+    }.get(name), None
+
+
+def _image_file(image_object):
+    """
+    Return an image XObject as the content of an image file.
+
+    JPEG and JPEG 2000 streams are image files already and are returned as
+    they are in the PDF, without being decoded. Only raw samples (Flate,
+    LZW or uncompressed) need an image format; they are encoded once as
+    PNG. Other images are left to PyPDF2 (e.g. CCITT fax as TIFF).
+
+    Returns:
+        Tuple of (file extension, bytes); the extension is None if the image cannot be converted
+    """
+    from PIL import Image, ImageOps
+    from PyPDF2.filters import _xobj_to_image
+
+    filters = _filters(image_object)
+    if filters and filters[-1] == "/DCTDecode":
+        return ".jpg", image_object.get_data()
+    if filters and filters[-1] == "/JPXDecode":
+        return ".jp2", image_object.get_data()
+    if any(f not in ("/FlateDecode", "/LZWDecode", "/ASCII85Decode", "/ASCIIHexDecode") for f in filters):
+        return _xobj_to_image(image_object)
+
+    mode, palette = _color_space(image_object)
+    bits = int(image_object.get("/BitsPerComponent", 1 if mode == "1" else 8))
+    if mode is None or bits not in (1, 2, 4, 8) or (bits != 8 and mode not in ("1", "L", "P")):
+        return _xobj_to_image(image_object)
+
+    size = (int(image_object["/Width"]), int(image_object["/Height"]))
+    data = image_object.get_data()
+    if mode in ("1", "L") and bits == 1:
+        image = Image.frombytes("1", size, data)
+    elif mode == "P":
+        image = Image.frombytes("P", size, data, "raw", "P" if bits == 8 else f"P;{bits}")
+        image.putpalette(palette)
+    elif bits == 8:
+        image = Image.frombytes(mode, size, data)
+        if mode == "CMYK":
+            image = image.convert("RGB")
+    else:
+        # Scale 2- and 4-bit gray samples to 0-255
+        image = Image.frombytes("L", size, data, "raw", f"L;{bits}")
+
+    # A /Decode array of [1 0] inverts the samples (a stencil mask of [0 1] paints its 0 samples)
+    decode = image_object.get("/Decode")
+    decode = decode.get_object() if decode is not None else None
+    if decode is not None and mode != "P" and len(decode) >= 2 and float(decode[0]) > float(decode[1]):
+        image = ImageOps.invert(image.convert("RGB" if image.mode == "RGB" else "L"))
+
+    soft_mask = image_object.get("/SMask")
+    if soft_mask is not None:
+        soft_mask = soft_mask.get_object()
+        mask_size = (int(soft_mask["/Width"]), int(soft_mask["/Height"]))
+        if int(soft_mask.get("/BitsPerComponent", 8)) == 8:
+            alpha = Image.frombytes("L", mask_size, soft_mask.get_data())
+            if mask_size != size:
+                alpha = alpha.resize(size)
+            image = image.convert("RGBA" if image.mode in ("RGB", "P") else "LA")
+            image.putalpha(alpha)
+
+    output = io.BytesIO()
+    image.save(output, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return ".png", output.getvalue()
+
+
+def _extract_shard(file_path, file_bytes, media_store, page_numbers):
+    """Extract a range of pages in a shard process."""
+    extractor = PDFExtractor(file_path=file_path, file_bytes=file_bytes, media_store=media_store, parallel_workers=1)
+    reader = extractor._open_reader()
+    pages = list(extractor._iter_selected(reader, page_numbers))
+    return pages, extractor.errors
 
 
 class PDFExtractor:
-    def __init__(self, file_path):
+    def __init__(self, file_path=None, file_bytes=None, progress_callback=None, media_store=None,
+                 parallel_workers=PDF_EXTRACT_WORKERS):
         self.file_path = file_path
+        self.file_bytes = file_bytes
+        self.progress_callback = progress_callback
+        self.media_store = media_store or get_media_store()
+        # Large PDFs are split into page ranges extracted by this many processes
+        self.parallel_workers = parallel_workers
         self.text_content = []
         self.images = []
         self.structure = {}
+        self.page_count = 0
+        self.errors = []
+        self._reader = None
+        # First occurrence of every image, by XObject and by content
+        self._images_by_xobject = {}
+        self._images_by_hash = {}
+
+    def _open_reader(self):
+        """Open the PDF from the file path, or straight from memory for small uploads."""
+        # PyPDF2 is imported on first use so importing the extractor stays cheap
+        from PyPDF2 import PdfReader
+        
+        # The document is parsed once, however many passes are made over it
+        if self._reader is None:
+            if self.file_bytes is not None:
+                self._reader = PdfReader(io.BytesIO(self.file_bytes))
+            elif self.file_path:
+                self._reader = PdfReader(self.file_path)
+            else:
+                raise ValueError("Either file_path or file_bytes must be provided")
+            self.page_count = len(self._reader.pages)
+        return self._reader
+
+    def _report_progress(self, stage, current, total):
+        if self.progress_callback:
+            self.progress_callback(stage, current, total)
+
+    def _page_text(self, page, page_number):
+        """Extract the text items of one page."""
+        page_text = page.extract_text()
+        if page_text:
+            return [{"page": page_number, "content": page_text}]
+        return []
+
+    def _page_images(self, page, page_number):
+        """
+        Save the images of one page and return their metadata.
+
+        An image is stored once per document: XObjects already seen on an
+        earlier page, and images with the same content, are not decoded or
+        written again but reference the first occurrence through its
+        filename, path and "duplicate_of".
+        """
+        images = []
+        resources = page.get("/Resources")
+        if resources is None:
+            return images
+        resources = resources.get_object()
+        if "/XObject" not in resources:
+            return images
+        
+        x_object = resources["/XObject"].get_object()
+        for name in x_object:
+            try:
+                reference = x_object.raw_get(name)
+                # Images shared between pages are one object in the file
+                identity = (reference.idnum, reference.generation) if hasattr(reference, "idnum") else None
+                first = self._images_by_xobject.get(identity) if identity else None
+                
+                if first is None:
+                    image_object = x_object[name]
+                    if image_object.get("/Subtype") != "/Image":
+                        continue
+                    
+                    # Extract image data
+                    extension, image_bytes = _image_file(image_object)
+                    if extension is None:
+                        continue
+                    
+                    image_hash = hashlib.sha256(image_bytes).hexdigest()
+                    first = self._images_by_hash.get(image_hash)
+                    if first is None:
+                        size = (int(image_object["/Width"]), int(image_object["/Height"]))
+                        image_info = self._save_image(
+                            image_bytes, extension, size, image_hash, page_number, len(images)
+                        )
+                        # A copy is remembered, since OCR adds its results to the yielded entry
+                        first = self._images_by_hash[image_hash] = dict(image_info)
+                        if identity:
+                            self._images_by_xobject[identity] = first
+                        images.append(image_info)
+                        continue
+                    if identity:
+                        self._images_by_xobject[identity] = first
+                
+                images.append(self._duplicate_image(first, page_number, len(images)))
+            except Exception as e:
+                print(f"Error extracting image: {e}")
+                self.errors.append({"stage": "extract", "exception": type(e).__name__})
+        return images
+
+    def _save_image(self, image_bytes, extension, size, image_hash, page_number, img_index):
+        """Write a new image to the media store and return its metadata."""
+        # Save the image; images other documents contain too are already stored
+        image_filename = self.media_store.put(image_bytes, extension)
+        image_path = self.media_store.path(image_filename)
+        
+        # The dimensions come from the image dictionary, so the image is not decoded for them
+        width, height = size
+        
+        # Store image metadata
+        return {
+            "page": page_number,
+            "index": img_index,
+            "filename": image_filename,
+            "path": image_path,
+            "width": width,
+            "height": height,
+            "hash": image_hash
+        }
+
+    def _duplicate_image(self, first, page_number, img_index):
+        """Return an image entry that references an image stored earlier."""
+        # Only the stored file is shared; OCR results are added to each entry separately
+        duplicate = {key: first[key] for key in ("filename", "path", "width", "height", "hash")}
+        duplicate.update(page=page_number, index=img_index, duplicate_of=first["filename"])
+        return duplicate
+
+    def release_pages(self):
+        """
+        Drop the PDF objects parsed so far, such as page contents and image data.
+
+        PyPDF2 keeps every object it has read; they are read from the file
+        again when a later page needs them.
+        """
+        if self._reader is not None:
+            self._reader.resolved_objects.clear()
+
+    def count_pages(self):
+        """Open the PDF and return its number of pages."""
+        self._open_reader()
+        return self.page_count
+
+    def iter_pages(self, pages=None):
+        """
+        Walk the PDF once, yielding the text, images and metadata of each page.
+
+        Pages are yielded as soon as they are read, so callers can convert the
+        first pages while later ones are still being parsed. PDFs with at
+        least PDF_PARALLEL_MIN_PAGES pages are split into page ranges that
+        are extracted by parallel processes and yielded in page order.
+        page_count is set before the first page is yielded; image errors are
+        collected in errors.
+
+        Args:
+            pages: Sorted 1-based numbers of the pages to read; all pages if None
+
+        Yields:
+            Dictionary with page (1-based number), width, height, rotation, text, images and errors
+        """
+        reader = self._open_reader()
+        page_numbers = list(range(1, self.page_count + 1)) if pages is None else list(pages)
+        
+        if self.parallel_workers > 1 and len(page_numbers) >= PDF_PARALLEL_MIN_PAGES:
+            yield from self._iter_pages_parallel(page_numbers)
+        else:
+            yield from self._iter_selected(reader, page_numbers)
+
+    def _iter_selected(self, reader, page_numbers):
+        """Read the given pages in this process."""
+        for page_number in page_numbers:
+            page = reader.pages[page_number - 1]
+            
+            errors_before = len(self.errors)
+            
+            text = self._page_text(page, page_number)
+            self._report_progress("extract_text", page_number, self.page_count)
+            
+            images = self._page_images(page, page_number)
+            self._report_progress("extract_images", page_number, self.page_count)
+            
+            box = page.mediabox
+            yield {
+                "page": page_number,
+                "width": float(box.width),
+                "height": float(box.height),
+                "rotation": page.rotation,
+                "text": text,
+                "images": images,
+                "errors": self.errors[errors_before:]
+            }
+
+    def _iter_pages_parallel(self, page_numbers):
+        """Extract page ranges in the shard processes and yield their pages in order."""
+        shards = plan_shards(len(page_numbers), self.parallel_workers)
+        executor = _get_shard_executor(self.parallel_workers)
+        
+        # Shard processes read the file themselves; the content is only sent for in-memory uploads
+        file_path = self.file_path if self.file_bytes is None else None
+        futures = [
+            executor.submit(_extract_shard, file_path, self.file_bytes, self.media_store, page_numbers[start:end])
+            for start, end in shards
+        ]
+        
+        try:
+            # Shards finish in any order, but are handed on in page order
+            for future in futures:
+                try:
+                    pages, errors = future.result()
+                except BrokenProcessPool:
+                    # Replace the processes (e.g. one was killed for its memory use) for later documents
+                    _reset_shard_executor(executor)
+                    raise
+                self.errors.extend(errors)
+                
+                for page in pages:
+                    page["images"] = [self._dedupe_shard_image(image) for image in page["images"]]
+                    self._report_progress("extract_text", page["page"], self.page_count)
+                    self._report_progress("extract_images", page["page"], self.page_count)
+                    yield page
+        finally:
+            # Stop the remaining shards if the conversion fails or stops early
+            for future in futures:
+                future.cancel()
+
+    def _dedupe_shard_image(self, image):
+        """
+        Make an image from a shard reference its first occurrence in the whole document.
+
+        Shards only know the images of their own pages, so an image repeated
+        across shards was stored by each of them; the references the later
+        shards took are given back.
+        """
+        first = self._images_by_hash.get(image["hash"])
+        if first is None:
+            self._images_by_hash[image["hash"]] = dict(image)
+            return image
+        
+        if "duplicate_of" not in image:
+            self.media_store.release(image["filename"])
+        return self._duplicate_image(first, image["page"], image["index"])
 
     def extract_text(self):
         """Extract text from PDF file."""
-        reader = PdfReader(self.file_path)
+        reader = self._open_reader()
         for i, page in enumerate(reader.pages):
-            page_text = page.extract_text()
-            if page_text:
-                self.text_content.append({
-                    "page": i + 1,
-                    "content": page_text
-                })
+            self.text_content.extend(self._page_text(page, i + 1))
+            self._report_progress("extract_text", i + 1, self.page_count)
         return self.text_content
 
     def extract_images(self):
         """Extract images from PDF file using PyPDF2."""
-        reader = PdfReader(self.file_path)
-        
-        for page_index, page in enumerate(reader.pages):
-            img_index = 0
-            for img_index, image in enumerate(page.images):
-                try:
-                    # Extract image data
-                    image_bytes = image.data
-                    
-                    # Generate a unique filename
-                    image_filename = f"pdf_image_{uuid.uuid4()}.png"
-                    image_path = os.path.join(IMAGES_DIR, image_filename)
-                    
-                    # Save the image
-                    with open(image_path, "wb") as img_file:
-                        img_file.write(image_bytes)
-                    
-                    # Create PIL image to get dimensions
-                    pil_image = Image.open(io.BytesIO(image_bytes))
-                    width, height = pil_image.size
-                    
-                    # Store image metadata
-                    self.images.append({
-                        "page": page_index + 1,
-                        "index": img_index,
-                        "filename": image_filename,
-                        "path": image_path,
-                        "width": width,
-                        "height": height
-                    })
-                except Exception as e:
-                    print(f"Error extracting image: {e}")
-        
+        reader = self._open_reader()
+        for i, page in enumerate(reader.pages):
+            self.images.extend(self._page_images(page, i + 1))
+            self._report_progress("extract_images", i + 1, self.page_count)
         return self.images
 
     def extract_all(self):
-        """Extract both text and images from PDF."""
-        self.extract_text()
-        self.extract_images()
+        """Extract both text and images from PDF in a single pass over its pages."""
+        for page in self.iter_pages():
+            self.text_content.extend(page["text"])
+            self.images.extend(page["images"])
         
         return {
             "text": self.text_content,
-            "images": self.images
-        } 
\ No newline at end of file
+            "images": self.images,
+            "page_count": self.page_count,
+            "errors": self.errors
+        }
@@ -0,0 +1,183 @@
+from config.config import JOB_STORE_BACKEND, JOB_STORE_PATH, JOB_STORE_CACHE_SIZE, JOB_LEASE_SECONDS
+
+# Error of jobs failed by expire_stale()
+ABANDONED_ERROR = "The job was abandoned by the API worker that queued it"
+
+
+class JobStore:
+    """Interface for storing document processing jobs (DocumentData)."""
+
+    def add(self, doc_data):
+        """
+        Store a new job.
+
+        Args:
+            doc_data: DocumentData for the new job
+        """
+        raise NotImplementedError
+
+    def add_or_get_active(self, doc_data):
+        """
+        Store a new job unless an identical conversion is already pending or processing.
+
+        Jobs are considered identical when they share a cache_key. This gives
+        single-flight behaviour: concurrent uploads of the same content attach
+        to the job that is already running instead of starting duplicate work.
+        An identical job whose lease has expired is failed and replaced.
+
+        Args:
+            doc_data: DocumentData for the new job
+
+        Returns:
+            The in-flight DocumentData if one exists, otherwise doc_data itself
+        """
+        raise NotImplementedError
+
+    def get(self, doc_id):
+        """
+        Look up a job by its document ID.
+
+        Args:
+            doc_id: The document ID
+
+        Returns:
+            DocumentData, or None if the job does not exist
+        """
+        raise NotImplementedError
+
+    def save(self, doc_data):
+        """
+        Persist all fields of an existing job.
+
+        Args:
+            doc_data: DocumentData to write back
+        """
+        raise NotImplementedError
+
+    def save_many(self, docs):
+        """
+        Persist several jobs in one batch.
+
+        Args:
+            docs: Iterable of DocumentData
+        """
+        for doc_data in docs:
+            self.save(doc_data)
+
+    def update_status(self, doc_ids, status, updated_at, error=None):
+        """
+        Set the status of one or more jobs in one batch.
+
+        Args:
+            doc_ids: List of document IDs
+            status: New DocumentStatus
+            updated_at: Timestamp of the change
+            error: Optional error message
+        """
+        raise NotImplementedError
+
+    def list_by_status(self, status, limit=100):
+        """
+        List the oldest jobs with a given status.
+
+        Args:
+            status: DocumentStatus to filter on
+            limit: Maximum number of jobs to return
+
+        Returns:
+            List of DocumentData ordered by creation time
+        """
+        raise NotImplementedError
+
+    def renew_leases(self, doc_ids, now):
+        """
+        Renew the leases of pending and processing jobs.
+
+        The queue of each API worker only lives in its memory, so every worker
+        renews the jobs it holds; jobs whose worker crashed or was restarted
+        stop being renewed and are failed by expire_stale().
+
+        Args:
+            doc_ids: Document IDs of the jobs queued or running in this worker
+            now: Timestamp of the renewal
+        """
+        raise NotImplementedError
+
+    def expire_stale(self, now):
+        """
+        Fail the pending and processing jobs whose lease has expired.
+
+        Args:
+            now: Current timestamp
+
+        Returns:
+            List of the document IDs that were failed
+        """
+        raise NotImplementedError
+
+    def add_batch(self, batch_id, doc_ids, filenames=None):
+        """
+        Record the jobs that belong to a batch upload.
+
+        Args:
+            batch_id: The batch ID
+            doc_ids: Document IDs in upload order
+            filenames: Filenames the documents were uploaded under, listed in place of
+                the job's own filename when an upload attached to an existing job
+        """
+        raise NotImplementedError
+
+    def count_batch(self, batch_id):
+        """
+        Count the jobs of a batch by status.
+
+        Args:
+            batch_id: The batch ID
+
+        Returns:
+            Dictionary of status value to number of jobs
+        """
+        raise NotImplementedError
+
+    def list_batch(self, batch_id, offset=0, limit=100):
+        """
+        List the jobs of a batch in upload order, under the filenames they were uploaded with.
+
+        Args:
+            batch_id: The batch ID
+            offset: Number of jobs to skip
+            limit: Maximum number of jobs to return
+
+        Returns:
+            List of DocumentData
+        """
+        raise NotImplementedError
+
+    def delete(self, doc_id):
+        """
+        Remove a job.
+
+        Args:
+            doc_id: The document ID
+        """
+        raise NotImplementedError
+
+
+def create_job_store(backend=JOB_STORE_BACKEND):
+    """
+    Create the job store configured for this deployment.
+
+    Args:
+        backend: "sqlite" (default, shared between API workers) or "memory"
+
+    Returns:
+        JobStore instance
+    """
+    if backend == "sqlite":
+        from app.core.job_store.sqlite_store import SQLiteJobStore
+        return SQLiteJobStore(JOB_STORE_PATH, cache_size=JOB_STORE_CACHE_SIZE, lease_seconds=JOB_LEASE_SECONDS)
+    elif backend == "memory":
+        from app.core.job_store.memory_store import MemoryJobStore
+        return MemoryJobStore(lease_seconds=JOB_LEASE_SECONDS)
+
+    raise ValueError(f"Unsupported job store backend: {backend}")
@@ -0,0 +1,108 @@
+import threading
+from datetime import timedelta
+
+from app.models.document_models import DocumentStatus
+from app.core.job_store.job_store import JobStore, ABANDONED_ERROR
+
+_ACTIVE_STATUSES = (DocumentStatus.PENDING, DocumentStatus.PROCESSING)
+
+
+class MemoryJobStore(JobStore):
+    """Job store that keeps everything in a dict. Intended for tests and single-process use."""
+
+    def __init__(self, lease_seconds=0):
+        # Jobs are registered from threadpool threads as well as from the event loop
+        self._lock = threading.RLock()
+        # 0 means leases never expire
+        self.lease_seconds = lease_seconds
+        self.jobs = {}
+        self.batches = {}  # batch_id -> list of (doc_id, filename)
+        self.leases = {}  # doc_id -> last renewal
+
+    def add(self, doc_data):
+        with self._lock:
+            self.jobs[doc_data.doc_id] = doc_data.model_copy(deep=True)
+            self.leases[doc_data.doc_id] = doc_data.updated_at
+
+    def add_or_get_active(self, doc_data):
+        with self._lock:
+            if doc_data.cache_key:
+                self.expire_stale(doc_data.created_at)
+                for existing in self.jobs.values():
+                    if existing.cache_key == doc_data.cache_key and existing.status in _ACTIVE_STATUSES:
+                        return existing.model_copy(deep=True)
+            self.add(doc_data)
+            return doc_data
+
+    def get(self, doc_id):
+        with self._lock:
+            doc_data = self.jobs.get(doc_id)
+            # Hand out copies so callers only change stored state through save()
+            return doc_data.model_copy(deep=True) if doc_data else None
+
+    def save(self, doc_data):
+        with self._lock:
+            self.jobs[doc_data.doc_id] = doc_data.model_copy(deep=True)
+
+    def update_status(self, doc_ids, status, updated_at, error=None):
+        with self._lock:
+            for doc_id in doc_ids:
+                doc_data = self.jobs.get(doc_id)
+                if doc_data:
+                    doc_data.status = status
+                    doc_data.updated_at = updated_at
+                    if error is not None:
+                        doc_data.error = error
+                    self.leases[doc_id] = updated_at
+
+    def renew_leases(self, doc_ids, now):
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id in self.leases:
+                    self.leases[doc_id] = now
+
+    def expire_stale(self, now):
+        with self._lock:
+            if not self.lease_seconds:
+                return []
+            expires_before = now - timedelta(seconds=self.lease_seconds)
+            expired = [
+                doc_id for doc_id, doc_data in self.jobs.items()
+                if doc_data.status in _ACTIVE_STATUSES and self.leases.get(doc_id, doc_data.updated_at) < expires_before
+            ]
+            self.update_status(expired, DocumentStatus.FAILED, now, error=ABANDONED_ERROR)
+            return expired
+
+    def list_by_status(self, status, limit=100):
+        with self._lock:
+            matching = [doc for doc in self.jobs.values() if doc.status == status]
+            matching.sort(key=lambda doc: doc.created_at)
+            return [doc.model_copy(deep=True) for doc in matching[:limit]]
+
+    def add_batch(self, batch_id, doc_ids, filenames=None):
+        with self._lock:
+            self.batches.setdefault(batch_id, []).extend(zip(doc_ids, filenames or [None] * len(doc_ids)))
+
+    def count_batch(self, batch_id):
+        with self._lock:
+            counts = {}
+            for doc_id, _ in self.batches.get(batch_id, []):
+                doc_data = self.jobs.get(doc_id)
+                if doc_data:
+                    counts[doc_data.status.value] = counts.get(doc_data.status.value, 0) + 1
+            return counts
+
+    def list_batch(self, batch_id, offset=0, limit=100):
+        with self._lock:
+            docs = []
+            for doc_id, filename in self.batches.get(batch_id, [])[offset:offset + limit]:
+                if doc_id in self.jobs:
+                    doc_data = self.jobs[doc_id].model_copy(deep=True)
+                    doc_data.filename = filename or doc_data.filename
+                    docs.append(doc_data)
+            return docs
+
+    def delete(self, doc_id):
+        with self._lock:
+            self.jobs.pop(doc_id, None)
+            self.leases.pop(doc_id, None)
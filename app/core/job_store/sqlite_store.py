@@ -0,0 +1,271 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from app.models.document_models import DocumentData, DocumentStatus
+from app.core.job_store.job_store import JobStore, ABANDONED_ERROR
+
+# Jobs in these states never change again, so they are safe to cache in RAM
+# even when several API worker processes share the same database
+_TERMINAL_STATUSES = (DocumentStatus.COMPLETED, DocumentStatus.FAILED)
+_ACTIVE_STATUSES = (DocumentStatus.PENDING, DocumentStatus.PROCESSING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    doc_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    error TEXT,
+    cache_key TEXT,
+    heartbeat_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at);
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    batch_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    doc_id TEXT NOT NULL,
+    filename TEXT,
+    PRIMARY KEY (batch_id, position)
+);
+"""
+
+# At most one pending/processing job per cache key, enforced across all API workers
+_ACTIVE_KEY_INDEX = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_cache_key ON jobs(cache_key)
+WHERE cache_key IS NOT NULL AND status IN ('pending', 'processing');
+"""
+
+_COLUMNS = "doc_id, status, created_at, updated_at, error, cache_key, heartbeat_at, data"
+_ACTIVE_VALUES = tuple(status.value for status in _ACTIVE_STATUSES)
+
+
+class SQLiteJobStore(JobStore):
+    """Job store backed by a SQLite database, shared by all API worker processes."""
+
+    def __init__(self, db_path, cache_size=1024, lease_seconds=0):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        # 0 means leases never expire
+        self.lease_seconds = lease_seconds
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._local = threading.local()
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+            conn.executescript(_ACTIVE_KEY_INDEX)
+
+    def _migrate(self, conn):
+        """Add columns introduced after a database was first created."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if "cache_key" not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN cache_key TEXT")
+        if "heartbeat_at" not in columns:
+            # Jobs from before leases count as renewed when they were last updated
+            conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at TEXT")
+        batch_columns = {row[1] for row in conn.execute("PRAGMA table_info(batch_jobs)")}
+        if "filename" not in batch_columns:
+            conn.execute("ALTER TABLE batch_jobs ADD COLUMN filename TEXT")
+
+    def _connection(self):
+        """Return the SQLite connection of the current thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            # WAL lets readers in other processes work while a job is being written
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row_values(self, doc_data):
+        return (
+            doc_data.doc_id,
+            doc_data.status.value,
+            doc_data.created_at.isoformat(),
+            doc_data.updated_at.isoformat(),
+            doc_data.error,
+            doc_data.cache_key,
+            doc_data.updated_at.isoformat(),
+            doc_data.model_dump_json()
+        )
+
+    def _from_row(self, row):
+        status, updated_at, error, data = row
+        doc_data = DocumentData.model_validate_json(data)
+        # Status columns may have been changed by update_status() without rewriting the data
+        doc_data.status = DocumentStatus(status)
+        doc_data.updated_at = updated_at
+        doc_data.error = error
+        return doc_data
+
+    def _cache_get(self, doc_id):
+        with self._cache_lock:
+            doc_data = self._cache.get(doc_id)
+            if doc_data is not None:
+                self._cache.move_to_end(doc_id)
+            return doc_data
+
+    def _cache_put(self, doc_data):
+        if self.cache_size <= 0 or doc_data.status not in _TERMINAL_STATUSES:
+            return
+        with self._cache_lock:
+            self._cache[doc_data.doc_id] = doc_data
+            self._cache.move_to_end(doc_data.doc_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_discard(self, doc_ids):
+        with self._cache_lock:
+            for doc_id in doc_ids:
+                self._cache.pop(doc_id, None)
+
+    def add(self, doc_data):
+        with self._connection() as conn:
+            conn.execute(f"INSERT INTO jobs ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._row_values(doc_data))
+
+    def add_or_get_active(self, doc_data):
+        if not doc_data.cache_key:
+            self.add(doc_data)
+            return doc_data
+
+        for attempt in range(3):
+            try:
+                self.add(doc_data)
+                return doc_data
+            except sqlite3.IntegrityError:
+                if attempt == 2:
+                    raise
+
+            # Another upload of the same content is in flight; attach to it unless it was abandoned
+            self.expire_stale(doc_data.created_at)
+            row = self._connection().execute(
+                "SELECT status, updated_at, error, data FROM jobs WHERE cache_key = ? AND status IN (?, ?)",
+                (doc_data.cache_key,) + _ACTIVE_VALUES
+            ).fetchone()
+            if row is not None:
+                return self._from_row(row)
+            # The other job finished or expired in the meantime, so try to insert again
+
+    def get(self, doc_id):
+        doc_data = self._cache_get(doc_id)
+        if doc_data is not None:
+            return doc_data.model_copy(deep=True)
+
+        row = self._connection().execute(
+            "SELECT status, updated_at, error, data FROM jobs WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        doc_data = self._from_row(row)
+        self._cache_put(doc_data.model_copy(deep=True))
+        return doc_data
+
+    def save(self, doc_data):
+        self.save_many([doc_data])
+
+    def save_many(self, docs):
+        docs = list(docs)
+        with self._connection() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO jobs ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._row_values(doc_data) for doc_data in docs]
+            )
+        self._cache_discard([doc_data.doc_id for doc_data in docs])
+        for doc_data in docs:
+            self._cache_put(doc_data.model_copy(deep=True))
+
+    def update_status(self, doc_ids, status, updated_at, error=None):
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return
+        with self._connection() as conn:
+            conn.executemany(
+                "UPDATE jobs SET status = ?, updated_at = ?, heartbeat_at = ?, error = COALESCE(?, error) WHERE doc_id = ?",
+                [(status.value, updated_at.isoformat(), updated_at.isoformat(), error, doc_id) for doc_id in doc_ids]
+            )
+        self._cache_discard(doc_ids)
+
+    def renew_leases(self, doc_ids, now):
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return
+        with self._connection() as conn:
+            conn.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE doc_id = ? AND status IN (?, ?)",
+                [(now.isoformat(), doc_id) + _ACTIVE_VALUES for doc_id in doc_ids]
+            )
+
+    def expire_stale(self, now):
+        if not self.lease_seconds:
+            return []
+        expires_before = (now - timedelta(seconds=self.lease_seconds)).isoformat()
+        stale = "status IN (?, ?) AND COALESCE(heartbeat_at, updated_at) < ?"
+        with self._connection() as conn:
+            # Selected and updated in one write transaction, so a renewal in between cannot be lost
+            conn.execute("BEGIN IMMEDIATE")
+            expired = [row[0] for row in conn.execute(
+                f"SELECT doc_id FROM jobs WHERE {stale}", _ACTIVE_VALUES + (expires_before,)
+            )]
+            if expired:
+                conn.execute(
+                    f"UPDATE jobs SET status = ?, updated_at = ?, error = ? WHERE {stale}",
+                    (DocumentStatus.FAILED.value, now.isoformat(), ABANDONED_ERROR) + _ACTIVE_VALUES + (expires_before,)
+                )
+        self._cache_discard(expired)
+        return expired
+
+    def list_by_status(self, status, limit=100):
+        rows = self._connection().execute(
+            "SELECT status, updated_at, error, data FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?",
+            (status.value, limit)
+        ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def add_batch(self, batch_id, doc_ids, filenames=None):
+        filenames = filenames or [None] * len(doc_ids)
+        with self._connection() as conn:
+            start = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM batch_jobs WHERE batch_id = ?", (batch_id,)
+            ).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO batch_jobs (batch_id, position, doc_id, filename) VALUES (?, ?, ?, ?)",
+                [(batch_id, start + i, doc_id, filename) for i, (doc_id, filename) in enumerate(zip(doc_ids, filenames))]
+            )
+
+    def count_batch(self, batch_id):
+        rows = self._connection().execute(
+            "SELECT j.status, COUNT(*) FROM batch_jobs b JOIN jobs j ON j.doc_id = b.doc_id "
+            "WHERE b.batch_id = ? GROUP BY j.status",
+            (batch_id,)
+        ).fetchall()
+        return {status: count for status, count in rows}
+
+    def list_batch(self, batch_id, offset=0, limit=100):
+        rows = self._connection().execute(
+            "SELECT j.status, j.updated_at, j.error, j.data, b.filename FROM batch_jobs b "
+            "JOIN jobs j ON j.doc_id = b.doc_id WHERE b.batch_id = ? ORDER BY b.position LIMIT ? OFFSET ?",
+            (batch_id, limit, offset)
+        ).fetchall()
+        docs = []
+        for row in rows:
+            doc_data = self._from_row(row[:4])
+            if row[4]:
+                doc_data.filename = row[4]
+            docs.append(doc_data)
+        return docs
+
+    def delete(self, doc_id):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM jobs WHERE doc_id = ?", (doc_id,))
+        self._cache_discard([doc_id])
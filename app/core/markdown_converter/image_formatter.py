@@ -4,13 +4,18 @@ from config.config import HOST, PORT
 
 
 class ImageFormatter:
-    def __init__(self, base_url="/media/images"):
+    def __init__(self, base_url="/media/images", media_store=None):
         # 使用配置的主机和端口构建绝对URL基础路径
         self.server_base = f"http://{HOST}:{PORT}"
         # 保留原始的base_url作为路径
         self.base_url = base_url
-        # 完整的绝对URL路径
-        self.absolute_base_url = f"{self.server_base}{self.base_url}"
+        # Store holding the images; None links them by filename only
+        self.media_store = media_store
+        # 完整的绝对URL路径；相对路径（如CLI输出的图片目录）保持不变
+        if base_url.startswith("/"):
+            self.absolute_base_url = f"{self.server_base}{self.base_url}"
+        else:
+            self.absolute_base_url = self.base_url
     
     def create_image_markdown(self, image_info, alt_text=None):
         """
@@ -32,7 +37,7 @@ class ImageFormatter:
             return ""
         
         # Generate image URL - 使用绝对URL
-        image_url = f"{self.absolute_base_url}/{filename}"
+        image_url = f"{self.absolute_base_url}/{self._url_path(filename)}"
         
         # Use OCR text as alt text if available and no alt_text provided
         if not alt_text and "ocr_text" in image_info and image_info["ocr_text"]:
@@ -78,6 +83,18 @@ class ImageFormatter:
         
         return result
     
+    def _url_path(self, filename):
+        """
+        Return the part of an image URL after the base URL.
+
+        /media/images resolves filenames through the media store, so server
+        URLs use the filename; relative links (e.g. to the image directory
+        next to CLI output) point at where the store keeps the file.
+        """
+        if self.media_store is None or self.base_url.startswith("/"):
+            return filename
+        return self.media_store.relative_path(filename)
+    
     def get_image_relative_path(self, image_path, base_dir=None):
         """
         Convert an absolute image path to a relative path for Markdown.
@@ -100,4 +117,4 @@ class ImageFormatter:
         filename = os.path.basename(image_path)
         
         # Return the absolute URL
-        return f"{self.absolute_base_url}/{filename}" 
\ No newline at end of file
+        return f"{self.absolute_base_url}/{self._url_path(filename)}" 
\ No newline at end of file
@@ -3,9 +3,9 @@ from app.core.markdown_converter.image_formatter import ImageFormatter
 
 
 class MarkdownFormatter:
-    def __init__(self):
+    def __init__(self, image_base_url="/media/images", media_store=None):
         self.structure_parser = StructureParser()
-        self.image_formatter = ImageFormatter()
+        self.image_formatter = ImageFormatter(base_url=image_base_url, media_store=media_store)
     
     def format_text_as_markdown(self, text):
         """
@@ -127,15 +127,62 @@ class MarkdownFormatter:
         # Format images for Markdown
         doc_with_images = self.image_formatter.format_document_images(document_data)
         
+        linked_images = set()
+        markdown_content = self._format_body(doc_with_images, linked_images)
+        
+        # Add images that weren't included in the text
+        markdown_content += self._format_remaining_images(doc_with_images, linked_images, "\n## 图片与扫描内容\n\n")
+        
+        # 处理一些额外的格式问题
+        markdown_content = self._format_special_elements(markdown_content)
+        
+        return markdown_content.strip()
+    
+    def format_page_as_markdown(self, page_data):
+        """
+        Convert one page (or block) of a document to Markdown, for incremental output.
+        
+        Unlike format_document_as_markdown, images that are not referenced by
+        the text are placed right after the page content instead of in a
+        trailing section, so pages can be emitted as soon as they are ready.
+        
+        Args:
+            page_data: Dictionary containing the data of a single page
+            
+        Returns:
+            Markdown-formatted text of the page
+        """
+        doc_with_images = self.image_formatter.format_document_images(page_data)
+        
+        linked_images = set()
+        markdown_content = self._format_body(doc_with_images, linked_images)
+        markdown_content += self._format_remaining_images(doc_with_images, linked_images, "")
+        markdown_content = self._format_special_elements(markdown_content)
+        
+        return markdown_content.strip()
+    
+    def _format_body(self, doc_with_images, linked_images):
+        """
+        Format the text content of document data (with image Markdown already attached).
+        
+        The Markdown is collected in parts and joined once, and the image
+        Markdown placed in the text is added to linked_images, so neither
+        grows quadratically with the size of the document.
+        """
         # Initialize Markdown content
-        markdown_content = ""
+        parts = []
         
         # Add document title if available
         if "title" in doc_with_images and doc_with_images["title"]:
-            markdown_content += f"# {doc_with_images['title']}\n\n"
+            parts.append(f"# {doc_with_images['title']}\n\n")
         
         # Process based on the document structure
         if "merged_text" in doc_with_images and doc_with_images["merged_text"]:
+            # First image of every filename, for the image OCR items
+            images_by_filename = {}
+            for img in doc_with_images.get("images") or []:
+                images_by_filename.setdefault(img.get("filename"), img)
+            
             # If we have merged text (combined from document and OCR)
             for item in doc_with_images["merged_text"]:
                 if isinstance(item, dict):
@@ -156,91 +203,101 @@ class MarkdownFormatter:
                             elif "5" in style: level = 5
                             elif "6" in style: level = 6
                             
-                            markdown_content += f"{'#' * level} {content}\n\n"
+                            parts.append(f"{'#' * level} {content}\n\n")
                         else:
                             # Regular paragraph
-                            markdown_content += f"{content}\n\n"
+                            parts.append(f"{content}\n\n")
                     
                     elif item_type == "table":
-                        # Format table
-                        table_content = item.get("content", [])
-                        if table_content and isinstance(table_content, list):
-                            # Create Markdown table
-                            table_md = []
-                            for i, row in enumerate(table_content):
-                                table_md.append("| " + " | ".join(row) + " |")
-                                
-                                # Add separator after first row
-                                if i == 0:
-                                    separator = ["---"] * len(row)
-                                    table_md.append("| " + " | ".join(separator) + " |")
-                            
-                            markdown_content += "\n".join(table_md) + "\n\n"
+                        parts.append(self._format_table(item.get("content", [])))
                     
                     elif item_type == "image_ocr":
                         # Add image with OCR text
                         image_info = item.get("image_info", {})
-                        if image_info:
-                            for img in doc_with_images["images"]:
-                                if img.get("filename") == image_info.get("filename"):
-                                    # 添加更大的间距以及分隔线
-                                    markdown_content += "\n---\n\n"
-                                    markdown_content += img.get("markdown", "") + "\n\n"
-                                    if content.strip():
-                                        markdown_content += f"*Image text:* {content}\n\n"
-                                    break
+                        img = images_by_filename.get(image_info.get("filename")) if image_info else None
+                        if img is not None:
+                            # 添加更大的间距以及分隔线
+                            parts.append("\n---\n\n")
+                            parts.append(img.get("markdown", "") + "\n\n")
+                            linked_images.add(img.get("markdown", ""))
+                            if content.strip():
+                                parts.append(f"*Image text:* {content}\n\n")
                     
                     elif item_type == "ocr_text":
                         # Format OCR text
-                        markdown_content += self.format_text_as_markdown(content) + "\n\n"
+                        parts.append(self.format_text_as_markdown(content) + "\n\n")
                     
                     else:
                         # Default case - just add the content
-                        markdown_content += content + "\n\n"
+                        parts.append(content + "\n\n")
                 
                 elif isinstance(item, str):
                     # Simple string content - 尝试检测是否应为标题
                     if len(item.strip()) < 100 and item.strip().isupper():
-                        markdown_content += f"## {item}\n\n"
+                        parts.append(f"## {item}\n\n")
                     else:
-                        markdown_content += self._clean_text(item) + "\n\n"
+                        parts.append(self._clean_text(item) + "\n\n")
         
         # If we have text but no merged_text
         elif "text" in doc_with_images and doc_with_images["text"]:
             if isinstance(doc_with_images["text"], list):
                 for item in doc_with_images["text"]:
-                    if isinstance(item, dict) and "content" in item:
-                        markdown_content += self.format_text_as_markdown(item["content"]) + "\n\n"
+                    if isinstance(item, dict) and item.get("type") == "table":
+                        # Table content is a list of rows, not text
+                        parts.append(self._format_table(item.get("content", [])))
+                    elif isinstance(item, dict) and "content" in item:
+                        parts.append(self.format_text_as_markdown(item["content"]) + "\n\n")
                     elif isinstance(item, str):
-                        markdown_content += self.format_text_as_markdown(item) + "\n\n"
+                        parts.append(self.format_text_as_markdown(item) + "\n\n")
             elif isinstance(doc_with_images["text"], str):
-                markdown_content += self.format_text_as_markdown(doc_with_images["text"]) + "\n\n"
+                parts.append(self.format_text_as_markdown(doc_with_images["text"]) + "\n\n")
         
-        # Add images that weren't included in the text
+        return "".join(parts)
+    
+    def _format_table(self, table_content):
+        """
+        Format the rows of a table as a Markdown table, the first row being the header.
+        """
+        if not table_content or not isinstance(table_content, list):
+            return ""
+        
+        table_md = []
+        for i, row in enumerate(table_content):
+            table_md.append("| " + " | ".join(row) + " |")
+            
+            # Add separator after first row
+            if i == 0:
+                separator = ["---"] * len(row)
+                table_md.append("| " + " | ".join(separator) + " |")
+        
+        return "\n".join(table_md) + "\n\n"
+    
+    def _format_remaining_images(self, doc_with_images, linked_images, heading):
+        """
+        Format the images that are not already part of the Markdown content,
+        i.e. whose Markdown _format_body() did not add to linked_images.
+        """
         if "images" in doc_with_images and doc_with_images["images"]:
-            image_section = "\n## 图片与扫描内容\n\n"
+            image_section = [heading]
             has_images = False
             
             for img in doc_with_images["images"]:
                 if "markdown" in img and img["markdown"]:
-                    # Check if this image is already in the markdown_content
-                    if img["markdown"] not in markdown_content:
+                    # Check if the text already links this image
+                    if img["markdown"] not in linked_images:
                         # 添加分隔线以更好地区分图片
-                        image_section += "---\n\n"
-                        image_section += img["markdown"] + "\n\n"
+                        image_section.append("---\n\n")
+                        image_section.append(img["markdown"] + "\n\n")
                         has_images = True
                         
                         # Add OCR text if available, 使用更好的格式
                         if "ocr_text" in img and img["ocr_text"]:
-                            image_section += f"*Image text:* {img['ocr_text']}\n\n"
+                            image_section.append(f"*Image text:* {img['ocr_text']}\n\n")
             
             if has_images:
-                markdown_content += image_section
+                return "".join(image_section)
         
-        # 处理一些额外的格式问题
-        markdown_content = self._format_special_elements(markdown_content)
-        
-        return markdown_content.strip()
+        return ""
         
     def _format_special_elements(self, content):
         """
@@ -37,12 +37,19 @@ class StructureParser:
         if not headings:
             lines = text.split('\n')
             current_line_idx = 0
+            # Offset of every line in the text, so positions are not searched for from the start
+            offsets = []
+            offset = 0
+            for line in lines:
+                offsets.append(offset)
+                offset += len(line) + 1
             
             for i, line in enumerate(lines):
                 # Skip if already past this line
                 if i < current_line_idx:
                     continue
                 
+                line_start = offsets[i] + len(line) - len(line.lstrip())
                 line = line.strip()
                 current_line_idx = i + 1
                 
@@ -56,8 +63,8 @@ class StructureParser:
                     headings.append({
                         "level": level,
                         "text": line,
-                        "start": text.find(line),
-                        "end": text.find(line) + len(line)
+                        "start": line_start,
+                        "end": line_start + len(line)
                     })
                 
                 # Check if the line is followed by underlines (===== or -----)
@@ -68,8 +75,8 @@ class StructureParser:
                         headings.append({
                             "level": level,
                             "text": line,
-                            "start": text.find(line),
-                            "end": text.find(line) + len(line) + len(next_line) + 1
+                            "start": line_start,
+                            "end": line_start + len(line) + len(next_line) + 1
                         })
                         current_line_idx = i + 2  # Skip the underline
         
@@ -130,18 +137,19 @@ class StructureParser:
         tables = []
         
         # Find consecutive table rows
-        rows = [match.group(1) for match in self.table_row_pattern.finditer(text)]
+        matches = list(self.table_row_pattern.finditer(text))
         
-        if rows:
+        if matches:
             # Group consecutive rows into tables
             current_table = []
             current_table_start = None
             
-            for i, row in enumerate(rows):
-                row_start = text.find(row)
+            for i, match in enumerate(matches):
+                row = match.group(1)
+                row_start = match.start(1)
                 
                 # If this is the first row or it's consecutive to the previous row
-                if not current_table or (row_start - (text.find(rows[i-1]) + len(rows[i-1]))) < 5:
+                if not current_table or (row_start - matches[i-1].end(1)) < 5:
                     if not current_table:
                         current_table_start = row_start
                     current_table.append(row)
@@ -0,0 +1,303 @@
+import os
+import re
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+from config.config import IMAGES_DIR, MEDIA_STORE_SHARD_LEVELS, MEDIA_STORE_INDEX_PATH
+
+# Names of stored blobs: the SHA-256 of their content and a file extension
+_BLOB_NAME = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]{1,10})$")
+
+# Read size when hashing files that are stored by copying
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+);
+"""
+
+
+def _copy_file(source, target):
+    """
+    Copy one open file into another without passing the data through Python.
+
+    copy_file_range() lets the kernel copy (or, on copy-on-write file
+    systems, share) the blocks, sendfile() copies through the page cache;
+    platforms without either fall back to a buffered copy.
+    """
+    source_fd, target_fd = source.fileno(), target.fileno()
+    size = os.fstat(source_fd).st_size
+
+    copy_file_range = getattr(os, "copy_file_range", None)
+    if copy_file_range is not None:
+        try:
+            copied = 0
+            while copied < size:
+                count = copy_file_range(source_fd, target_fd, size - copied, copied, copied)
+                if not count:
+                    break
+                copied += count
+            if copied == size:
+                return
+        except OSError:
+            # e.g. EXDEV across file systems on older kernels, or no support in the file system
+            pass
+
+    sendfile = getattr(os, "sendfile", None)
+    if sendfile is not None:
+        try:
+            os.lseek(target_fd, 0, os.SEEK_SET)
+            copied = 0
+            while copied < size:
+                count = sendfile(target_fd, source_fd, copied, size - copied)
+                if not count:
+                    break
+                copied += count
+            if copied == size:
+                return
+        except OSError:
+            pass
+
+    source.seek(0)
+    target.seek(0)
+    target.truncate()
+    shutil.copyfileobj(source, target)
+
+
+class MediaStore:
+    """
+    Content-addressed store of the images extracted from documents.
+
+    Blobs are named after the SHA-256 of their content, so an image that
+    appears in several documents is stored once, and are spread over
+    nested directories by the first characters of the hash to keep every
+    directory small. Writes are atomic. With an index database, every
+    put() or acquire() of a blob holds a reference that release() gives
+    back; a blob is deleted when its last reference is released. Jobs
+    hold references to the images of their result until they are deleted,
+    and result-cache entries until they are evicted.
+    """
+
+    def __init__(self, root_dir, shard_levels=MEDIA_STORE_SHARD_LEVELS, index_path=None):
+        self.root_dir = root_dir
+        # Levels of two-character directories, e.g. ab/cd/abcd....png for 2
+        self.shard_levels = shard_levels
+        self.index_path = index_path
+        self._local = threading.local()
+
+        os.makedirs(root_dir, exist_ok=True)
+        if index_path:
+            os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+            with self._connection() as conn:
+                conn.executescript(_SCHEMA)
+
+    def __getstate__(self):
+        # Stores are sent to the PDF shard processes; connections stay with their process
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self):
+        """Return the index connection of the current thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30)
+            # Several worker processes store images at the same time
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def relative_path(self, name):
+        """
+        Return where a blob is stored, relative to the store directory.
+
+        Args:
+            name: Blob name returned by put()
+
+        Returns:
+            Relative path using "/" separators
+
+        Raises:
+            ValueError: If the name could point outside the store
+        """
+        match = _BLOB_NAME.match(name)
+        if match is None:
+            # Images stored before the store was content-addressed sit directly in the directory
+            if not name or name.startswith(".") or os.path.basename(name) != name or "\\" in name:
+                raise ValueError(f"Invalid media name: {name!r}")
+            return name
+
+        digest = match.group(1)
+        shards = [digest[2 * level:2 * level + 2] for level in range(self.shard_levels)]
+        return "/".join(shards + [name])
+
+    def path(self, name):
+        """Return the absolute path of a blob (see relative_path())."""
+        return os.path.join(self.root_dir, *self.relative_path(name).split("/"))
+
+    def exists(self, name):
+        """Return True if a blob with this name is stored."""
+        try:
+            return os.path.isfile(self.path(name))
+        except ValueError:
+            return False
+
+    def put(self, data, extension=".png"):
+        """
+        Store a blob and take a reference to it.
+
+        Content that is already stored is not written again.
+
+        Args:
+            data: The blob content
+            extension: File extension, including the dot
+
+        Returns:
+            The blob name
+        """
+        name = hashlib.sha256(data).hexdigest() + extension.lower()
+        # Count the reference first, so a concurrent release() cannot delete the blob after the check below
+        self._add_ref(name, len(data))
+
+        path = self.path(name)
+        if not os.path.exists(path):
+            self._write(path, lambda f: f.write(data))
+        return name
+
+    def put_file(self, source_path, extension=".png"):
+        """
+        Store a copy of a file and take a reference to it.
+
+        Like put(), but the file is hashed in chunks and copied by the
+        kernel instead of being read into memory.
+
+        Args:
+            source_path: Path of the file to store
+            extension: File extension, including the dot
+
+        Returns:
+            The blob name
+        """
+        digest = hashlib.sha256()
+        with open(source_path, "rb") as source:
+            for chunk in iter(lambda: source.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+
+            name = digest.hexdigest() + extension.lower()
+            self._add_ref(name, os.fstat(source.fileno()).st_size)
+
+            path = self.path(name)
+            if not os.path.exists(path):
+                self._write(path, lambda f: _copy_file(source, f))
+        return name
+
+    def _write(self, path, write):
+        """Create a blob file with write(file), atomically."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial image
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        os.replace(temp_path, path)
+
+    def acquire(self, name):
+        """Take another reference to a stored blob, e.g. for a result that reuses it."""
+        self._add_ref(name, os.path.getsize(self.path(name)))
+
+    def release(self, name):
+        """
+        Give back a reference to a blob, deleting the blob when it was the last one.
+
+        Without an index references are not counted and blobs are kept.
+
+        Args:
+            name: Blob name returned by put()
+        """
+        if not self.index_path:
+            return
+
+        with self._connection() as conn:
+            conn.execute("UPDATE blobs SET refs = refs - 1 WHERE name = ?", (name,))
+            row = conn.execute("SELECT refs FROM blobs WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] <= 0:
+                conn.execute("DELETE FROM blobs WHERE name = ?", (name,))
+                # Deleted before the transaction ends, so a put() of the same content writes it again
+                try:
+                    os.remove(self.path(name))
+                except OSError:
+                    pass
+
+    def refs(self, name):
+        """Return the number of references to a blob (0 without an index)."""
+        if not self.index_path:
+            return 0
+        row = self._connection().execute("SELECT refs FROM blobs WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def acquire_images(self, images):
+        """
+        Take one reference to every blob an image list links, for a result that holds them.
+
+        Blobs that are gone are skipped; the result links to nothing there anyway.
+
+        Args:
+            images: Image dictionaries or ImageInfo models of a result
+        """
+        for name in blob_names(images):
+            try:
+                self.acquire(name)
+            except OSError:
+                pass
+
+    def release_images(self, images):
+        """Give back the references acquire_images() took for an image list."""
+        for name in blob_names(images):
+            self.release(name)
+
+    def _add_ref(self, name, size):
+        if not self.index_path:
+            return
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO blobs (name, size, refs) VALUES (?, ?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET refs = refs + 1",
+                (name, size)
+            )
+
+
+def blob_names(images):
+    """Return the distinct blob names an image list links, in order."""
+    names = {}
+    for image in images or []:
+        name = image.get("filename") if isinstance(image, dict) else getattr(image, "filename", None)
+        if name:
+            names[name] = None
+    return list(names)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_media_store():
+    """Return the store of the images served under /media/images, shared by this process."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = MediaStore(IMAGES_DIR, index_path=MEDIA_STORE_INDEX_PATH)
+        return _default_store
@@ -0,0 +1,197 @@
+import math
+import threading
+
+# Latency buckets in seconds, from quick cleaning steps up to OCR of long scans
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), function=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        # Unlabelled metrics can read their value from a function when scraped
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _samples(self):
+        if self.function is not None:
+            return [f"{self.name} {_format_value(self.function())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        """Increase the counter of a label combination."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the current count of a label combination."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        """Record one observation for a label combination."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        lines = []
+        for key, (counts, total) in items:
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=(), function=None):
+        return self._register(Counter(name, documentation, labels, function))
+
+    def gauge(self, name, documentation, labels=(), function=None):
+        return self._register(Gauge(name, documentation, labels, function))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+# Process-wide registry and the metrics of the conversion service
+registry = MetricsRegistry()
+
+stage_duration = registry.histogram(
+    "doc2md_stage_duration_seconds", "Time spent in each pipeline stage per document", labels=("stage",)
+)
+job_duration = registry.histogram(
+    "doc2md_job_duration_seconds", "Time from the start of processing to the result", labels=("doc_type",)
+)
+jobs_total = registry.counter("doc2md_jobs_total", "Finished conversion jobs", labels=("doc_type", "status"))
+pages_total = registry.counter("doc2md_pages_processed_total", "Document pages converted")
+cached_pages_total = registry.counter("doc2md_cached_pages_total", "PDF pages reused from the page cache")
+images_total = registry.counter("doc2md_images_processed_total", "Images extracted and OCR'd")
+duplicate_images_total = registry.counter(
+    "doc2md_duplicate_images_total", "Repeated images that reused the stored copy and OCR result of their first occurrence"
+)
+bytes_total = registry.counter("doc2md_bytes_processed_total", "Bytes of uploaded documents converted")
+ocr_skipped_images_total = registry.counter(
+    "doc2md_ocr_skipped_images_total", "Images not OCR'd because they cannot contain text", labels=("reason",)
+)
+ocr_regions_total = registry.counter("doc2md_ocr_regions_total", "Text regions recognized by OCR")
+ocr_seconds_total = registry.counter("doc2md_ocr_seconds_total", "Time spent in OCR")
+failures_total = registry.counter(
+    "doc2md_failures_total", "Failed jobs and recovered per-image errors", labels=("stage", "exception")
+)
+
+
+def _ocr_regions_per_second():
+    ocr_seconds = ocr_seconds_total.value()
+    return ocr_regions_total.value() / ocr_seconds if ocr_seconds else 0.0
+
+
+ocr_regions_per_second = registry.gauge(
+    "doc2md_ocr_regions_per_second", "Text regions recognized per second of OCR time", function=_ocr_regions_per_second
+)
+
+
+def observe_pipeline_stats(stats, size):
+    """
+    Record the statistics of a finished conversion.
+
+    Args:
+        stats: The "stats" dictionary of a pipeline result
+        size: Size of the converted document in bytes
+    """
+    for stage, seconds in stats.get("stages", {}).items():
+        stage_duration.observe(seconds, stage=stage)
+
+    pages_total.inc(stats.get("pages", 0))
+    cached_pages_total.inc(stats.get("cached_pages", 0))
+    images_total.inc(stats.get("images", 0))
+    duplicate_images_total.inc(stats.get("duplicate_images", 0))
+    ocr_regions_total.inc(stats.get("ocr_regions", 0))
+    for reason, count in stats.get("ocr_skipped", {}).items():
+        ocr_skipped_images_total.inc(count, reason=reason)
+    ocr_seconds_total.inc(stats.get("stages", {}).get("ocr", 0.0))
+    bytes_total.inc(size)
+
+    for error in stats.get("errors", []):
+        failures_total.inc(stage=error["stage"], exception=error["exception"])
@@ -0,0 +1,164 @@
+from config.config import (
+    OCR_PREPROCESS_ENABLED, OCR_MAX_SIDE, OCR_TARGET_DPI, OCR_PREPROCESS_GRAYSCALE, OCR_NORMALIZE_CONTRAST
+)
+
+# DPI tags above this are taken to be wrong and ignored
+MAX_PLAUSIBLE_DPI = 2400
+# Share of the darkest and of the brightest pixels clipped by the contrast stretch
+CONTRAST_CLIP = 0.005
+# EXIF orientation tag, and its values for images stored rotated by 90 degrees
+ORIENTATION_TAG = 0x0112
+QUARTER_TURN_ORIENTATIONS = (5, 6, 7, 8)
+
+
+class PreparedImage:
+    """An image ready for PaddleOCR, with the scale back to the pixels of the original."""
+
+    def __init__(self, image, scale_x=1.0, scale_y=1.0):
+        # A BGR array, or the original path when preprocessing is disabled
+        self.image = image
+        self.scale_x = scale_x
+        self.scale_y = scale_y
+
+    def to_original(self, box):
+        """Map the corner points of a detected text box back to the pixels of the original image, upright."""
+        if self.scale_x == 1.0 and self.scale_y == 1.0:
+            return box
+        return [[float(x) * self.scale_x, float(y) * self.scale_y] for x, y in box]
+
+
+def _stretch_contrast(pixels):
+    """
+    Stretch the brightness of 8-bit pixels to the full 0-255 range.
+
+    The darkest and brightest CONTRAST_CLIP of the pixels are clipped, so
+    a few specks do not hold the range open. The limits come from a
+    histogram and are applied through a lookup table, so this is two
+    passes over the pixels whatever their number.
+    """
+    import numpy as np
+
+    cumulative = np.cumsum(np.bincount(pixels.ravel(), minlength=256))
+    clip = cumulative[-1] * CONTRAST_CLIP
+    low = int(np.searchsorted(cumulative, clip, side="right"))
+    high = int(np.searchsorted(cumulative, cumulative[-1] - clip, side="left"))
+    if high <= low or (low == 0 and high == 255):
+        return pixels
+
+    lut = np.clip((np.arange(256, dtype=np.float32) - low) * (255.0 / (high - low)), 0, 255).astype(np.uint8)
+    return lut[pixels]
+
+
+def flatten_alpha(image):
+    """
+    Composite an image with transparency onto white.
+
+    Dropping the alpha channel keeps the colour under transparent pixels,
+    which is black or undefined in most files, e.g. PDF images with a soft
+    mask; text drawn on transparency would vanish into it.
+
+    Args:
+        image: PIL image
+
+    Returns:
+        An RGBA image flattened onto white, or the image itself if it has no transparency
+    """
+    from PIL import Image
+
+    if image.mode not in ("RGBA", "LA", "PA") and "transparency" not in image.info:
+        return image
+    image = image.convert("RGBA")
+    return Image.alpha_composite(Image.new("RGBA", image.size, (255, 255, 255, 255)), image)
+
+
+class OCRImagePreprocessor:
+    """
+    Prepares images for OCR at the resolution text recognition needs.
+
+    PaddleOCR reads the file at its full size, so a 600 DPI scan of
+    7000x9000 pixels is decoded, colour-converted and cropped for
+    recognition at full size, although text lines are resized to a few
+    dozen pixels high for recognition anyway. Images are downscaled to
+    OCR_TARGET_DPI when their DPI is known and to at most OCR_MAX_SIDE
+    pixels, converted to grayscale, contrast-stretched and flattened onto
+    white; the boxes OCR finds are mapped back to the original pixels.
+    Photos are turned upright by their EXIF orientation first, as OpenCV
+    does when PaddleOCR reads a file, and boxes refer to the upright image.
+    """
+
+    def __init__(self, enabled=OCR_PREPROCESS_ENABLED, max_side=OCR_MAX_SIDE, target_dpi=OCR_TARGET_DPI,
+                 grayscale=OCR_PREPROCESS_GRAYSCALE, normalize_contrast=OCR_NORMALIZE_CONTRAST):
+        self.enabled = enabled
+        self.max_side = max_side
+        self.target_dpi = target_dpi
+        self.grayscale = grayscale
+        self.normalize_contrast = normalize_contrast
+
+    def _scale(self, image):
+        """Return the factor an image is downscaled by, at most 1."""
+        scale = 1.0
+        if self.max_side:
+            scale = min(scale, self.max_side / max(image.size))
+
+        dpi = image.info.get("dpi")
+        if self.target_dpi and dpi:
+            try:
+                resolution = max(float(value) for value in dpi)
+            except (TypeError, ValueError):
+                resolution = 0
+            if self.target_dpi < resolution <= MAX_PLAUSIBLE_DPI:
+                scale = min(scale, self.target_dpi / resolution)
+        return scale
+
+    def prepare(self, image_path):
+        """
+        Load an image for OCR.
+
+        Args:
+            image_path: Path to the image file
+
+        Returns:
+            PreparedImage whose image PaddleOCR takes in place of the path
+        """
+        if not self.enabled:
+            return PreparedImage(image_path)
+
+        from PIL import Image, ImageOps
+        import numpy as np
+
+        with Image.open(image_path) as image:
+            orientation = image.getexif().get(ORIENTATION_TAG, 1)
+            quarter_turn = orientation in QUARTER_TURN_ORIENTATIONS
+
+            # Sizes are those of the upright image
+            width, height = image.size[::-1] if quarter_turn else image.size
+            scale = self._scale(image)
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            # JPEGs are decoded at a fraction of their size directly; the draft size is in stored orientation
+            image.draft("L" if self.grayscale else "RGB", size[::-1] if quarter_turn else size)
+            if orientation != 1:
+                # Rotated after the draft, so only the reduced image is transposed
+                ImageOps.exif_transpose(image, in_place=True)
+
+            if image.mode in ("I", "I;16", "I;16B", "I;16L", "F"):
+                # High bit depth scans; Pillow would clip them to 8 bits instead of scaling
+                pixels = np.asarray(image, dtype=np.float32)
+                pixels = (pixels - pixels.min()) * (255.0 / max(float(pixels.max() - pixels.min()), 1.0))
+                image = Image.fromarray(pixels.astype(np.uint8))
+            else:
+                image = flatten_alpha(image)
+
+            image = image.convert("L" if self.grayscale else "RGB")
+            if image.size != size:
+                image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            pixels = np.asarray(image)
+
+        if self.normalize_contrast:
+            pixels = _stretch_contrast(pixels)
+        if self.grayscale:
+            # PaddleOCR takes three-channel images
+            pixels = np.repeat(pixels[:, :, np.newaxis], 3, axis=2)
+        else:
+            # PaddleOCR takes arrays in OpenCV's BGR order
+            pixels = np.ascontiguousarray(pixels[:, :, ::-1])
+        return PreparedImage(pixels, width / size[0], height / size[1])
@@ -0,0 +1,79 @@
+from app.core.ocr.image_preprocessor import flatten_alpha
+from config.config import (
+    OCR_GATE_ENABLED, OCR_GATE_MIN_SIDE, OCR_GATE_MAX_ASPECT, OCR_GATE_MIN_STDDEV, OCR_GATE_MIN_EDGE_DENSITY,
+    OCR_GATE_DETECT
+)
+
+# Images are analysed at this size at most; enough to keep the strokes of body text apart
+ANALYSIS_SIZE = 512
+# Brightness step between neighbouring pixels (0-255) that counts as an edge
+EDGE_THRESHOLD = 48
+
+
+class OCRGate:
+    """
+    Decides before OCR whether an image can contain text.
+
+    Icons, bullets, rules and photos are common in documents and make up
+    most of their images, but full OCR (detection, angle classification
+    and recognition) costs the same for them as for a scanned page. The
+    gate rejects them with cheap checks, from cheapest to most expensive:
+    image size and aspect ratio, then the contrast and edge density of a
+    downscaled grayscale copy flattened onto white, and optionally a
+    detection-only OCR pass.
+    """
+
+    def __init__(self, enabled=OCR_GATE_ENABLED, min_side=OCR_GATE_MIN_SIDE, max_aspect=OCR_GATE_MAX_ASPECT,
+                 min_stddev=OCR_GATE_MIN_STDDEV, min_edge_density=OCR_GATE_MIN_EDGE_DENSITY, detect=OCR_GATE_DETECT):
+        self.enabled = enabled
+        self.min_side = min_side
+        self.max_aspect = max_aspect
+        self.min_stddev = min_stddev
+        self.min_edge_density = min_edge_density
+        self.detect = detect
+
+    def check(self, image_info, detect_text=None):
+        """
+        Check whether an image should be skipped.
+
+        Args:
+            image_info: Image metadata with path, and width and height when known
+            detect_text: Callable(path) returning the number of text boxes OCR detection
+                finds, for the detection-only pass; None leaves it out
+
+        Returns:
+            The reason to skip the image ("size", "aspect", "blank", "no_edges",
+            "no_text_boxes"), or None if it should be OCR'd
+        """
+        if not self.enabled:
+            return None
+
+        from PIL import Image
+        import numpy as np
+
+        with Image.open(image_info["path"]) as image:
+            width, height = image_info.get("width") or image.width, image_info.get("height") or image.height
+            if min(width, height) < self.min_side:
+                return "size"
+            if max(width, height) / min(width, height) > self.max_aspect:
+                return "aspect"
+
+            # JPEGs can be decoded at a fraction of their size directly
+            image.draft("L", (ANALYSIS_SIZE, ANALYSIS_SIZE))
+            # Transparent areas are analysed as the white page they are shown on, as OCR sees them
+            gray = flatten_alpha(image).convert("L")
+        gray.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+        pixels = np.asarray(gray, dtype=np.int16)
+
+        if pixels.std() < self.min_stddev:
+            return "blank"
+
+        # Text is made of many sharp strokes; photos and drawings have far fewer strong edges
+        dx = np.abs(np.diff(pixels, axis=1))[:-1, :]
+        dy = np.abs(np.diff(pixels, axis=0))[:, :-1]
+        if ((dx + dy) > EDGE_THRESHOLD).mean() < self.min_edge_density:
+            return "no_edges"
+
+        if self.detect and detect_text is not None and not detect_text(image_info["path"]):
+            return "no_text_boxes"
+        return None
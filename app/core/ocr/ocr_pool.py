@@ -0,0 +1,101 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+from app.core.ocr.paddle_ocr import PaddleOCRProcessor
+from config.config import OCR_POOL_SIZE, OCR_CPU_THREADS, OCR_ENABLE_MKLDNN
+
+
+class OCRModelPool:
+    """
+    A fixed number of loaded PaddleOCR instances shared by the jobs of a process.
+
+    Loading the detection, classification and recognition models takes
+    seconds, so instances are created once (up front by warm_up, or lazily
+    on first checkout) and then lent to jobs, which only pay for inference.
+    """
+
+    def __init__(self, size=OCR_POOL_SIZE, cpu_threads=OCR_CPU_THREADS, enable_mkldnn=OCR_ENABLE_MKLDNN):
+        self.size = max(1, size)
+        self.cpu_threads = cpu_threads
+        self.enable_mkldnn = enable_mkldnn
+        # LIFO, so the most recently used (warmest) instance is lent out first
+        self._available = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        return PaddleOCRProcessor(cpu_threads=self.cpu_threads, enable_mkldnn=self.enable_mkldnn)
+
+    def warm_up(self):
+        """Load all instances of the pool now instead of on first use."""
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                self._available.put(self._create())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def checkout(self, timeout=None):
+        """
+        Borrow an OCR instance, loading a new one if the pool is not full yet.
+
+        Args:
+            timeout: Seconds to wait for a free instance, or None to wait forever
+
+        Returns:
+            A PaddleOCRProcessor; give it back with checkin()
+        """
+        try:
+            return self._available.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+
+        if create:
+            try:
+                return self._create()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._available.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No OCR instance became available")
+
+    def checkin(self, engine):
+        """Return a borrowed OCR instance to the pool."""
+        self._available.put(engine)
+
+    @contextmanager
+    def engine(self, timeout=None):
+        """Borrow an OCR instance for the duration of a with block."""
+        engine = self.checkout(timeout=timeout)
+        try:
+            yield engine
+        finally:
+            self.checkin(engine)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """Return the process-wide OCR model pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OCRModelPool()
+        return _pool
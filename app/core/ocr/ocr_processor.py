@@ -1,9 +1,15 @@
-from app.core.ocr.paddle_ocr import PaddleOCRProcessor
+from contextlib import ExitStack
+
+from app.core.ocr.ocr_pool import get_ocr_pool
+from app.core.ocr.ocr_gate import OCRGate
 
 
 class OCRProcessor:
-    def __init__(self):
-        self.ocr_engine = PaddleOCRProcessor()
+    def __init__(self, pool=None, gate=None):
+        # OCR models are borrowed from the process-wide pool instead of being loaded per processor
+        self.pool = pool or get_ocr_pool()
+        # Images that cannot contain text are skipped before OCR
+        self.gate = gate or OCRGate()
     
     def process_single_image(self, image_path):
         """
@@ -15,26 +21,37 @@ class OCRProcessor:
         Returns:
             OCR results
         """
-        return self.ocr_engine.process_image(image_path)
+        with self.pool.engine() as engine:
+            return engine.process_image(image_path)
     
-    def process_multiple_images(self, image_paths):
+    def process_multiple_images(self, image_paths, progress_callback=None):
         """
         Process multiple images with OCR and combine results.
         
         Args:
             image_paths: List of paths to image files
+            progress_callback: Optional callable(stage, current, total) called after each image
             
         Returns:
             Combined OCR results
         """
-        return self.ocr_engine.process_images(image_paths)
+        with self.pool.engine() as engine:
+            return engine.process_images(image_paths, progress_callback=progress_callback)
     
-    def process_document_images(self, document_data):
+    def process_document_images(self, document_data, progress_callback=None, ocr_cache=None):
         """
         Process all images extracted from a document.
         
+        Images with the same content (the same "hash", or else the same path)
+        are OCR'd once; every later occurrence reuses the first result.
+        Images the gate rejects get no OCR text and the reason under
+        "ocr_skipped"; their number is reported as ocr["skipped_images"].
+        
         Args:
             document_data: Dictionary containing extracted document data with images
+            progress_callback: Optional callable(stage, current, total) called after each image
+            ocr_cache: Optional dictionary of OCR results by image, shared by the calls
+                for one document so images repeated on several pages are OCR'd once
             
         Returns:
             Updated document data with OCR results for each image
@@ -46,27 +63,66 @@ class OCRProcessor:
         if "images" not in result or not result["images"]:
             return result
         
-        # Get paths of all images
-        image_paths = [img["path"] for img in result["images"]]
+        if ocr_cache is None:
+            ocr_cache = {}
         
-        # Process all images as a batch
-        ocr_results = self.process_multiple_images(image_paths)
+        images = result["images"]
+        full_text = ""
+        details = []
+        errors = []
+        skipped = 0
         
-        # Add OCR results to each image
-        for i, img in enumerate(result["images"]):
-            # Find OCR details for this image
-            img_details = [detail for detail in ocr_results["details"] 
-                          if detail.get("image_index") == i]
+        with ExitStack() as stack:
+            engine = None
+            
+            def borrow():
+                # Pages whose images are all skipped do not wait for an OCR model
+                nonlocal engine
+                if engine is None:
+                    engine = stack.enter_context(self.pool.engine())
+                return engine
             
-            # Add OCR text to the image
-            img["ocr_text"] = " ".join([detail["text"] for detail in img_details])
-            img["ocr_details"] = img_details
+            for i, img in enumerate(images):
+                key = img.get("hash") or img["path"]
+                ocr_result = ocr_cache.get(key)
+                if ocr_result is None:
+                    try:
+                        reason = self.gate.check(img, detect_text=lambda path: borrow().detect_text(path))
+                        if reason:
+                            ocr_result = {"text": "", "details": [], "skipped": reason}
+                        else:
+                            ocr_result = borrow().process_image(img["path"])
+                        ocr_cache[key] = ocr_result
+                    except Exception as e:
+                        print(f"Error processing image {img['path']}: {str(e)}")
+                        # Keep the original exception type for the failure metrics
+                        errors.append({"stage": "ocr", "exception": type(e.__cause__ or e).__name__})
+                
+                if ocr_result is None:
+                    img["ocr_text"] = ""
+                    img["ocr_details"] = []
+                else:
+                    # Add OCR results to each image
+                    img_details = [dict(detail, image_index=i) for detail in ocr_result["details"]]
+                    img["ocr_text"] = " ".join([detail["text"] for detail in img_details])
+                    img["ocr_details"] = img_details
+                    if ocr_result.get("skipped"):
+                        img["ocr_skipped"] = ocr_result["skipped"]
+                        skipped += 1
+                    
+                    full_text += ocr_result["text"] + "\n\n"
+                    details.extend(img_details)
+                
+                if progress_callback:
+                    progress_callback("ocr", i + 1, len(images))
         
         # Add combined OCR text to the document
         if "ocr" not in result:
             result["ocr"] = {}
         
-        result["ocr"]["full_text"] = ocr_results["text"]
-        result["ocr"]["details"] = ocr_results["details"]
+        result["ocr"]["full_text"] = full_text.strip()
+        result["ocr"]["details"] = details
+        result["ocr"]["errors"] = errors
+        result["ocr"]["skipped_images"] = skipped
         
-        return result 
\ No newline at end of file
+        return result
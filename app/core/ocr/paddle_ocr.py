@@ -1,17 +1,23 @@
-from paddleocr import PaddleOCR
 import os
-import numpy as np
-from PIL import Image
 
-from config.config import OCR_LANGUAGE, OCR_USE_ANGLE_CLS, OCR_USE_GPU
+from app.core.ocr.image_preprocessor import OCRImagePreprocessor
+from config.config import OCR_LANGUAGE, OCR_USE_ANGLE_CLS, OCR_USE_GPU, OCR_CPU_THREADS, OCR_ENABLE_MKLDNN
 
 
 class PaddleOCRProcessor:
-    def __init__(self, lang=OCR_LANGUAGE, use_angle_cls=OCR_USE_ANGLE_CLS, use_gpu=OCR_USE_GPU):
+    def __init__(self, lang=OCR_LANGUAGE, use_angle_cls=OCR_USE_ANGLE_CLS, use_gpu=OCR_USE_GPU,
+                 cpu_threads=OCR_CPU_THREADS, enable_mkldnn=OCR_ENABLE_MKLDNN, preprocessor=None):
+        # paddleocr (and paddle) take seconds to import, so they are only loaded with the first model
+        from paddleocr import PaddleOCR
+        
         # Initialize PaddleOCR with specified settings
         self.ocr = PaddleOCR(use_angle_cls=use_angle_cls, 
                             lang=lang,
-                            use_gpu=use_gpu)
+                            use_gpu=use_gpu,
+                            cpu_threads=cpu_threads,
+                            enable_mkldnn=enable_mkldnn)
+        # Images are scaled down to the resolution OCR needs before detection
+        self.preprocessor = preprocessor or OCRImagePreprocessor()
         
     def process_image(self, image_path):
         """
@@ -21,14 +27,15 @@ class PaddleOCRProcessor:
             image_path: Path to the image file
             
         Returns:
-            Dictionary with OCR results
+            Dictionary with OCR results; boxes are in the pixels of the original image
         """
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Image file not found: {image_path}")
         
         try:
-            # Run OCR on the image
-            result = self.ocr.ocr(image_path, cls=True)
+            # Run OCR on the preprocessed image
+            prepared = self.preprocessor.prepare(image_path)
+            result = self.ocr.ocr(prepared.image, cls=True)
             
             # Process the results
             ocr_result = {
@@ -42,7 +49,7 @@ class PaddleOCRProcessor:
                     if len(item) >= 2:
                         text = item[1][0]  # Extract the recognized text
                         confidence = item[1][1]  # Extract the confidence score
-                        box = item[0]  # Coordinates of the detected text region
+                        box = prepared.to_original(item[0])  # Coordinates of the detected text region
                         
                         # Add to the full text
                         ocr_result["text"] += text + " "
@@ -58,21 +65,44 @@ class PaddleOCRProcessor:
             return ocr_result
             
         except Exception as e:
-            raise Exception(f"OCR processing error: {str(e)}")
+            raise Exception(f"OCR processing error: {str(e)}") from e
+    
+    def detect_text(self, image_path):
+        """
+        Run text detection only, without angle classification and recognition.
+        
+        Args:
+            image_path: Path to the image file
+            
+        Returns:
+            Number of text regions found
+        """
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+        
+        try:
+            result = self.ocr.ocr(self.preprocessor.prepare(image_path).image, det=True, rec=False, cls=False)
+        except Exception as e:
+            raise Exception(f"OCR detection error: {str(e)}") from e
+        
+        # One list of boxes per page; None when nothing was found
+        return sum(len(boxes or []) for boxes in result or [])
     
-    def process_images(self, image_paths):
+    def process_images(self, image_paths, progress_callback=None):
         """
         Process multiple images and combine their OCR results.
         
         Args:
             image_paths: List of paths to image files
+            progress_callback: Optional callable(stage, current, total) called after each image
             
         Returns:
-            Dictionary with combined OCR results
+            Dictionary with combined OCR results; images that failed are listed under "errors"
         """
         combined_result = {
             "text": "",
-            "details": []
+            "details": [],
+            "errors": []
         }
         
         for idx, path in enumerate(image_paths):
@@ -87,7 +117,13 @@ class PaddleOCRProcessor:
                     
             except Exception as e:
                 print(f"Error processing image {path}: {str(e)}")
+                # Keep the original exception type for the failure metrics
+                combined_result["errors"].append({"stage": "ocr", "exception": type(e.__cause__ or e).__name__})
                 continue
+            
+            finally:
+                if progress_callback:
+                    progress_callback("ocr", idx + 1, len(image_paths))
         
         combined_result["text"] = combined_result["text"].strip()
         return combined_result 
\ No newline at end of file
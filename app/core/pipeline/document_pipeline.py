@@ -0,0 +1,446 @@
+import os
+import tempfile
+
+from app.models.document_models import DocumentType
+from app.core.document_extractor.pdf_extractor import PDFExtractor
+from app.core.document_extractor.docx_extractor import DocxExtractor
+from app.core.document_extractor.image_handler import ImageHandler
+from app.core.document_extractor.page_ranges import select_pages
+from app.core.ocr.ocr_processor import OCRProcessor
+from app.core.text_processor.text_cleaner import TextCleaner
+from app.core.text_processor.text_merger import TextMerger
+from app.core.markdown_converter.md_formatter import MarkdownFormatter
+from app.core.pipeline.stage_timer import StageTimer
+from app.core.pipeline.memory_budget import MemoryBudget
+from app.core.pipeline.markdown_stream import PARTIAL_SUFFIX
+from app.core.media_store.media_store import get_media_store, blob_names
+from config.config import (
+    BOUNDED_MEMORY_MIN_PAGES, BOUNDED_MEMORY_WINDOW_PAGES, BOUNDED_MEMORY_BUDGET_MB, MARKDOWN_RESULT_DIR
+)
+
+
+def _markdown_result_path(markdown_path):
+    """Return where the Markdown of a bounded-memory conversion goes, creating a file if none was given."""
+    if markdown_path:
+        return markdown_path
+    os.makedirs(MARKDOWN_RESULT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=MARKDOWN_RESULT_DIR, suffix=".md")
+    os.close(fd)
+    return path
+
+
+class _MarkdownOutput:
+    """The Markdown of a conversion, collected in memory or, with a path, written to a file."""
+
+    def __init__(self, path=None, created=False):
+        self.path = path
+        # Whether the path is a placeholder made for this conversion, removed again if it fails
+        self.created = created
+        self.empty = True
+        self.bytes_written = 0
+        self._chunks = []
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Written under a temporary name, so a failed conversion never leaves a partial result
+            self._file = open(path + PARTIAL_SUFFIX, "wb")
+
+    def write(self, chunk):
+        self.empty = False
+        if self._file is None:
+            self._chunks.append(chunk)
+        else:
+            data = chunk.encode("utf-8")
+            self._file.write(data)
+            # Readers follow the file while it is written
+            self._file.flush()
+            self.bytes_written += len(data)
+
+    def close(self):
+        """Finish the output; returns the Markdown, or its path when written to a file."""
+        if self._file is None:
+            return "".join(self._chunks)
+        self._file.close()
+        os.replace(self.path + PARTIAL_SUFFIX, self.path)
+        return self.path
+
+    def discard(self):
+        if self._file is not None:
+            self._file.close()
+            paths = [self.path + PARTIAL_SUFFIX, self.path] if self.created else [self.path + PARTIAL_SUFFIX]
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+
+def _skipped_reasons(images):
+    """Count the images OCR skipped, by the reason the gate gave."""
+    reasons = {}
+    for image in images:
+        if image.get("ocr_skipped"):
+            reasons[image["ocr_skipped"]] = reasons.get(image["ocr_skipped"], 0) + 1
+    return reasons
+
+
+class DocumentPipeline:
+    def __init__(self, ocr_processor=None, media_store=None, image_base_url="/media/images"):
+        # The OCR models are borrowed from the process-wide pool, so building
+        # a pipeline does not load them again
+        self.ocr_processor = ocr_processor or OCRProcessor()
+        self.text_cleaner = TextCleaner()
+        self.text_merger = TextMerger()
+        # Store the extractors write images to; the Markdown links them via image_base_url
+        self.media_store = media_store or get_media_store()
+        self.md_formatter = MarkdownFormatter(image_base_url=image_base_url, media_store=self.media_store)
+
+    def extract(self, source, doc_type, progress_callback=None):
+        """
+        Extract text and images from a document.
+
+        Args:
+            source: Path to the document file, or its content as bytes
+            doc_type: DocumentType (or its string value)
+            progress_callback: Optional callable(stage, current, total) for progress events
+
+        Returns:
+            Dictionary with extracted text and images
+        """
+        doc_type = DocumentType(doc_type)
+        source_args = self._source_args(source)
+
+        if doc_type == DocumentType.PDF:
+            extractor = PDFExtractor(progress_callback=progress_callback, **source_args)
+            return extractor.extract_all()
+        elif doc_type == DocumentType.DOCX:
+            extractor = DocxExtractor(progress_callback=progress_callback, **source_args)
+            return extractor.extract_all()
+        elif doc_type == DocumentType.IMAGE:
+            handler = ImageHandler(**source_args)
+            image_info = handler.process_image()
+
+            # Create a structure similar to document extraction
+            return {
+                "text": [],
+                "images": [image_info],
+                "page_count": 1
+            }
+
+        raise ValueError(f"Unsupported document type: {doc_type}")
+
+    def _source_args(self, source):
+        """Build the extractor arguments for a document path or its content."""
+        # Small uploads arrive as bytes and are parsed without touching the disk
+        if isinstance(source, (bytes, bytearray)):
+            source_args = {"file_bytes": bytes(source)}
+        else:
+            source_args = {"file_path": source}
+        source_args["media_store"] = self.media_store
+        return source_args
+
+    def run(self, source, doc_type, progress_callback=None, chunk_callback=None, profile=False, pages=None,
+            page_cache=None, markdown_path=None, bounded=None):
+        """
+        Run the full conversion pipeline: extract → OCR → clean → merge → format.
+
+        PDFs are converted page by page while they are read, and the Markdown
+        of each page is handed to chunk_callback as soon as it is ready, so it
+        can be streamed while later pages are still being extracted and OCR'd.
+
+        PDFs with at least BOUNDED_MEMORY_MIN_PAGES selected pages are
+        converted in bounded-memory mode: the result holds no per-page text,
+        images or OCR details, and its Markdown is written to markdown_path
+        (returned as "markdown_path", with "markdown" set to None). Memory
+        stays flat however many pages there are, within the peak-RSS budget
+        BOUNDED_MEMORY_BUDGET_MB. chunk_callback is not called in this mode;
+        the file is flushed page by page under a PARTIAL_SUFFIX name and can
+        be read while it is written.
+
+        Args:
+            source: Path to the document file, or its content as bytes
+            doc_type: DocumentType (or its string value)
+            progress_callback: Optional callable(stage, current, total) for progress events
+            chunk_callback: Optional callable(text) receiving the Markdown incrementally, except in bounded-memory mode
+            profile: Also record CPU time and per-page/per-image timings under "profile"
+            pages: PDF page selection such as "1-3,7,10-"; all pages if None
+            page_cache: Optional PageCache; PDF pages found in it are reused, converted pages are added
+            markdown_path: File for the Markdown in bounded-memory mode; a new file in MARKDOWN_RESULT_DIR if None
+            bounded: Force bounded-memory mode on (True) or off (False); None decides by the page count
+
+        Returns:
+            Dictionary with text, images, ocr, merged_text, markdown, page_count and stats
+
+        Raises:
+            Exception: Errors are re-raised with a "stage" attribute naming the failed stage
+        """
+        timer = StageTimer(profile=profile)
+        progress_callback = timer.wrap_progress(progress_callback)
+        report = progress_callback or (lambda stage, current=None, total=None: None)
+
+        try:
+            report("extract")
+            if DocumentType(doc_type) == DocumentType.PDF:
+                extractor = PDFExtractor(progress_callback=progress_callback, **self._source_args(source))
+                result, work = self._run_by_page(
+                    extractor, report, progress_callback, chunk_callback, timer, pages, page_cache,
+                    markdown_path, bounded
+                )
+                result["page_count"] = extractor.page_count
+                extracted_data = {"errors": extractor.errors}
+            else:
+                with timer.stage("extract"):
+                    extracted_data = self.extract(source, doc_type, progress_callback=progress_callback)
+                work = None
+
+                merged_data = self._process(extracted_data, report, progress_callback, timer)
+
+                # Convert to Markdown
+                report("format")
+                with timer.stage("format"):
+                    markdown = self.md_formatter.format_document_as_markdown(merged_data)
+                if chunk_callback and markdown:
+                    chunk_callback(markdown)
+
+                result = {
+                    "text": merged_data.get("text", []),
+                    "images": merged_data.get("images", []),
+                    "ocr": merged_data.get("ocr"),
+                    "merged_text": merged_data.get("merged_text", []),
+                    "markdown": markdown,
+                    # Word documents have no fixed pages; count them as one
+                    "page_count": extracted_data.get("page_count", 1)
+                }
+        except Exception as e:
+            # Exception attributes survive pickling, so the API process can tell which stage failed
+            if not hasattr(e, "stage"):
+                e.stage = timer.current or "pipeline"
+            raise
+
+        result["stats"] = self._collect_stats(extracted_data, result, timer, work)
+        if profile:
+            result["profile"] = timer.breakdown()
+        return result
+
+    def _collect_stats(self, extracted_data, result, timer, work=None):
+        """Summarize stage timings, work done and recovered errors of a conversion."""
+        ocr = result.get("ocr") or {}
+        # Pages taken from the page cache were not converted again and are counted separately
+        work = work or {
+            "pages": result.get("page_count", 0),
+            "images": len(result.get("images", [])),
+            "duplicate_images": sum(1 for image in result.get("images", []) if "duplicate_of" in image),
+            "ocr_skipped": _skipped_reasons(result.get("images", [])),
+            "ocr_regions": len(ocr.get("details", [])),
+            "cached_pages": 0
+        }
+        return {
+            "stages": timer.durations,
+            **work,
+            "errors": extracted_data.get("errors", []) + ocr.get("errors", [])
+        }
+
+    def _process(self, document_data, report, progress_callback, timer, ocr_cache=None):
+        """Run OCR, cleaning and merging on extracted document data."""
+        # Process OCR for images
+        report("ocr")
+        with timer.stage("ocr"):
+            ocr_data = self.ocr_processor.process_document_images(
+                document_data, progress_callback=progress_callback, ocr_cache=ocr_cache
+            )
+
+        # Clean the text
+        report("clean")
+        with timer.stage("clean"):
+            cleaned_data = self.text_cleaner.clean_document_text(ocr_data)
+
+        # Merge document text and OCR text
+        report("merge")
+        with timer.stage("merge"):
+            return self.text_merger.merge_document_and_ocr(cleaned_data)
+
+    def _run_by_page(self, extractor, report, progress_callback, chunk_callback, timer, pages=None, page_cache=None,
+                     markdown_path=None, bounded=None):
+        """
+        Convert a PDF one page at a time as its pages are read, emitting Markdown per page.
+
+        Only the selected pages are converted, and pages found in page_cache
+        are reused instead of being extracted and OCR'd again.
+
+        In bounded-memory mode (see run()) nothing is accumulated: the
+        Markdown goes to a file, cached pages are read when they are reached,
+        and after every window of pages the parsed PDF objects and OCR
+        results are released and the memory budget is checked.
+
+        Returns:
+            Tuple of (result dictionary, counts of the pages, images and OCR regions converted)
+        """
+        with timer.stage("extract"):
+            page_count = extractor.count_pages()
+            selected = select_pages(pages, page_count)
+            if page_count and not selected:
+                raise ValueError(f"No pages selected; the document has {page_count} pages")
+
+            if bounded is None:
+                bounded = bool(BOUNDED_MEMORY_MIN_PAGES) and len(selected) >= BOUNDED_MEMORY_MIN_PAGES
+
+            cached = {}
+            if page_cache is not None:
+                for page_number in selected:
+                    if bounded:
+                        # Only remember which pages are cached; their results are read when they are reached
+                        if page_cache.contains(page_number):
+                            cached[page_number] = None
+                        continue
+                    page_result = page_cache.get(page_number)
+                    if page_result is not None:
+                        cached[page_number] = page_result
+
+        budget = None
+        if bounded:
+            # Shard processes would each parse the whole document again; pages are read here one by one
+            extractor.parallel_workers = 1
+            budget = MemoryBudget(BOUNDED_MEMORY_BUDGET_MB * 2**20, BOUNDED_MEMORY_WINDOW_PAGES)
+
+        missing = extractor.iter_pages([page_number for page_number in selected if page_number not in cached])
+        quiet = lambda stage, current=None, total=None: None
+        # OCR results of the images seen so far, for images repeated on later pages
+        ocr_cache = {}
+        repeated_images = set()
+        # Images of cached pages, and the blobs this conversion stored itself, which it holds a reference to
+        reused_images = []
+        stored_images = set()
+
+        result = {"text": [], "images": [], "ocr": None, "merged_text": [], "markdown": ""}
+        work = {
+            "pages": 0, "images": 0, "duplicate_images": 0, "ocr_regions": 0, "ocr_skipped": {},
+            "cached_pages": len(cached)
+        }
+        ocr_texts = []
+        ocr_details = []
+        ocr_errors = []
+        ocr_skipped = 0
+        image_count = 0
+        window_position = 0
+        output = _MarkdownOutput(_markdown_result_path(markdown_path) if bounded else None, created=not markdown_path)
+
+        try:
+            report("pages")
+            for position, page_number in enumerate(selected, start=1):
+                image_offset = image_count
+
+                page_result = cached.get(page_number)
+                if page_result is None and page_number in cached:
+                    page_result = page_cache.get(page_number)
+                    if page_result is None:
+                        # Evicted since the lookup above; it was not in the extraction plan
+                        work["cached_pages"] -= 1
+                        with timer.stage("extract"):
+                            page_data = next(extractor.iter_pages([page_number]))
+                elif page_result is None:
+                    with timer.stage("extract"):
+                        page_data = next(missing)
+                reused = page_result is not None
+
+                if page_result is None:
+                    # Report OCR progress across the whole document; its image count is not known until the last page
+                    page_progress = None
+                    if progress_callback:
+                        def page_progress(stage, current=None, total=None, offset=image_offset):
+                            progress_callback(stage, offset + current, None)
+
+                    with timer.step("page", page_number):
+                        page_result = self._convert_page(page_data, quiet, page_progress, timer, ocr_cache)
+
+                    work["pages"] += 1
+                    work["images"] += len(page_result["images"])
+                    work["duplicate_images"] += sum(1 for image in page_result["images"] if "duplicate_of" in image)
+                    for reason, count in _skipped_reasons(page_result["images"]).items():
+                        work["ocr_skipped"][reason] = work["ocr_skipped"].get(reason, 0) + count
+                    work["ocr_regions"] += len((page_result["ocr"] or {}).get("details", []))
+
+                    # Pages with recovered extraction or OCR errors are converted again next time
+                    page_ok = not page_data.get("errors") and not (page_result["ocr"] or {}).get("errors")
+                    if page_cache is not None and page_ok:
+                        page_cache.put(page_number, page_result)
+
+                image_count += len(page_result["images"])
+                if page_result["ocr"]:
+                    ocr_errors.extend(page_result["ocr"].get("errors", []))
+                    ocr_skipped += page_result["ocr"].get("skipped_images", 0)
+
+                if bounded:
+                    repeated_images.update(image["hash"] for image in page_result["images"] if "duplicate_of" in image)
+                else:
+                    if page_result["ocr"]:
+                        for detail in page_result["ocr"].get("details", []):
+                            ocr_details.append(dict(detail, image_index=detail.get("image_index", 0) + image_offset))
+                        if page_result["ocr"].get("full_text"):
+                            ocr_texts.append(page_result["ocr"]["full_text"])
+
+                    result["text"].extend(page_result["text"])
+                    result["images"].extend(page_result["images"])
+                    if reused:
+                        reused_images.extend(page_result["images"])
+                    else:
+                        stored_images.update(blob_names(page_result["images"]))
+                    result["merged_text"].extend(page_result["merged_text"])
+
+                if page_result["markdown"]:
+                    chunk = page_result["markdown"] if output.empty else "\n\n" + page_result["markdown"]
+                    output.write(chunk)
+                    if bounded:
+                        # The Markdown file is the stream; it is not written a second time
+                        if progress_callback:
+                            progress_callback("markdown", output.bytes_written)
+                    elif chunk_callback:
+                        chunk_callback(chunk)
+
+                if progress_callback:
+                    progress_callback("pages", position, len(selected))
+
+                window_position += 1
+                if bounded and window_position >= budget.window_pages:
+                    # Only the OCR results of images that already appeared more than once are kept
+                    for key in [key for key in ocr_cache if key not in repeated_images]:
+                        del ocr_cache[key]
+                    page_result = page_data = None
+                    extractor.release_pages()
+                    budget.check()
+                    window_position = 0
+        except BaseException:
+            output.discard()
+            raise
+
+        if image_count:
+            result["ocr"] = {
+                "full_text": "\n\n".join(ocr_texts), "details": ocr_details, "errors": ocr_errors,
+                "skipped_images": ocr_skipped
+            }
+        if bounded:
+            # The Markdown of the whole document is only on disk
+            result["markdown"] = None
+            result["markdown_path"] = output.close()
+            budget.measure()
+            work["peak_rss_bytes"] = budget.peak_rss
+        else:
+            result["markdown"] = output.close()
+            # The result holds a reference to every image it links, like a freshly converted one
+            self.media_store.acquire_images(
+                [image for image in reused_images if image.get("filename") not in stored_images]
+            )
+        return result, work
+
+    def _convert_page(self, page_data, report, progress_callback, timer, ocr_cache=None):
+        """Run OCR, cleaning, merging and formatting on one extracted page."""
+        merged_data = self._process(page_data, report, progress_callback, timer, ocr_cache)
+        with timer.stage("format"):
+            markdown = self.md_formatter.format_page_as_markdown(merged_data)
+
+        return {
+            "text": merged_data.get("text", []),
+            "images": merged_data.get("images", []),
+            "merged_text": merged_data.get("merged_text", merged_data.get("text", [])),
+            "ocr": merged_data.get("ocr"),
+            "markdown": markdown
+        }
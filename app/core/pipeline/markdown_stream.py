@@ -0,0 +1,120 @@
+import os
+import time
+
+from config.config import MARKDOWN_STREAM_DIR, MARKDOWN_RESULT_DIR
+
+# Suffix of a bounded-memory Markdown file while its conversion is still running
+PARTIAL_SUFFIX = ".tmp"
+
+
+def markdown_stream_path(doc_id):
+    """Return the path of the incremental Markdown file of a job."""
+    return os.path.join(MARKDOWN_STREAM_DIR, f"{doc_id}.md")
+
+
+def markdown_result_path(doc_id):
+    """Return where the Markdown of a job converted in bounded-memory mode is kept."""
+    return os.path.join(MARKDOWN_RESULT_DIR, f"{doc_id}.md")
+
+
+def remove_markdown_stream(doc_id):
+    """Delete the incremental Markdown file of a finished job."""
+    try:
+        os.unlink(markdown_stream_path(doc_id))
+    except FileNotFoundError:
+        pass
+
+
+def open_markdown_stream(doc_id):
+    """
+    Open the Markdown a running job has written so far.
+
+    Bounded-memory conversions write no stream file; their result file is
+    read while it is written instead. An open handle stays readable when
+    the file is renamed or removed as the job finishes.
+
+    Args:
+        doc_id: The document ID
+
+    Returns:
+        Binary file object, or None if the job has written no Markdown yet
+    """
+    for path in (markdown_stream_path(doc_id), markdown_result_path(doc_id) + PARTIAL_SUFFIX):
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            pass
+    return None
+
+
+def prune_markdown_results(max_age_seconds, now=None):
+    """
+    Delete bounded-memory Markdown files older than max_age_seconds.
+
+    Args:
+        max_age_seconds: Age by last modification above which files are deleted
+        now: Current time as a timestamp; time.time() if None
+
+    Returns:
+        Number of files deleted
+    """
+    cutoff = (now if now is not None else time.time()) - max_age_seconds
+    removed = 0
+    try:
+        entries = list(os.scandir(MARKDOWN_RESULT_DIR))
+    except FileNotFoundError:
+        return 0
+
+    for entry in entries:
+        try:
+            # Partial files of running conversions are written to page by page and stay recent
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            # Removed by another API worker meanwhile
+            pass
+    return removed
+
+
+class MarkdownStreamWriter:
+    """
+    Appends Markdown chunks to a job's stream file as the pipeline produces them.
+
+    The file is created with the first chunk, so jobs that hand over no
+    chunks (bounded-memory conversions) leave no stream file.
+    """
+
+    def __init__(self, doc_id, progress_callback=None):
+        self.path = markdown_stream_path(doc_id)
+        self.progress_callback = progress_callback
+        self.bytes_written = 0
+        self._file = None
+
+    def write(self, chunk):
+        """
+        Append a chunk and make it visible to readers right away.
+
+        Args:
+            chunk: Markdown text
+        """
+        data = chunk.encode("utf-8")
+        if self._file is None:
+            os.makedirs(MARKDOWN_STREAM_DIR, exist_ok=True)
+            self._file = open(self.path, "wb")
+        self._file.write(data)
+        self._file.flush()
+        self.bytes_written += len(data)
+
+        if self.progress_callback:
+            self.progress_callback("markdown", self.bytes_written)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,60 @@
+import gc
+import os
+import sys
+
+
+def current_rss():
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # Without /proc the peak RSS is the closest measure available
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in bytes on macOS and in kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class MemoryBudget:
+    """
+    Keeps a bounded-memory conversion within a peak-RSS budget.
+
+    The pipeline converts pages in windows and releases what it cached
+    after each of them; check() is called in between. While the process
+    stays over the budget the windows are halved, so caches are released
+    more often, and a conversion that is over the budget one page at a
+    time fails with MemoryError instead of getting the worker killed.
+    """
+
+    def __init__(self, limit_bytes, window_pages):
+        # 0 means no limit; the peak is still recorded
+        self.limit_bytes = limit_bytes
+        self.window_pages = max(1, window_pages)
+        self.peak_rss = current_rss()
+
+    def measure(self):
+        """Record the current memory use in peak_rss and return it in bytes."""
+        gc.collect()
+        rss = current_rss()
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def check(self):
+        """
+        Measure the memory use after a window of pages.
+
+        Returns:
+            Number of pages to convert before the next check
+
+        Raises:
+            MemoryError: If the process is over the budget with one-page windows
+        """
+        rss = self.measure()
+        if self.limit_bytes and rss > self.limit_bytes:
+            if self.window_pages == 1:
+                raise MemoryError(
+                    f"Memory use of {rss // 2**20} MB exceeds the budget of {self.limit_bytes // 2**20} MB"
+                )
+            self.window_pages = max(1, self.window_pages // 2)
+        return self.window_pages
@@ -0,0 +1,99 @@
+import threading
+
+
+class ProgressReporter:
+    """Progress callback used inside a worker process; forwards events to the API process."""
+
+    def __init__(self, doc_id, queue):
+        self.doc_id = doc_id
+        self.queue = queue
+
+    def __call__(self, stage, current=None, total=None):
+        """
+        Report a stage transition, or progress within a stage when counters are given.
+
+        Args:
+            stage: Pipeline stage or sub-step name (e.g. "extract", "ocr")
+            current: Number of items (pages, images) done so far
+            total: Total number of items in this stage
+        """
+        self.queue.put({
+            "doc_id": self.doc_id,
+            "event": "stage" if current is None else "progress",
+            "stage": stage,
+            "current": current,
+            "total": total
+        })
+
+
+class ProgressBroker:
+    """Fans progress events out to the subscribers of each document in the API process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # doc_id -> list of (event loop, asyncio.Queue)
+        self._latest = {}  # doc_id -> most recent event, for late subscribers
+
+    def subscribe(self, doc_id, loop, queue):
+        """
+        Register an asyncio queue that receives the events of a document.
+
+        Args:
+            doc_id: The document ID
+            loop: Event loop that owns the queue
+            queue: asyncio.Queue to put events into
+        """
+        with self._lock:
+            self._subscribers.setdefault(doc_id, []).append((loop, queue))
+
+    def unsubscribe(self, doc_id, queue):
+        with self._lock:
+            subscribers = [item for item in self._subscribers.get(doc_id, []) if item[1] is not queue]
+            if subscribers:
+                self._subscribers[doc_id] = subscribers
+            else:
+                self._subscribers.pop(doc_id, None)
+
+    def latest(self, doc_id):
+        """Return the most recent event of a document that is still being processed."""
+        with self._lock:
+            return self._latest.get(doc_id)
+
+    def publish(self, event):
+        """
+        Deliver an event to all subscribers of its document. Safe to call from any thread.
+
+        Args:
+            event: Event dictionary with at least "doc_id" and "event"
+        """
+        doc_id = event["doc_id"]
+        with self._lock:
+            if event["event"] in ("completed", "failed"):
+                self._latest.pop(doc_id, None)
+            else:
+                self._latest[doc_id] = event
+            subscribers = list(self._subscribers.get(doc_id, []))
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's event loop is already closed
+                pass
+
+    def pump(self, queue):
+        """
+        Forward events from a multiprocessing queue until a None sentinel arrives.
+
+        Args:
+            queue: multiprocessing.Queue written to by the worker processes
+        """
+        while True:
+            event = queue.get()
+            if event is None:
+                break
+            self.publish(event)
+
+
+# Process-wide broker used by the API
+progress_broker = ProgressBroker()
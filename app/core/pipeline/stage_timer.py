@@ -0,0 +1,116 @@
+import time
+from contextlib import contextmanager
+
+# Progress events that mark the end of one page or image of work
+TIMED_EVENTS = ("extract_text", "extract_images", "ocr")
+
+
+class StageTimer:
+    """
+    Accumulates the wall time spent in each pipeline stage of one conversion.
+
+    With profile=True it also measures CPU time, and records sub-steps
+    (pages, images) from explicit step() blocks and from the progress
+    events the extractors and OCR emit after every page or image.
+    """
+
+    def __init__(self, profile=False):
+        self.profile = profile
+        self.durations = {}
+        self.cpu_durations = {}
+        self.steps = []
+        # Stage that is running, left set when a stage raises
+        self.current = None
+        self._mark = None
+
+    def _now(self):
+        return time.perf_counter(), time.process_time()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a block of work as part of a stage. Repeated blocks of the same
+        stage (e.g. OCR of every page) add up.
+
+        Args:
+            name: Stage name (extract, ocr, clean, merge, format)
+        """
+        self.current = name
+        started, cpu_started = self._now()
+        # Progress events within the stage are timed from its start
+        self._mark = (started, cpu_started)
+        try:
+            yield
+        finally:
+            ended, cpu_ended = self._now()
+            self.durations[name] = self.durations.get(name, 0.0) + ended - started
+            if self.profile:
+                self.cpu_durations[name] = self.cpu_durations.get(name, 0.0) + cpu_ended - cpu_started
+        self.current = None
+
+    @contextmanager
+    def step(self, name, index):
+        """
+        Time a sub-step, such as one page, when profiling.
+
+        Args:
+            name: Step name (e.g. "page")
+            index: Page or image number
+        """
+        if not self.profile:
+            yield
+            return
+
+        started, cpu_started = self._now()
+        try:
+            yield
+        finally:
+            ended, cpu_ended = self._now()
+            self._add_step(name, index, ended - started, cpu_ended - cpu_started)
+
+    def wrap_progress(self, progress_callback):
+        """
+        Return a progress callback that also times the work between events.
+
+        Extractors and OCR report progress after every page or image, so the
+        time since the previous event (or the start of the stage) is the
+        cost of that page or image.
+
+        Args:
+            progress_callback: The callback to forward events to, or None
+        """
+        if not self.profile:
+            return progress_callback
+
+        def callback(stage, current=None, total=None):
+            if stage in TIMED_EVENTS and current is not None and self._mark is not None:
+                now, cpu_now = self._now()
+                self._add_step(stage, current, now - self._mark[0], cpu_now - self._mark[1])
+                self._mark = (now, cpu_now)
+            if progress_callback:
+                progress_callback(stage, current, total)
+
+        return callback
+
+    def _add_step(self, name, index, wall, cpu):
+        self.steps.append({"step": name, "index": index, "wall": round(wall, 6), "cpu": round(cpu, 6)})
+
+    def breakdown(self):
+        """
+        Return the profile of the conversion.
+
+        Returns:
+            Dictionary with wall and CPU seconds per stage, their totals, and the timed sub-steps
+        """
+        stages = {
+            name: {"wall": round(wall, 6), "cpu": round(self.cpu_durations.get(name, 0.0), 6)}
+            for name, wall in self.durations.items()
+        }
+        return {
+            "stages": stages,
+            "total": {
+                "wall": round(sum(self.durations.values()), 6),
+                "cpu": round(sum(self.cpu_durations.values()), 6)
+            },
+            "steps": self.steps
+        }
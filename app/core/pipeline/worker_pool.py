@@ -0,0 +1,294 @@
+import os
+import time
+import asyncio
+import cProfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.core.pipeline.progress import ProgressReporter, progress_broker
+from app.core.pipeline.markdown_stream import MarkdownStreamWriter, markdown_result_path
+from app.core.cache.result_cache import ResultCache, PageCache
+from app.core.media_store.media_store import get_media_store
+from config.config import (
+    WORKER_PROCESSES, MAX_CONCURRENT_JOBS, WORKER_START_METHOD, WORKER_WARM_UP, WORKER_WARM_UP_TIMEOUT,
+    OCR_POOL_WARM_UP, PROFILE_DIR, PROFILE_MAX_BYTES, PROFILE_RETENTION_HOURS, RESULT_CACHE_ENABLED, RESULT_CACHE_DIR,
+    RESULT_CACHE_MAX_BYTES
+)
+
+# Pipeline instance owned by each worker process, created once by the initializer
+_pipeline = None
+
+# Queue for sending progress events back to the API process
+_progress_queue = None
+
+# The worker's view of the result cache, holding the converted pages of PDFs
+_result_cache = None
+
+
+def _init_worker(progress_queue=None, ready_workers=None):
+    """Build the conversion pipeline once per worker process and load its OCR models."""
+    global _pipeline, _progress_queue
+    from app.core.pipeline.document_pipeline import DocumentPipeline
+    from app.core.ocr.ocr_pool import get_ocr_pool
+    _pipeline = DocumentPipeline()
+    _progress_queue = progress_queue
+
+    if OCR_POOL_WARM_UP:
+        try:
+            get_ocr_pool().warm_up()
+        except Exception as e:
+            # The models are loaded again on first use; report the problem without killing the worker
+            print(f"Error loading OCR models: {e}")
+            return
+
+    # Count this worker as ready for the API's readiness check
+    if ready_workers is not None:
+        with ready_workers.get_lock():
+            ready_workers.value += 1
+
+
+def _ping():
+    return os.getpid()
+
+
+def _page_cache(content_hash, doc_type):
+    """Return the page cache of a document, or None if caching is off."""
+    global _result_cache
+    if not RESULT_CACHE_ENABLED or content_hash is None:
+        return None
+    if _result_cache is None:
+        _result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES, media_store=get_media_store())
+    return PageCache(_result_cache, content_hash, {"doc_type": doc_type})
+
+
+def profile_path(doc_id):
+    """Path of the cProfile dump written for a profiled job."""
+    return os.path.join(PROFILE_DIR, f"{doc_id}.prof")
+
+
+def prune_profiles(max_bytes=PROFILE_MAX_BYTES, max_age_seconds=PROFILE_RETENTION_HOURS * 3600, now=None):
+    """
+    Delete cProfile dumps beyond the size and age limits of PROFILE_DIR, oldest first.
+
+    Args:
+        max_bytes: Total size the dumps may take; 0 for no limit
+        max_age_seconds: Age by last modification above which dumps are deleted; 0 for no limit
+        now: Current time as a timestamp; time.time() if None
+
+    Returns:
+        Number of dumps deleted
+    """
+    now = now if now is not None else time.time()
+    dumps = []
+    try:
+        for entry in os.scandir(PROFILE_DIR):
+            if entry.name.endswith(".prof") and entry.is_file():
+                stat = entry.stat()
+                dumps.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    total_bytes = 0
+    # Newest first, so the dumps kept are the most recent ones; the newest is kept whatever its size
+    for index, (mtime, size, path) in enumerate(sorted(dumps, reverse=True)):
+        total_bytes += size
+        too_old = max_age_seconds and mtime < now - max_age_seconds
+        too_large = index and max_bytes and total_bytes > max_bytes
+        if too_old or too_large:
+            try:
+                os.unlink(path)
+                removed += 1
+            except OSError:
+                # Deleted by another worker meanwhile
+                pass
+    return removed
+
+
+def _run_pipeline(doc_id, source, doc_type, profile=False, profile_dump=False, pages=None, content_hash=None):
+    """Run the conversion pipeline inside a worker process."""
+    progress_callback = ProgressReporter(doc_id, _progress_queue) if _progress_queue is not None else None
+    options = {
+        "pages": pages,
+        "page_cache": _page_cache(content_hash, doc_type),
+        # Used by bounded-memory conversions, whose Markdown is not returned in the result
+        "markdown_path": markdown_result_path(doc_id)
+    }
+
+    # Only this job is profiled; cProfile is never enabled for the whole worker
+    profiler = cProfile.Profile() if profile_dump else None
+
+    # Markdown is appended to the job's stream file page by page while the pipeline runs
+    with MarkdownStreamWriter(doc_id, progress_callback) as stream:
+        if profiler is None:
+            return _pipeline.run(source, doc_type, progress_callback=progress_callback,
+                                 chunk_callback=stream.write, profile=profile, **options)
+
+        profiler.enable()
+        try:
+            return _pipeline.run(source, doc_type, progress_callback=progress_callback,
+                                 chunk_callback=stream.write, profile=True, **options)
+        finally:
+            profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(profile_path(doc_id))
+            # Dumps are only written here, so capping the directory on each one keeps it bounded
+            prune_profiles()
+
+
+class WorkerPool:
+    def __init__(self, max_workers=WORKER_PROCESSES, max_concurrent_jobs=MAX_CONCURRENT_JOBS,
+                 start_method=WORKER_START_METHOD, warm_up=WORKER_WARM_UP,
+                 warm_up_timeout=WORKER_WARM_UP_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.start_method = start_method
+        self.warm_up_enabled = warm_up
+        self.warm_up_timeout = warm_up_timeout
+        self.warm_up_error = None
+        self._warm_up_task = None
+        self._ready_workers = None
+        self._executor = None
+        self._semaphore = None
+        self._progress_queue = None
+        self._progress_thread = None
+
+    def start(self):
+        """Start the worker processes if they are not running yet."""
+        if self._executor is None:
+            context = multiprocessing.get_context(self.start_method)
+
+            if self._progress_queue is None:
+                # Progress events from the workers are forwarded to the broker by a background thread
+                self._progress_queue = context.Queue()
+                self._progress_thread = threading.Thread(
+                    target=progress_broker.pump, args=(self._progress_queue,), daemon=True
+                )
+                self._progress_thread.start()
+
+            # Shared counter of workers whose initializer finished loading the models
+            self._ready_workers = context.Value("i", 0)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self._progress_queue, self._ready_workers)
+            )
+        return self._executor
+
+    async def run_pipeline(self, doc_id, source, doc_type, profile=False, profile_dump=False, pages=None,
+                           content_hash=None):
+        """
+        Convert a document in one of the worker processes.
+
+        Args:
+            doc_id: The document ID, used to tag progress events
+            source: Path to the document file, or its content as bytes
+            doc_type: DocumentType value
+            profile: Record wall and CPU time per stage, page and image
+            profile_dump: Also write a cProfile dump of the job to PROFILE_DIR
+            pages: PDF page selection such as "1-3,7"; all pages if None
+            content_hash: Hash of the document, to reuse and store its converted pages in the page cache
+
+        Returns:
+            Pipeline result dictionary
+        """
+        # The semaphore is created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            executor = self.start()
+            try:
+                return await loop.run_in_executor(
+                    executor, _run_pipeline, doc_id, source, doc_type, profile, profile_dump, pages, content_hash
+                )
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for using too much memory); replace the
+                # pool so later jobs are not affected, and fail this one
+                self._reset(executor)
+                self.ensure_warm_up()
+                raise
+
+    @property
+    def ready_workers(self):
+        """Number of running worker processes that have loaded their models."""
+        return self._ready_workers.value if self._executor is not None else 0
+
+    async def warm_up(self):
+        """
+        Start all worker processes and wait until they have loaded their OCR models.
+
+        Returns:
+            True if every worker is ready to convert documents
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.start()
+        try:
+            # The executor spawns a process for each task submitted while no worker is idle,
+            # so one task per worker starts them all and they load their models in parallel
+            await asyncio.gather(*(loop.run_in_executor(executor, _ping) for _ in range(self.max_workers)))
+
+            deadline = loop.time() + self.warm_up_timeout
+            while self.ready_workers < self.max_workers:
+                if self._executor is not executor:
+                    raise RuntimeError("The worker processes were replaced during warm-up")
+                if loop.time() > deadline:
+                    raise TimeoutError(f"Only {self.ready_workers} of {self.max_workers} workers loaded their models")
+                await asyncio.sleep(0.1)
+        except Exception as e:
+            self.warm_up_error = str(e)
+            print(f"Error warming up workers: {e}")
+            return False
+
+        self.warm_up_error = None
+        print(f"Warmed up {self.max_workers} worker processes")
+        return True
+
+    def ensure_warm_up(self):
+        """Warm the workers up in the background unless that is disabled, done, or already running."""
+        if not self.warm_up_enabled or (self._executor is not None and self.ready_workers >= self.max_workers):
+            return
+        if self._warm_up_task is None or self._warm_up_task.done():
+            self._warm_up_task = asyncio.create_task(self.warm_up())
+
+    def readiness(self):
+        """
+        Report whether the pool can take jobs right away.
+
+        Returns:
+            Dictionary with the readiness flag and the state of the workers
+        """
+        if not self.warm_up_enabled:
+            # Workers and models are loaded by the first job
+            return {"ready": True, "workers": self.max_workers, "workers_ready": None, "error": None}
+
+        return {
+            "ready": self._executor is not None and self.ready_workers >= self.max_workers,
+            "workers": self.max_workers,
+            "workers_ready": self.ready_workers,
+            "error": self.warm_up_error
+        }
+
+    def _reset(self, executor):
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait=True):
+        """Stop all worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        if self._progress_queue is not None:
+            self._progress_queue.put(None)
+            self._progress_thread.join(timeout=5)
+            self._progress_queue = None
+            self._progress_thread = None
+
+
+# Process-wide worker pool used by the API
+worker_pool = WorkerPool()
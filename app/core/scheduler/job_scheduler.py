@@ -0,0 +1,288 @@
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+
+from config.config import (
+    MAX_CONCURRENT_JOBS, SCHEDULER_MAX_QUEUE_DEPTH, SCHEDULER_TENANT_MAX_RUNNING, SCHEDULER_TENANT_MAX_QUEUED,
+    SCHEDULER_INITIAL_JOB_SECONDS, SCHEDULER_PRIORITIES
+)
+
+
+class QueueFullError(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Job:
+    def __init__(self, doc_id, tenant, priority, func, args):
+        self.doc_id = doc_id
+        self.tenant = tenant
+        self.priority = priority
+        self.func = func
+        self.args = args
+
+
+class _Batch:
+    """Admission reservation of a batch upload, whose documents are queued as they arrive."""
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+        self.reserved = 1  # Units held for documents of the batch not submitted yet
+        self.closed = False
+
+
+class JobScheduler:
+    """
+    Admission control and fair dispatch for conversion jobs.
+
+    Jobs wait in one queue per priority class. Within a class, tenants are
+    served round-robin, and no tenant runs more than tenant_max_running jobs
+    at once, so one tenant's large upload cannot starve everyone else.
+
+    Admission limits count queued documents, whether they were uploaded
+    alone or in a batch. An open batch holds one unit from the start, so a
+    batch is only admitted if its first document fits, and each further
+    document is admitted as it arrives; batch documents take turns with
+    other tenants one at a time.
+    """
+
+    def __init__(self, max_running=MAX_CONCURRENT_JOBS, max_queue_depth=SCHEDULER_MAX_QUEUE_DEPTH,
+                 tenant_max_running=SCHEDULER_TENANT_MAX_RUNNING, tenant_max_queued=SCHEDULER_TENANT_MAX_QUEUED,
+                 priorities=SCHEDULER_PRIORITIES):
+        self.max_running = max_running
+        self.max_queue_depth = max_queue_depth
+        self.tenant_max_running = tenant_max_running
+        self.tenant_max_queued = tenant_max_queued
+        self.priorities = list(priorities)
+
+        # priority -> OrderedDict of tenant -> deque of jobs; tenant order is the round-robin order
+        self._queues = {priority: OrderedDict() for priority in self.priorities}
+        self._jobs = {}  # doc_id -> queued job
+        self._queued_units = 0
+        self._queued_by_tenant = {}  # tenant -> queued units
+        self._running_by_tenant = {}
+        self._running_ids = set()
+        self._running = 0
+        self._tasks = set()
+        self._avg_job_seconds = SCHEDULER_INITIAL_JOB_SECONDS
+
+    @property
+    def queue_depth(self):
+        return len(self._jobs)
+
+    @property
+    def running(self):
+        return self._running
+
+    def active_doc_ids(self):
+        """Return the IDs of the jobs queued or running in this scheduler."""
+        return list(self._jobs) + list(self._running_ids)
+
+    def can_start_now(self, tenant):
+        """Return whether a job of a tenant submitted now would start without waiting in the queue."""
+        return (
+            not self._jobs
+            and self._running < self.max_running
+            and self._running_by_tenant.get(tenant, 0) < self.tenant_max_running
+        )
+
+    def check_admission(self, tenant, count=1):
+        """
+        Check that count more units of a tenant fit into the queue.
+
+        Args:
+            tenant: Tenant (API key) submitting the jobs
+            count: Number of documents to admit
+
+        Raises:
+            QueueFullError: If the global or tenant queue limit would be exceeded
+        """
+        if self._queued_units + count > self.max_queue_depth:
+            raise QueueFullError("Server is busy, too many documents are waiting", self._retry_after(self.queue_depth))
+
+        tenant_queued = self._queued_by_tenant.get(tenant, 0)
+        if tenant_queued + count > self.tenant_max_queued:
+            raise QueueFullError("Too many of your documents are waiting", self._retry_after(tenant_queued))
+
+    def open_batch(self, tenant="default"):
+        """
+        Admit a batch before its documents are received.
+
+        Args:
+            tenant: Tenant (API key) uploading the batch
+
+        Returns:
+            Batch handle to pass to reserve() and submit() for each document, and to close_batch() at the end
+
+        Raises:
+            QueueFullError: If the batch does not fit into the queue
+        """
+        self.check_admission(tenant)
+        self._add_unit(tenant)
+        return _Batch(tenant)
+
+    def reserve(self, batch):
+        """
+        Reserve the queue place of the next document of a batch, before it is registered.
+
+        Args:
+            batch: Handle from open_batch()
+
+        Raises:
+            QueueFullError: If one more document does not fit into the queue
+        """
+        if batch.reserved:
+            return
+        self.check_admission(batch.tenant)
+        self._add_unit(batch.tenant)
+        batch.reserved += 1
+
+    def close_batch(self, batch):
+        """Mark a batch as complete and release the units it still holds for documents never submitted."""
+        if batch.closed:
+            return
+        batch.closed = True
+        while batch.reserved:
+            batch.reserved -= 1
+            self._release_unit(batch.tenant)
+
+    def submit(self, doc_id, func, args=(), tenant="default", priority="normal", batch=None):
+        """
+        Queue a job and start it as soon as the limits allow.
+
+        Args:
+            doc_id: The document ID
+            func: Coroutine function running the job
+            args: Arguments for func
+            tenant: Tenant (API key) the job belongs to
+            priority: Priority class
+            batch: Handle from open_batch() if the job belongs to a batch; its reserved place is used
+
+        Raises:
+            QueueFullError: If the job does not fit into the queue
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority: {priority}")
+        if batch is not None and batch.reserved:
+            batch.reserved -= 1
+        else:
+            self.check_admission(tenant)
+            self._add_unit(tenant)
+
+        job = _Job(doc_id, tenant, priority, func, args)
+        self._queues[priority].setdefault(tenant, deque()).append(job)
+        self._jobs[doc_id] = job
+
+        self._dispatch()
+
+    def _add_unit(self, tenant):
+        self._queued_units += 1
+        self._queued_by_tenant[tenant] = self._queued_by_tenant.get(tenant, 0) + 1
+
+    def _release_unit(self, tenant):
+        self._queued_units -= 1
+        self._queued_by_tenant[tenant] -= 1
+        if not self._queued_by_tenant[tenant]:
+            del self._queued_by_tenant[tenant]
+
+    def queue_info(self, doc_id):
+        """
+        Estimate where a queued job stands.
+
+        Args:
+            doc_id: The document ID
+
+        Returns:
+            Tuple of (position, estimated wait in seconds), or None if the job is not queued here
+        """
+        job = self._jobs.get(doc_id)
+        if job is None:
+            return None
+
+        ahead = 0
+        for priority in self.priorities:
+            tenants = self._queues[priority]
+            if priority != job.priority:
+                ahead += sum(len(jobs) for jobs in tenants.values())
+                continue
+
+            # Round-robin: each other tenant gets about as many turns as this job has to wait for
+            own_index = tenants[job.tenant].index(job)
+            before_own = True
+            for tenant, jobs in tenants.items():
+                if tenant == job.tenant:
+                    before_own = False
+                    ahead += own_index
+                else:
+                    ahead += min(len(jobs), own_index + (1 if before_own else 0))
+            break
+
+        position = ahead + 1
+        return position, self._estimate_wait(ahead)
+
+    def _estimate_wait(self, jobs_ahead):
+        if self._running < self.max_running and jobs_ahead == 0:
+            return 0.0
+        return (jobs_ahead // self.max_running + 1) * self._avg_job_seconds
+
+    def _retry_after(self, jobs_ahead):
+        return max(1, math.ceil(self._estimate_wait(jobs_ahead)))
+
+    def _next_job(self):
+        for priority in self.priorities:
+            tenants = self._queues[priority]
+            for tenant in list(tenants):
+                if self._running_by_tenant.get(tenant, 0) >= self.tenant_max_running:
+                    continue
+
+                jobs = tenants[tenant]
+                job = jobs.popleft()
+                if jobs:
+                    # Move the tenant to the back so others get the next turn
+                    tenants.move_to_end(tenant)
+                else:
+                    del tenants[tenant]
+                return job
+        return None
+
+    def _dispatch(self):
+        while self._running < self.max_running:
+            job = self._next_job()
+            if job is None:
+                break
+
+            del self._jobs[job.doc_id]
+            self._release_unit(job.tenant)
+
+            self._running += 1
+            self._running_ids.add(job.doc_id)
+            self._running_by_tenant[job.tenant] = self._running_by_tenant.get(job.tenant, 0) + 1
+
+            task = asyncio.create_task(self._run(job))
+            # Keep a reference so the task is not garbage collected while it runs
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job):
+        started = time.monotonic()
+        try:
+            await job.func(*job.args)
+        except Exception as e:
+            print(f"Error running job {job.doc_id}: {e}")
+        finally:
+            # Exponential moving average of job durations, used for wait estimates
+            self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * (time.monotonic() - started)
+
+            self._running -= 1
+            self._running_ids.discard(job.doc_id)
+            self._running_by_tenant[job.tenant] -= 1
+            if not self._running_by_tenant[job.tenant]:
+                del self._running_by_tenant[job.tenant]
+
+            self._dispatch()
+
+
+# Process-wide scheduler used by the API
+scheduler = JobScheduler()
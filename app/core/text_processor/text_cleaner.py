@@ -89,7 +89,14 @@ class TextCleaner:
         if "text" in result:
             if isinstance(result["text"], list):
                 for i, text_item in enumerate(result["text"]):
-                    if "content" in text_item:
+                    if "content" not in text_item:
+                        continue
+                    if isinstance(text_item["content"], list):
+                        # Tables are lists of rows; their cells are cleaned one by one
+                        result["text"][i]["content"] = [
+                            [self.clean_text(cell) for cell in row] for row in text_item["content"]
+                        ]
+                    else:
                         result["text"][i]["content"] = self.clean_text(text_item["content"])
             elif isinstance(result["text"], str):
                 result["text"] = self.clean_text(result["text"])
@@ -0,0 +1,87 @@
+import os
+import tarfile
+import zipfile
+
+from app.core.upload.spooled_upload import SpooledUpload, UploadTooLargeError
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def is_archive(filename, head):
+    """
+    Check whether an upload is a ZIP or TAR archive of documents.
+
+    DOCX files are ZIP containers too, so ZIP archives are only recognized
+    by their extension. TAR archives are also recognized by their header.
+
+    Args:
+        filename: The uploaded filename
+        head: Leading bytes of the upload
+
+    Returns:
+        True if the upload should be unpacked as an archive
+    """
+    if (filename or "").lower().endswith(ARCHIVE_EXTENSIONS):
+        return True
+    return head[257:262] == b"ustar"
+
+
+def _is_hidden(name):
+    # Skip metadata entries such as __MACOSX/ folders and dot files
+    parts = name.replace("\\", "/").split("/")
+    return any(part.startswith((".", "__MACOSX")) for part in parts if part)
+
+
+def iter_archive_members(fileobj, spool_options=None):
+    """
+    Stream the regular files of an archive into spools, one member at a time.
+
+    Members are read straight from the archive stream, so the archive is
+    never extracted to disk as a whole. TAR archives are read in streaming
+    mode, member after member.
+
+    Args:
+        fileobj: Readable file object over the archive
+        spool_options: Keyword arguments for each member's SpooledUpload
+
+    Yields:
+        Tuples of (member filename, SpooledUpload); the caller owns the spool.
+        The spool is None for members that exceed the upload size limit.
+    """
+    spool_options = spool_options or {}
+
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _is_hidden(info.filename):
+                    continue
+                with archive.open(info) as member:
+                    yield os.path.basename(info.filename), _spool_member(member, spool_options)
+        return
+
+    fileobj.seek(0)
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for info in archive:
+            if not info.isfile() or _is_hidden(info.name):
+                continue
+            member = archive.extractfile(info)
+            yield os.path.basename(info.name), _spool_member(member, spool_options)
+
+
+def _spool_member(member, spool_options):
+    upload = SpooledUpload(**spool_options)
+    try:
+        while True:
+            chunk = member.read(upload.chunk_size)
+            if not chunk:
+                break
+            upload.write_sync(chunk)
+        upload.finish_sync()
+    except UploadTooLargeError:
+        upload.discard()
+        return None
+    except Exception:
+        upload.discard()
+        raise
+    return upload
@@ -0,0 +1,175 @@
+import multipart
+from multipart.multipart import parse_options_header
+
+# Form fields are small; larger values are rejected instead of being buffered
+MAX_FIELD_SIZE = 64 * 1024
+MAX_FIELDS = 100
+
+
+class MultipartError(Exception):
+    pass
+
+
+class _PartCollector:
+    """Callbacks of the multipart parser, turning each body chunk into form events."""
+
+    def __init__(self, charset):
+        self.charset = charset
+        self.events = []
+        self.in_part = False
+        self._fields = 0
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._name = None
+        self._is_file = False
+        self._value = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def _decode(self, value):
+        return value.decode(self.charset, errors="replace")
+
+    def on_part_begin(self):
+        self.in_part = True
+        self._disposition = b""
+        self._value = b""
+
+    def on_header_field(self, data, start, end):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise MultipartError('Every form part needs a Content-Disposition header with a "name"')
+        self._name = self._decode(options[b"name"])
+        self._is_file = b"filename" in options
+
+        if self._is_file:
+            self.events.append(("file_start", self._name, self._decode(options[b"filename"])))
+        else:
+            self._fields += 1
+            if self._fields > MAX_FIELDS:
+                raise MultipartError(f"Too many form fields, at most {MAX_FIELDS} are allowed")
+
+    def on_part_data(self, data, start, end):
+        if self._is_file:
+            self.events.append(("file_data", data[start:end]))
+        else:
+            self._value += data[start:end]
+            if len(self._value) > MAX_FIELD_SIZE:
+                raise MultipartError(f"Form field {self._name} exceeds {MAX_FIELD_SIZE} bytes")
+
+    def on_part_end(self):
+        self.in_part = False
+        if self._is_file:
+            self.events.append(("file_end",))
+        else:
+            self.events.append(("field", self._name, self._decode(self._value)))
+
+
+async def iter_form_parts(request):
+    """
+    Parse a multipart/form-data request body as it arrives.
+
+    Starlette's request.form() (and so FastAPI's File parameters) writes
+    every file part to a temporary file of its own before the endpoint
+    runs. Here file content is handed over chunk by chunk while the body
+    is still being received, so it can be hashed, size-checked and spooled
+    in a single pass.
+
+    Args:
+        request: Starlette Request with a multipart/form-data body
+
+    Yields:
+        Events in body order: ("field", name, value), ("file_start", name,
+        filename), ("file_data", bytes) and ("file_end",)
+
+    Raises:
+        MultipartError: If the body is not well-formed multipart/form-data
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type.lower() != b"multipart/form-data":
+        raise MultipartError("The request body must be multipart/form-data")
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise MultipartError("The multipart/form-data body has no boundary")
+
+    charset = params.get(b"charset", b"utf-8")
+    collector = _PartCollector(charset.decode("latin-1") if isinstance(charset, bytes) else charset)
+    parser = multipart.MultipartParser(boundary, collector.callbacks())
+
+    async for chunk in request.stream():
+        try:
+            parser.write(chunk)
+        except ValueError as e:
+            # python-multipart's parse errors are ValueErrors
+            raise MultipartError(f"Malformed multipart/form-data body: {e}") from e
+
+        events, collector.events = collector.events, []
+        for event in events:
+            yield event
+
+    try:
+        parser.finalize()
+    except ValueError as e:
+        raise MultipartError(f"Malformed multipart/form-data body: {e}") from e
+    if collector.in_part:
+        raise MultipartError("The multipart/form-data body ended in the middle of a part")
+    for event in collector.events:
+        yield event
+
+
+async def receive_file(request, upload, field="file"):
+    """
+    Stream the file of one form field into a spool, collecting the other form fields.
+
+    Args:
+        request: Starlette Request with a multipart/form-data body
+        upload: SpooledUpload receiving the file content
+        field: Name of the file field; further files are ignored
+
+    Returns:
+        Tuple of (filename, dictionary of the form fields); filename is None if
+        the body has no file in field
+
+    Raises:
+        MultipartError: If the body is not well-formed multipart/form-data
+        UploadTooLargeError: If the file exceeds the upload size limit
+    """
+    filename = None
+    fields = {}
+    writing = False
+    async for event in iter_form_parts(request):
+        kind = event[0]
+        if kind == "field":
+            fields[event[1]] = event[2]
+        elif kind == "file_start":
+            writing = event[1] == field and filename is None
+            if writing:
+                filename = event[2]
+        elif kind == "file_data":
+            if writing:
+                await upload.write(event[1])
+        elif writing:
+            await upload.finish()
+            writing = False
+    return filename, fields
@@ -0,0 +1,184 @@
+import io
+import os
+import hashlib
+import tempfile
+import zipfile
+
+from starlette.concurrency import run_in_threadpool
+
+from app.models.document_models import DocumentType
+from config.config import UPLOAD_MAX_SIZE, UPLOAD_SPOOL_MAX_MEMORY, UPLOAD_CHUNK_SIZE
+
+# Leading bytes that identify the supported file formats
+MAGIC_SIGNATURES = [
+    (b"%PDF-", DocumentType.PDF),
+    (b"\x89PNG\r\n\x1a\n", DocumentType.IMAGE),
+    (b"\xff\xd8\xff", DocumentType.IMAGE),  # JPEG
+    (b"GIF87a", DocumentType.IMAGE),
+    (b"GIF89a", DocumentType.IMAGE),
+    (b"BM", DocumentType.IMAGE),
+    (b"II*\x00", DocumentType.IMAGE),  # TIFF, little endian
+    (b"MM\x00*", DocumentType.IMAGE),  # TIFF, big endian
+]
+
+# Number of leading bytes kept for format detection
+SNIFF_BYTES = 512
+
+# DOCX files are ZIP containers, but so are many other formats; they are told apart by their main part
+ZIP_SIGNATURE = b"PK\x03\x04"
+DOCX_MAIN_PART = "word/document.xml"
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+def sniff_document_type(head):
+    """
+    Detect the document type from the first bytes of a file.
+
+    Args:
+        head: Leading bytes of the file
+
+    Returns:
+        DocumentType, or None if the format is not recognized
+    """
+    for signature, doc_type in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return doc_type
+    return None
+
+
+def is_docx_package(fileobj):
+    """Check whether a ZIP file is a Word document, by its central directory."""
+    try:
+        with zipfile.ZipFile(fileobj) as archive:
+            return DOCX_MAIN_PART in archive.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+
+class SpooledUpload:
+    """
+    Upload received in chunks, hashed and sniffed on the fly.
+
+    Content stays in memory up to max_memory bytes and is spilled to a
+    temporary file above that, so memory use is bounded by the threshold
+    rather than by the upload size.
+    """
+
+    def __init__(self, max_memory=UPLOAD_SPOOL_MAX_MEMORY, max_size=UPLOAD_MAX_SIZE, chunk_size=UPLOAD_CHUNK_SIZE):
+        self.max_memory = max_memory
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.head = b""
+        self.path = None
+        self._hash = hashlib.sha256()
+        self._buffer = io.BytesIO()
+        self._file = None
+        # None until ZIP content has been checked for a Word document
+        self._is_docx = None
+
+    @property
+    def in_memory(self):
+        return self.path is None
+
+    @property
+    def content_hash(self):
+        return self._hash.hexdigest()
+
+    @property
+    def detected_type(self):
+        """The format sniffed from the content, available once finish() has been called."""
+        if self._is_docx:
+            return DocumentType.DOCX
+        return sniff_document_type(self.head)
+
+    @property
+    def is_plain_zip(self):
+        """True for ZIP content that is not a Word document, available once finish() has been called."""
+        return self._is_docx is False
+
+    async def write(self, chunk):
+        """Append a chunk to the spool."""
+        self._account(chunk)
+
+        if self._file is None and self.size > self.max_memory:
+            await run_in_threadpool(self._rollover)
+
+        if self._file is None:
+            self._buffer.write(chunk)
+        else:
+            # Disk writes happen off the event loop
+            await run_in_threadpool(self._file.write, chunk)
+
+    async def finish(self):
+        """Flush spilled content to disk and identify ZIP containers once all chunks have been written."""
+        if self._file is not None or self.head.startswith(ZIP_SIGNATURE):
+            await run_in_threadpool(self.finish_sync)
+
+    def write_sync(self, chunk):
+        """Append a chunk from a worker thread, e.g. while reading an archive member."""
+        self._account(chunk)
+
+        if self._file is None and self.size > self.max_memory:
+            self._rollover()
+
+        if self._file is None:
+            self._buffer.write(chunk)
+        else:
+            self._file.write(chunk)
+
+    def finish_sync(self):
+        """Blocking variant of finish() for use from worker threads."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._is_docx is None and self.head.startswith(ZIP_SIGNATURE):
+            with self.open() as content:
+                self._is_docx = is_docx_package(content)
+
+    def _account(self, chunk):
+        """Enforce the size limit and update the hash and format sniffing buffer."""
+        self.size += len(chunk)
+        if self.max_size and self.size > self.max_size:
+            raise UploadTooLargeError(f"Upload exceeds the maximum size of {self.max_size} bytes")
+
+        self._hash.update(chunk)
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+
+    def spill(self):
+        """Move in-memory content to a temporary file, e.g. before its job waits in the queue."""
+        if self.in_memory:
+            self._rollover()
+            self.finish_sync()
+
+    def _rollover(self):
+        fd, self.path = tempfile.mkstemp()
+        self._file = os.fdopen(fd, "wb")
+        self._file.write(self._buffer.getvalue())
+        self._buffer = None
+
+    def getvalue(self):
+        """Return the content of an in-memory upload."""
+        if not self.in_memory:
+            raise ValueError("Upload was spilled to disk; use its path instead")
+        return self._buffer.getvalue()
+
+    def open(self):
+        """Return a readable file object over the upload content."""
+        if self.in_memory:
+            return io.BytesIO(self._buffer.getvalue())
+        return open(self.path, "rb")
+
+    def discard(self):
+        """Delete the spilled file, if any, and release the buffer."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+        self.path = None
+        self._buffer = io.BytesIO()
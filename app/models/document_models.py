@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Dict, Any, Optional, Union
 from enum import Enum
 import datetime
 
@@ -25,11 +25,12 @@ class ImageInfo(BaseModel):
     page: Optional[int] = None
     index: Optional[int] = None
     ocr_text: Optional[str] = None
+    ocr_skipped: Optional[str] = None
     markdown: Optional[str] = None
 
 
 class TextItem(BaseModel):
-    content: str
+    content: Union[str, List[List[str]]]
     type: Optional[str] = "paragraph"
     page: Optional[int] = None
     index: Optional[int] = None
@@ -39,9 +40,13 @@ class TextItem(BaseModel):
 class OCRResult(BaseModel):
     full_text: Optional[str] = None
     details: Optional[List[Dict[str, Any]]] = None
+    skipped_images: Optional[int] = None
 
 
 class DocumentData(BaseModel):
+    # Validate pipeline results as they are assigned so the job store can serialize them
+    model_config = ConfigDict(validate_assignment=True)
+
     doc_id: str
     filename: str
     original_path: str
@@ -51,10 +56,16 @@ class DocumentData(BaseModel):
     ocr: Optional[OCRResult] = None
     merged_text: Optional[List[Any]] = None
     markdown: Optional[str] = None
+    # File holding the Markdown of documents converted in bounded-memory mode
+    markdown_path: Optional[str] = None
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
     updated_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
     status: DocumentStatus = DocumentStatus.PENDING
     error: Optional[str] = None
+    cache_key: Optional[str] = None
+    content_hash: Optional[str] = None
+    pages: Optional[str] = None
+    profile: Optional[Dict[str, Any]] = None
 
 
 class DocumentRequest(BaseModel):
@@ -70,4 +81,18 @@ class DocumentResponse(BaseModel):
     created_at: datetime.datetime
     updated_at: datetime.datetime
     markdown: Optional[str] = None
-    error: Optional[str] = None 
\ No newline at end of file
+    error: Optional[str] = None
+    pages: Optional[str] = None
+    queue_position: Optional[int] = None
+    estimated_wait_seconds: Optional[float] = None
+    profile: Optional[Dict[str, Any]] = None
+    ocr_skipped_images: Optional[int] = None
+    markdown_url: Optional[str] = None  # Download of bounded-memory results, whose markdown is None
+
+class BatchResponse(BaseModel):
+    batch_id: str
+    total: int
+    counts: Dict[str, int]
+    progress: float
+    skipped: List[str] = Field(default_factory=list)
+    documents: Optional[List[DocumentResponse]] = None
@@ -0,0 +1,272 @@
+import io
+import os
+import random
+import zlib
+
+# Words for the synthetic text; a fixed seed keeps every corpus identical between runs
+WORDS = (
+    "document conversion pipeline markdown extraction table image paragraph "
+    "section result value report analysis revenue quarter system service "
+    "performance memory throughput latency page figure summary method data"
+).split()
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").encode("latin-1")
+
+
+def _scan_image(rng, width, height, lines):
+    """Render lines of text on a noisy, slightly rotated background, like a scanned page."""
+    from PIL import Image, ImageDraw, ImageChops
+
+    image = Image.new("L", (width, height), color=245)
+    draw = ImageDraw.Draw(image)
+    line_height = max(12, height // (lines + 1))
+    for i in range(lines):
+        draw.text((width // 20, line_height // 2 + i * line_height), _sentence(rng, 8), fill=20)
+
+    # Paper grain and a small skew
+    noise = Image.effect_noise((width, height), 24).point(lambda v: 200 + v // 5)
+    image = ImageChops.multiply(image, noise)
+    image = image.rotate(rng.uniform(-1.5, 1.5), fillcolor=245)
+    return image.convert("RGB")
+
+
+def _write_pdf(page_contents, images):
+    """
+    Assemble a PDF from page content streams and image XObjects.
+
+    Args:
+        page_contents: List of (content stream bytes, list of image numbers used on the page)
+        images: List of (width, height, filter name, data) tuples
+
+    Returns:
+        The PDF as bytes
+    """
+    objects = [None, None]  # Catalog and page tree, filled in at the end
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    font_id = len(objects)
+
+    image_ids = []
+    for width, height, filter_name, data in images:
+        colorspace = b"/DeviceRGB" if filter_name == b"/DCTDecode" else b"/DeviceGray"
+        objects.append(
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s /BitsPerComponent 8 "
+            b"/Filter %s /Length %d >>\nstream\n" % (width, height, colorspace, filter_name, len(data))
+            + data + b"\nendstream"
+        )
+        image_ids.append(len(objects))
+
+    kids = []
+    for content, used_images in page_contents:
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        xobjects = b" ".join(b"/Im%d %d 0 R" % (n, image_ids[n]) for n in used_images)
+        resources = b"<< /Font << /F1 %d 0 R >> /XObject << %s >> >>" % (font_id, xobjects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R /Resources %s >>"
+            % (content_id, resources)
+        )
+        kids.append(len(objects))
+
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_text_pdf(pages, lines_per_page=40, seed=0):
+    """
+    Generate a text-only PDF.
+
+    Args:
+        pages: Number of pages
+        lines_per_page: Lines of text on every page
+        seed: Random seed for the text
+
+    Returns:
+        The PDF as bytes
+    """
+    rng = random.Random(seed)
+    page_contents = []
+    for page in range(pages):
+        lines = [b"BT /F1 10 Tf 14 TL 56 740 Td"]
+        lines.append(b"(%s) Tj T*" % _pdf_string(f"SECTION {page + 1}"))
+        for _ in range(lines_per_page):
+            lines.append(b"(%s) Tj T*" % _pdf_string(_sentence(rng)))
+        lines.append(b"ET")
+        page_contents.append((b"\n".join(lines), []))
+    return _write_pdf(page_contents, [])
+
+
+def make_image_pdf(pages, images_per_page=2, image_size=(480, 320), seed=0):
+    """
+    Generate an image-heavy PDF: a short caption and several scanned-looking images per page.
+
+    Every image is distinct, alternating between JPEG and Flate-compressed
+    grayscale, the two encodings scanners produce most.
+
+    Args:
+        pages: Number of pages
+        images_per_page: Images on every page
+        image_size: (width, height) of the images
+        seed: Random seed for the text and images
+
+    Returns:
+        The PDF as bytes
+    """
+    rng = random.Random(seed)
+    width, height = image_size
+    images = []
+    page_contents = []
+    for page in range(pages):
+        content = [b"BT /F1 10 Tf 56 760 Td (%s) Tj ET" % _pdf_string(_sentence(rng))]
+        used = []
+        for i in range(images_per_page):
+            scan = _scan_image(rng, width, height, lines=8)
+            if len(images) % 2 == 0:
+                buffer = io.BytesIO()
+                scan.save(buffer, format="JPEG", quality=75)
+                images.append((width, height, b"/DCTDecode", buffer.getvalue()))
+            else:
+                images.append((width, height, b"/FlateDecode", zlib.compress(scan.convert("L").tobytes())))
+            used.append(len(images) - 1)
+            content.append(b"q 240 160 0 0 %d %d cm /Im%d Do Q" % (56 + (i % 2) * 260, 560 - (i // 2) * 180, used[-1]))
+        page_contents.append((b"\n".join(content), used))
+    return _write_pdf(page_contents, images)
+
+
+def make_docx(paragraphs=0, table_rows=0, table_cols=6, images=0, runs_per_paragraph=6, merged_cells=False, seed=0):
+    """
+    Generate a DOCX file.
+
+    Args:
+        paragraphs: Number of paragraphs, each made of several formatted runs, with a heading every 20
+        table_rows: Rows of one large table (0 for none)
+        table_cols: Columns of the table
+        images: Number of distinct embedded images
+        runs_per_paragraph: Runs (bold, italic, plain) per paragraph
+        merged_cells: Merge the first column vertically in groups of five rows, and the
+            last two cells of every third row horizontally
+        seed: Random seed for the text and images
+
+    Returns:
+        The DOCX as bytes
+    """
+    import docx
+
+    rng = random.Random(seed)
+    document = docx.Document()
+
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            document.add_heading(f"Section {i // 20 + 1}", level=1 + (i // 20) % 3)
+        paragraph = document.add_paragraph()
+        for r in range(runs_per_paragraph):
+            run = paragraph.add_run(_sentence(rng, 6) + " ")
+            run.bold = r % 3 == 1
+            run.italic = r % 3 == 2
+
+    if table_rows:
+        table = document.add_table(rows=1, cols=table_cols)
+        for cell, name in zip(table.rows[0].cells, WORDS):
+            cell.text = name.capitalize()
+        for _ in range(table_rows - 1):
+            for cell in table.add_row().cells:
+                cell.text = f"{rng.choice(WORDS)} {rng.randint(0, 100000)}"
+
+        if merged_cells:
+            # Set in the XML directly; python-docx's cell.merge() is too slow for large tables
+            for i, tr in enumerate(table._tbl.tr_lst[1:], start=1):
+                tcs = tr.tc_lst
+                tcs[0].vMerge = "restart" if i % 5 == 1 else "continue"
+                if i % 3 == 0 and table_cols > 1:
+                    tcs[-2].grid_span = 2
+                    tr.remove(tcs[-1])
+
+    for i in range(images):
+        # python-docx stores identical images once, so every image must differ
+        buffer = io.BytesIO()
+        _scan_image(rng, 320, 200, lines=5).save(buffer, format="PNG")
+        buffer.seek(0)
+        document.add_paragraph(f"Figure {i + 1}")
+        document.add_picture(buffer)
+
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def make_scans(count, directory, size=(1240, 1754), seed=0):
+    """
+    Write scanned-looking page images (A4 at 150 dpi by default) to a directory.
+
+    Args:
+        count: Number of images
+        directory: Directory to write the PNG files to
+        size: (width, height) of the images
+        seed: Random seed for the text and noise
+
+    Returns:
+        List of image paths
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"scan_{i:05d}.png")
+        _scan_image(rng, size[0], size[1], lines=40).save(path)
+        paths.append(path)
+    return paths
+
+
+def make_structured_text(lines, seed=0):
+    """
+    Generate plain text with the structures StructureParser looks for.
+
+    Headings are upper-case lines without "#" markers, so the heading
+    heuristics run over the whole text, mixed with bullet and numbered
+    lists, pipe tables and fenced code blocks.
+
+    Args:
+        lines: Approximate number of lines
+        seed: Random seed for the text
+
+    Returns:
+        The text
+    """
+    rng = random.Random(seed)
+    out = []
+    while len(out) < lines:
+        block = len(out) // 10 % 5
+        if block == 0:
+            out.append(f"SECTION {len(out)} {rng.choice(WORDS).upper()}")
+            out.extend(_sentence(rng) for _ in range(9))
+        elif block == 1:
+            out.extend(f"- {_sentence(rng, 5)}" for _ in range(5))
+            out.extend(f"{n}. {_sentence(rng, 5)}" for n in range(1, 6))
+        elif block == 2:
+            out.extend(" | ".join(rng.choice(WORDS) for _ in range(4)) for _ in range(10))
+        elif block == 3:
+            out.append("```python")
+            out.extend(f"value_{n} = compute({n})" for n in range(8))
+            out.append("```")
+        else:
+            out.extend(_sentence(rng) for _ in range(10))
+    return "\n".join(out)
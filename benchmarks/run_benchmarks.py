@@ -0,0 +1,465 @@
+import os
+import gc
+import sys
+import copy
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+from benchmarks import corpus
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Bump when the corpus generators change, so cached corpora are rebuilt
+CORPUS_VERSION = 1
+
+# Regression thresholds; a baseline file can override them globally or per benchmark
+DEFAULT_THRESHOLDS = {
+    "max_slowdown": 0.25,  # Allowed drop in throughput against the baseline
+    "max_memory_growth": 0.25,  # Allowed growth of peak memory against the baseline
+    "max_scaling_exponent": 1.3  # Time grows as size ** exponent; 1.0 is linear, 2.0 quadratic
+}
+
+
+# Shortest duration of one timing sample, and the most runs a sample may take to reach it
+MIN_SAMPLE_SECONDS = 0.2
+MAX_LOOPS = 50
+
+
+class Benchmark:
+    """
+    One component measured on synthetic input of two sizes.
+
+    setup(size, workdir, corpus_dir) runs untimed and returns (prepare, run, units):
+    prepare() builds a fresh input for each measured call, run(input) is the
+    code under test, and units is the amount of work (pages, images, ...)
+    that throughput is reported in.
+    """
+
+    def __init__(self, name, component, unit, sizes, setup):
+        self.name = name
+        self.component = component
+        self.unit = unit
+        self.sizes = sizes
+        self.setup = setup
+
+
+def _cached(corpus_dir, filename, generate):
+    """Return the bytes of a corpus file, generating it on first use."""
+    path = os.path.join(corpus_dir, filename)
+    if not os.path.exists(path):
+        data = generate()
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _fresh_dir(workdir, name):
+    path = os.path.join(workdir, name)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+
+def _document_data(paragraphs, images=0, tables=False, seed=0):
+    """
+    Build extracted document data in the shape the extractors return,
+    with untidy whitespace for the cleaner to work on.
+    """
+    rng = random.Random(seed)
+    text = []
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            text.append({"index": i, "content": f"Section {i // 20 + 1}", "style": "Heading 2", "type": "paragraph"})
+        content = "  ".join(corpus._sentence(rng) for _ in range(3)) + " \n\n\n "
+        text.append({"index": i, "content": content, "style": "Normal", "type": "paragraph"})
+        if tables and i % 50 == 49:
+            rows = [[f"{rng.choice(corpus.WORDS)} {n}" for n in range(5)] for _ in range(8)]
+            text.append({"type": "table", "content": rows, "index": i // 50})
+
+    image_list = [
+        {
+            "index": i,
+            "filename": f"docx_image_{i:05d}.png",
+            "path": f"/tmp/docx_image_{i:05d}.png",
+            "width": 640,
+            "height": 480,
+            "ocr_text": "  ".join(corpus._sentence(rng, 8) for _ in range(2))
+        }
+        for i in range(images)
+    ]
+    return {
+        "text": text,
+        "images": image_list,
+        "ocr": {
+            "full_text": "\n\n".join(img["ocr_text"] for img in image_list),
+            "details": [],
+            "errors": []
+        }
+    }
+
+
+def _setup_pdf_text(size, workdir, corpus_dir):
+    from app.core.document_extractor.pdf_extractor import PDFExtractor
+    from app.core.media_store.media_store import MediaStore
+
+    data = _cached(corpus_dir, f"text-{size}.pdf", lambda: corpus.make_text_pdf(size))
+    media_store = MediaStore(_fresh_dir(workdir, "pdf_text"))
+    run = lambda _: PDFExtractor(file_bytes=data, media_store=media_store, parallel_workers=1).extract_all()
+    return (lambda: None), run, size
+
+
+def _setup_pdf_text_parallel(size, workdir, corpus_dir):
+    from app.core.document_extractor.pdf_extractor import PDFExtractor
+    from app.core.media_store.media_store import MediaStore
+
+    data = _cached(corpus_dir, f"text-{size}.pdf", lambda: corpus.make_text_pdf(size))
+    media_store = MediaStore(_fresh_dir(workdir, "pdf_text_parallel"))
+    workers = os.cpu_count() or 1
+    run = lambda _: PDFExtractor(file_bytes=data, media_store=media_store, parallel_workers=workers).extract_all()
+    return (lambda: None), run, size
+
+
+def _setup_pdf_images(size, workdir, corpus_dir):
+    from app.core.document_extractor.pdf_extractor import PDFExtractor
+    from app.core.media_store.media_store import MediaStore
+
+    data = _cached(corpus_dir, f"images-{size}.pdf", lambda: corpus.make_image_pdf(size))
+    prepare = lambda: _fresh_dir(workdir, "pdf_images")
+    run = lambda images_dir: PDFExtractor(file_bytes=data, media_store=MediaStore(images_dir), parallel_workers=1).extract_all()
+    return prepare, run, size * 2
+
+
+def _setup_docx(option, **options):
+    """Build the setup of a DOCX benchmark whose size is the make_docx() option given; options are passed on."""
+    def setup(size, workdir, corpus_dir):
+        from app.core.document_extractor.docx_extractor import DocxExtractor
+        from app.core.media_store.media_store import MediaStore
+
+        name = "-".join([option] + sorted(options) + [str(size)])
+        data = _cached(corpus_dir, f"{name}.docx", lambda: corpus.make_docx(**{option: size}, **options))
+        prepare = lambda: _fresh_dir(workdir, "docx")
+        run = lambda images_dir: DocxExtractor(file_bytes=data, media_store=MediaStore(images_dir)).extract_all()
+        return prepare, run, size
+    return setup
+
+
+def _setup_docx_pipeline(option, **options):
+    """Like _setup_docx(), but converting the DOCX all the way to Markdown."""
+    def setup(size, workdir, corpus_dir):
+        from app.core.pipeline.document_pipeline import DocumentPipeline
+        from app.core.media_store.media_store import MediaStore
+
+        name = "-".join([option] + sorted(options) + [str(size)])
+        data = _cached(corpus_dir, f"{name}.docx", lambda: corpus.make_docx(**{option: size}, **options))
+        prepare = lambda: _fresh_dir(workdir, "docx_pipeline")
+        run = lambda images_dir: DocumentPipeline(media_store=MediaStore(images_dir)).run(data, "docx")
+        return prepare, run, size
+    return setup
+
+
+def _setup_ocr(size, workdir, corpus_dir):
+    from app.core.ocr.ocr_pool import OCRModelPool
+    from app.core.ocr.ocr_processor import OCRProcessor
+
+    scans_dir = os.path.join(corpus_dir, f"scans-{size}")
+    if not os.path.isdir(scans_dir):
+        corpus.make_scans(size, scans_dir + ".tmp")
+        os.replace(scans_dir + ".tmp", scans_dir)
+    paths = sorted(os.path.join(scans_dir, name) for name in os.listdir(scans_dir))
+
+    # Model loading happens once per worker, so it is kept out of the measurement
+    pool = OCRModelPool(size=1)
+    pool.warm_up()
+    processor = OCRProcessor(pool=pool)
+    prepare = lambda: {"text": [], "images": [{"index": i, "filename": os.path.basename(p), "path": p}
+                                              for i, p in enumerate(paths)]}
+    return prepare, processor.process_document_images, size
+
+
+def _setup_text_cleaner(size, workdir, corpus_dir):
+    from app.core.text_processor.text_cleaner import TextCleaner
+
+    data = _document_data(size, images=size // 20)
+    # The cleaner edits text items in place, so every run gets its own copy
+    return (lambda: copy.deepcopy(data)), TextCleaner().clean_document_text, size
+
+
+def _setup_text_merger(size, workdir, corpus_dir):
+    from app.core.text_processor.text_merger import TextMerger
+
+    data = _document_data(size, images=size // 20, tables=True)
+    return (lambda: copy.deepcopy(data)), TextMerger().merge_document_and_ocr, size
+
+
+def _setup_structure_parser(size, workdir, corpus_dir):
+    from app.core.markdown_converter.structure_parser import StructureParser
+
+    text = corpus.make_structured_text(size)
+    return (lambda: text), StructureParser().parse_structure, size
+
+
+def _setup_markdown_formatter(size, workdir, corpus_dir):
+    from app.core.text_processor.text_merger import TextMerger
+    from app.core.markdown_converter.md_formatter import MarkdownFormatter
+
+    data = TextMerger().merge_document_and_ocr(_document_data(size, images=size // 20, tables=True))
+    return (lambda: copy.deepcopy(data)), MarkdownFormatter().format_document_as_markdown, size
+
+
+BENCHMARKS = [
+    Benchmark("pdf_text", "PDFExtractor", "pages", {"quick": (50, 200), "full": (500, 2000)}, _setup_pdf_text),
+    Benchmark("pdf_text_parallel", "PDFExtractor", "pages", {"quick": (200, 800), "full": (500, 2000)},
+              _setup_pdf_text_parallel),
+    Benchmark("pdf_images", "PDFExtractor", "images", {"quick": (10, 40), "full": (250, 1000)}, _setup_pdf_images),
+    Benchmark("docx_paragraphs", "DocxExtractor", "paragraphs", {"quick": (200, 800), "full": (2000, 8000)},
+              _setup_docx("paragraphs")),
+    Benchmark("docx_table", "DocxExtractor", "rows", {"quick": (100, 400), "full": (1000, 4000)},
+              _setup_docx("table_rows")),
+    Benchmark("docx_merged_table", "DocxExtractor", "rows", {"quick": (100, 400), "full": (1000, 4000)},
+              _setup_docx("table_rows", merged_cells=True)),
+    # Tables without images take the formatter's text path, which the other DOCX benchmarks never reach
+    Benchmark("docx_merged_table_markdown", "DocumentPipeline", "rows", {"quick": (100, 400), "full": (1000, 4000)},
+              _setup_docx_pipeline("table_rows", merged_cells=True)),
+    Benchmark("docx_images", "DocxExtractor", "images", {"quick": (10, 40), "full": (100, 400)},
+              _setup_docx("images")),
+    Benchmark("ocr_scans", "OCRProcessor", "images", {"quick": (2, 6), "full": (10, 40)}, _setup_ocr),
+    Benchmark("text_cleaner", "TextCleaner", "paragraphs", {"quick": (1000, 4000), "full": (10000, 40000)},
+              _setup_text_cleaner),
+    Benchmark("text_merger", "TextMerger", "paragraphs", {"quick": (1000, 4000), "full": (10000, 40000)},
+              _setup_text_merger),
+    Benchmark("structure_parser", "StructureParser", "lines", {"quick": (500, 2000), "full": (5000, 20000)},
+              _setup_structure_parser),
+    Benchmark("markdown_formatter", "MarkdownFormatter", "paragraphs", {"quick": (1000, 4000), "full": (10000, 40000)},
+              _setup_markdown_formatter),
+]
+
+
+def measure(prepare, run, repeat):
+    """
+    Time a benchmark and measure its peak memory.
+
+    Timing runs and the memory run are separate because tracemalloc slows
+    allocation-heavy code down considerably. The first run warms caches and
+    sets how many runs make up one sample.
+
+    Args:
+        prepare: Callable building the input of one run (not measured)
+        run: Callable under test
+        repeat: Number of timing samples; the fastest counts
+
+    Returns:
+        Tuple of (seconds per run, peak memory in bytes)
+    """
+    # Fast components run several times per sample so timer resolution does not dominate
+    value = prepare()
+    started = time.perf_counter()
+    run(value)
+    number = min(MAX_LOOPS, max(1, math.ceil(MIN_SAMPLE_SECONDS / max(time.perf_counter() - started, 1e-9))))
+
+    timings = []
+    for _ in range(repeat):
+        values = [prepare() for _ in range(number)]
+        gc.collect()
+        started = time.perf_counter()
+        for value in values:
+            run(value)
+        timings.append((time.perf_counter() - started) / number)
+        del values
+
+    value = prepare()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(value)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak
+
+
+def run_benchmark(benchmark, profile, repeat, workdir, corpus_dir):
+    """
+    Run one benchmark at both sizes of a profile.
+
+    Returns:
+        Result dictionary with the runs at each size, throughput and peak memory
+        at the larger size, and the scaling exponent between the two sizes
+    """
+    runs = []
+    for size in benchmark.sizes[profile]:
+        prepare, run, units = benchmark.setup(size, workdir, corpus_dir)
+        seconds, peak = measure(prepare, run, repeat)
+        runs.append({
+            "size": size,
+            "units": units,
+            "seconds": round(seconds, 6),
+            "throughput": round(units / seconds, 3) if seconds else None,
+            "peak_mb": round(peak / (1024 * 1024), 3)
+        })
+        print(f"  {benchmark.name} [{size}]: {seconds * 1000:.2f} ms, "
+              f"{units / seconds if seconds else 0:.1f} {benchmark.unit}/s, {peak / (1024 * 1024):.1f} MB peak")
+
+    small, large = runs[0], runs[-1]
+    exponent = None
+    if small["seconds"] and large["units"] != small["units"]:
+        exponent = round(math.log(large["seconds"] / small["seconds"]) / math.log(large["units"] / small["units"]), 3)
+
+    return {
+        "component": benchmark.component,
+        "unit": benchmark.unit,
+        "runs": runs,
+        "throughput": large["throughput"],
+        "peak_mb": large["peak_mb"],
+        "scaling_exponent": exponent
+    }
+
+
+def compare(results, baseline):
+    """
+    Check results against the scaling limit and, if given, a baseline.
+
+    Args:
+        results: Result dictionary of run()
+        baseline: Baseline dictionary saved by an earlier run, or None
+
+    Returns:
+        List of regression messages
+    """
+    problems = []
+    baseline = baseline or {}
+    same_profile = baseline.get("profile") == results["profile"]
+    if baseline and not same_profile:
+        print(f"Baseline was recorded with the {baseline.get('profile')} profile; only checking scaling")
+
+    for name, result in results["benchmarks"].items():
+        if "error" in result:
+            problems.append(f"{name}: failed with {result['error']}")
+            continue
+
+        reference = baseline.get("benchmarks", {}).get(name) if same_profile else None
+        thresholds = dict(DEFAULT_THRESHOLDS, **baseline.get("thresholds", {}))
+        thresholds.update((reference or {}).get("thresholds", {}))
+
+        exponent = result["scaling_exponent"]
+        if exponent is not None and exponent > thresholds["max_scaling_exponent"]:
+            problems.append(f"{name}: time grows as size^{exponent} (limit {thresholds['max_scaling_exponent']})")
+
+        if not reference or "error" in reference:
+            continue
+        if reference["throughput"] and result["throughput"] < reference["throughput"] * (1 - thresholds["max_slowdown"]):
+            problems.append(
+                f"{name}: {result['throughput']} {result['unit']}/s, baseline {reference['throughput']}"
+            )
+        if reference["peak_mb"] and result["peak_mb"] > reference["peak_mb"] * (1 + thresholds["max_memory_growth"]):
+            problems.append(f"{name}: {result['peak_mb']} MB peak, baseline {reference['peak_mb']} MB")
+
+    return problems
+
+
+def run(names=None, profile="quick", repeat=3, corpus_dir=None):
+    """
+    Run the benchmarks.
+
+    Args:
+        names: Benchmark names to run; all if None
+        profile: "quick" for small corpora, "full" for up to 2,000-page documents
+        repeat: Timed runs per size
+        corpus_dir: Directory caching the generated corpora
+
+    Returns:
+        Result dictionary that can be saved as a baseline
+    """
+    corpus_dir = os.path.join(corpus_dir or os.path.join(tempfile.gettempdir(), "doc2md-bench"),
+                              f"corpus-v{CORPUS_VERSION}")
+    os.makedirs(corpus_dir, exist_ok=True)
+    workdir = tempfile.mkdtemp(prefix="doc2md-bench-")
+
+    results = {
+        "profile": profile,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "benchmarks": {}
+    }
+    try:
+        for benchmark in BENCHMARKS:
+            if names and benchmark.name not in names:
+                continue
+            print(f"{benchmark.name} ({benchmark.component})")
+            try:
+                results["benchmarks"][benchmark.name] = run_benchmark(benchmark, profile, repeat, workdir, corpus_dir)
+            except ImportError as e:
+                # e.g. PaddleOCR is not installed; the other components can still be measured
+                print(f"  skipped: {e}")
+            except Exception as e:
+                print(f"  error: {type(e).__name__}: {e}")
+                results["benchmarks"][benchmark.name] = {"component": benchmark.component,
+                                                         "error": f"{type(e).__name__}: {e}"}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the conversion pipeline components on synthetic documents")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run (default: all of {', '.join(b.name for b in BENCHMARKS)})")
+    parser.add_argument("--full", action="store_true", help="Use the large corpora (up to 2,000-page PDFs)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size; the fastest counts")
+    parser.add_argument("--baseline", help="Baseline to compare with (default: benchmarks/baselines/<profile>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--corpus-dir", help="Where generated corpora are cached (default: the system temp directory)")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.names) - {b.name for b in BENCHMARKS}
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    profile = "full" if args.full else "quick"
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{profile}.json")
+    results = run(args.names, profile, max(1, args.repeat), args.corpus_dir)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    problems = compare(results, baseline)
+
+    if args.save_baseline:
+        # Keep the thresholds of the previous baseline, and the entries of benchmarks that were not run
+        if baseline and baseline.get("profile") == profile:
+            results["benchmarks"] = dict(baseline.get("benchmarks", {}), **results["benchmarks"])
+        results["thresholds"] = (baseline or {}).get("thresholds", DEFAULT_THRESHOLDS)
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {baseline_path}")
+
+    if problems:
+        print("Regressions:")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+
+    print("No regressions" + ("" if baseline else " (no baseline to compare with; scaling checked only)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
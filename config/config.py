@@ -18,6 +18,90 @@ OCR_LANGUAGE = "ch"  # Default language for OCR
 OCR_USE_ANGLE_CLS = True
 OCR_USE_GPU = False
 
+# Worker pool settings
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", max(1, (os.cpu_count() or 2) // 2)))
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", WORKER_PROCESSES))
+WORKER_START_METHOD = os.getenv("WORKER_START_METHOD", "spawn")
+WORKER_WARM_UP = os.getenv("WORKER_WARM_UP", "true").lower() == "true"  # Start the workers and load models at API startup
+WORKER_WARM_UP_TIMEOUT = float(os.getenv("WORKER_WARM_UP_TIMEOUT", 300))
+
+# OCR model pool settings (per worker process)
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", 1))  # PaddleOCR instances kept loaded
+OCR_POOL_WARM_UP = os.getenv("OCR_POOL_WARM_UP", "true").lower() == "true"  # Load the models when a worker starts
+OCR_CPU_THREADS = int(os.getenv("OCR_CPU_THREADS", max(1, (os.cpu_count() or 2) // WORKER_PROCESSES)))
+OCR_ENABLE_MKLDNN = os.getenv("OCR_ENABLE_MKLDNN", "false").lower() == "true"
+
+# OCR gating: images that cannot contain text are not OCR'd
+OCR_GATE_ENABLED = os.getenv("OCR_GATE_ENABLED", "true").lower() == "true"
+OCR_GATE_MIN_SIDE = int(os.getenv("OCR_GATE_MIN_SIDE", 24))  # Smaller images (icons, bullets) are skipped, in pixels
+OCR_GATE_MAX_ASPECT = float(os.getenv("OCR_GATE_MAX_ASPECT", 25))  # Longer, thinner images (rules, borders) are skipped
+OCR_GATE_MIN_STDDEV = float(os.getenv("OCR_GATE_MIN_STDDEV", 3))  # Brightness spread below which an image is blank
+OCR_GATE_MIN_EDGE_DENSITY = float(os.getenv("OCR_GATE_MIN_EDGE_DENSITY", 0.01))  # Share of edge pixels text needs
+OCR_GATE_DETECT = os.getenv("OCR_GATE_DETECT", "false").lower() == "true"  # Run text detection before recognition
+
+# OCR preprocessing: images are scaled to the resolution OCR needs before detection
+OCR_PREPROCESS_ENABLED = os.getenv("OCR_PREPROCESS_ENABLED", "true").lower() == "true"
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", 4096))  # Longer sides are downscaled to this, in pixels; 0 for no limit
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 300))  # Images tagged with a higher DPI are downscaled to it; 0 to ignore
+OCR_PREPROCESS_GRAYSCALE = os.getenv("OCR_PREPROCESS_GRAYSCALE", "true").lower() == "true"
+OCR_NORMALIZE_CONTRAST = os.getenv("OCR_NORMALIZE_CONTRAST", "true").lower() == "true"  # Stretch brightness to 0-255
+
+# Page-parallel PDF extraction settings
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", max(1, (os.cpu_count() or 2) // WORKER_PROCESSES)))  # Per conversion worker
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 200))  # Smaller PDFs are extracted in one process
+PDF_SHARD_MIN_PAGES = int(os.getenv("PDF_SHARD_MIN_PAGES", 25))  # Each shard process parses the whole file once
+
+# Media store settings
+MEDIA_STORE_SHARD_LEVELS = int(os.getenv("MEDIA_STORE_SHARD_LEVELS", 2))  # Directory levels below IMAGES_DIR, by content hash
+MEDIA_STORE_INDEX_PATH = os.getenv("MEDIA_STORE_INDEX_PATH", os.path.join(BASE_DIR, "data", "media_index.db"))  # Reference counts
+
+# Bounded-memory mode for very large PDFs
+BOUNDED_MEMORY_MIN_PAGES = int(os.getenv("BOUNDED_MEMORY_MIN_PAGES", 1000))  # Converted pages that switch it on; 0 never
+BOUNDED_MEMORY_WINDOW_PAGES = int(os.getenv("BOUNDED_MEMORY_WINDOW_PAGES", 50))  # Pages between releasing caches
+BOUNDED_MEMORY_BUDGET_MB = int(os.getenv("BOUNDED_MEMORY_BUDGET_MB", 2048))  # Peak RSS of a worker; 0 for no limit
+MARKDOWN_RESULT_DIR = os.getenv("MARKDOWN_RESULT_DIR", os.path.join(BASE_DIR, "data", "markdown"))  # Their Markdown
+MARKDOWN_RESULT_RETENTION_HOURS = float(os.getenv("MARKDOWN_RESULT_RETENTION_HOURS", 7 * 24))  # Then it is deleted; 0 keeps it
+
+# Scheduler settings
+SCHEDULER_MAX_QUEUE_DEPTH = int(os.getenv("SCHEDULER_MAX_QUEUE_DEPTH", 1000))  # Jobs waiting across all tenants
+SCHEDULER_TENANT_MAX_RUNNING = int(os.getenv("SCHEDULER_TENANT_MAX_RUNNING", max(1, MAX_CONCURRENT_JOBS // 2)))
+SCHEDULER_TENANT_MAX_QUEUED = int(os.getenv("SCHEDULER_TENANT_MAX_QUEUED", 200))
+SCHEDULER_INITIAL_JOB_SECONDS = float(os.getenv("SCHEDULER_INITIAL_JOB_SECONDS", 10))  # Wait estimate before any job finished
+SCHEDULER_PRIORITIES = ["high", "normal", "low"]  # Highest priority first
+
+# Progress event stream settings
+PROGRESS_HEARTBEAT_SECONDS = float(os.getenv("PROGRESS_HEARTBEAT_SECONDS", 15))
+
+# Incremental Markdown output, written page by page while a job runs
+MARKDOWN_STREAM_DIR = os.getenv("MARKDOWN_STREAM_DIR", os.path.join(BASE_DIR, "data", "markdown_stream"))
+MARKDOWN_STREAM_CHUNK_SIZE = int(os.getenv("MARKDOWN_STREAM_CHUNK_SIZE", 64 * 1024))
+
+# Upload settings
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", 1024 * 1024 * 1024))  # Reject larger uploads (bytes)
+UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY", 8 * 1024 * 1024))  # Spill to disk above this
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+
+# Batch upload settings
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 10000))  # Maximum documents per batch
+BATCH_SPOOL_MAX_MEMORY = int(os.getenv("BATCH_SPOOL_MAX_MEMORY", 256 * 1024))  # Per-document spool threshold
+
+# Job store settings
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "sqlite")  # "sqlite" or "memory"
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(BASE_DIR, "data", "jobs.db"))
+JOB_STORE_CACHE_SIZE = int(os.getenv("JOB_STORE_CACHE_SIZE", 1024))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", 120))  # Pending/processing jobs not renewed for this long are failed
+
+# Result cache settings
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "True").lower() == "true"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(BASE_DIR, "data", "result_cache"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+
+# Profiling settings
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "True").lower() == "true"  # Allow profile=true on uploads
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "data", "profiles"))  # cProfile dumps of profiled jobs
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", 256 * 1024 * 1024))  # Oldest dumps are deleted above this; 0 for no limit
+PROFILE_RETENTION_HOURS = float(os.getenv("PROFILE_RETENTION_HOURS", 7 * 24))  # Older dumps are deleted; 0 keeps them
+
 # Web settings
 HOST = os.getenv("HOST", "127.0.0.1")
 PORT = int(os.getenv("PORT", 8000))
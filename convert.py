@@ -0,0 +1,7 @@
+import sys
+
+from app.cli.batch_convert import main
+
+if __name__ == "__main__":
+    # Convert a directory tree without the API, e.g. python convert.py ./documents ./markdown
+    sys.exit(main())
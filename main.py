@@ -1,13 +1,19 @@
 import uvicorn
 import os
+import asyncio
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from app.api.document_api import router as document_router
+from app.api.document_api import router as document_router, maintain_job_leases, prune_result_files
+from app.api.batch_api import router as batch_router
 from app.api.static_files import router as static_router
+from app.api.health_api import router as health_router
+from app.api.metrics_api import router as metrics_router
 from app.frontend.frontend_api import router as frontend_router
-from config.config import HOST, PORT, DEBUG, MEDIA_DIR
+from app.core.pipeline.worker_pool import worker_pool
+from config.config import HOST, PORT, DEBUG, MEDIA_DIR, UPLOAD_MAX_SIZE
 
 # Create the FastAPI app
 app = FastAPI(
@@ -25,13 +31,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files
-app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
+
+@app.middleware("http")
+async def limit_upload_size(request, call_next):
+    # Reject oversized uploads from their Content-Length before the body is read;
+    # uploads without one are still limited while they are spooled
+    content_length = request.headers.get("content-length", "")
+    if request.url.path == "/api/upload" and content_length.isdigit() and int(content_length) > UPLOAD_MAX_SIZE:
+        return JSONResponse(status_code=413, content={"detail": f"Upload exceeds the maximum size of {UPLOAD_MAX_SIZE} bytes"})
+    return await call_next(request)
+
 
 # Include routers
 app.include_router(document_router, prefix="/api", tags=["Document API"])
+app.include_router(batch_router, prefix="/api", tags=["Batch API"])
 app.include_router(static_router, prefix="/media", tags=["Static Files"])
 app.include_router(frontend_router, tags=["Frontend"])
+app.include_router(health_router, tags=["Health"])
+app.include_router(metrics_router, tags=["Metrics"])
+
+# Mount static files after the routers, so /media/images/{filename} resolves through the media store
+app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
+
+
+@app.on_event("startup")
+async def warm_up_workers():
+    # Start the workers and load the OCR models in the background; /readyz reports when they are done
+    worker_pool.ensure_warm_up()
+
+
+@app.on_event("startup")
+async def start_job_leases():
+    # Keep the leases of this worker's jobs alive; jobs of crashed workers are failed
+    app.state.job_lease_task = asyncio.create_task(maintain_job_leases())
+
+
+@app.on_event("startup")
+async def start_result_pruning():
+    # Delete bounded-memory Markdown results past their retention period
+    app.state.prune_task = asyncio.create_task(prune_result_files())
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    # Stop the conversion worker processes together with the API
+    worker_pool.shutdown()
 
 
 if __name__ == "__main__":